@@ -162,4 +162,41 @@ strace-zip() {
   strace python -S _tmp/app.zip
 }
 
+# Compare importing from .pyc files and from a startup image, written by
+# build/make_image.py.  Run in the dev tree.
+make-image() {
+  mkdir -p _tmp
+  PYTHONPATH=.:vendor python -S build/app_deps.py py-manifest bin.oil \
+    > _tmp/oil-py-manifest.txt
+  cat build/oil-manifest.txt _tmp/oil-py-manifest.txt \
+    | PYTHONPATH=.:vendor build/make_image.py _tmp/oil.image
+}
+
+compare-image() {
+  local n=${1:-20}
+
+  echo 'osh -c true, .pyc files'
+  time for i in $(seq $n); do bin/osh -c true; done
+  echo
+
+  echo 'osh -c true, startup image'
+  time for i in $(seq $n); do OIL_IMAGE=$PWD/_tmp/oil.image bin/osh -c true; done
+  echo
+}
+
+# Per-module import costs, written by benchmarks/startup_profile.py.  Fails if
+# the imports go over the budget, in milliseconds.
+budget() {
+  local budget_ms=${1:-${OIL_STARTUP_BUDGET_MS:-100}}
+
+  mkdir -p _tmp/startup
+  OIL_STARTUP_PROFILE=_tmp/startup/startup.csv bin/osh -c true
+  benchmarks/startup_profile.py check _tmp/startup/startup.csv $budget_ms
+}
+
+budget-report() {
+  budget "$@" || true
+  benchmarks/report.R startup _tmp/startup _tmp/startup
+}
+
 "$@"
@@ -0,0 +1,195 @@
+#!/usr/bin/env python2
+"""
+startup_profile.py
+
+Records the cost of each module imported while the shell starts up.
+bin/oil.py installs it when OIL_STARTUP_PROFILE is set:
+
+  # Write a CSV file for benchmarks/report.R
+  OIL_STARTUP_PROFILE=_tmp/startup.csv bin/osh -c true
+
+  # Print a report sorted by exclusive time to stderr
+  OIL_STARTUP_PROFILE=- bin/osh -c true
+
+  # Exit 1 if imports took longer than the budget, in milliseconds
+  benchmarks/startup_profile.py check _tmp/startup.csv 50
+
+Columns:
+  module      The most specific module loaded by an import statement
+  depth       Nesting of the import
+  incl_ms     Time including nested imports
+  excl_ms     Time excluding nested imports
+  num_objects GC-tracked objects created, excluding nested imports
+  num_bytes   Growth of the resident set, excluding nested imports
+
+NOTE: Python 2 has no tracemalloc, so objects and bytes are approximations.
+The collector is disabled while profiling, so gc.get_count() only goes up,
+and bytes are measured with /proc/self/statm at page granularity.
+"""
+from __future__ import absolute_import, print_function
+
+import __builtin__
+import gc
+import sys
+import time
+
+_PAGE_SIZE = 4096
+
+_FIELDS = ['module', 'depth', 'incl_ms', 'excl_ms', 'num_objects',
+           'num_bytes']
+
+
+def _RssBytes():
+  try:
+    with open('/proc/self/statm') as f:
+      return int(f.read().split()[1]) * _PAGE_SIZE
+  except (IOError, IndexError, ValueError):
+    return 0  # not Linux
+
+
+class _Frame(object):
+  """An import that's in progress."""
+
+  def __init__(self):
+    self.nested_secs = 0.0
+    self.nested_objects = 0
+    self.nested_bytes = 0
+    self.nested_modules = set()
+
+
+class ImportProfiler(object):
+
+  def __init__(self):
+    self.rows = []  # list of tuples with _FIELDS
+    self.stack = []  # _Frame instances for imports in progress
+    self.orig_import = None
+    self.start_time = 0.0
+    self.gc_was_enabled = False
+
+  def Start(self):
+    self.start_time = time.time()
+    self.gc_was_enabled = gc.isenabled()
+    gc.disable()
+    self.orig_import = __builtin__.__import__
+    __builtin__.__import__ = self._Import
+
+  def _Import(self, name, globals=None, locals=None, fromlist=None, level=-1):
+    # Fast path for modules that are already loaded, which is most imports.
+    if not fromlist and level <= 0 and name in sys.modules:
+      return self.orig_import(name, globals, locals, fromlist, level)
+
+    before = set(sys.modules)
+    frame = _Frame()
+    self.stack.append(frame)
+
+    start_objects = gc.get_count()[0]
+    start_bytes = _RssBytes()
+    start_time = time.time()
+    try:
+      return self.orig_import(name, globals, locals, fromlist, level)
+    finally:
+      incl_secs = time.time() - start_time
+      incl_objects = gc.get_count()[0] - start_objects
+      incl_bytes = _RssBytes() - start_bytes
+      self.stack.pop()
+
+      # Implicit relative imports leave None entries in sys.modules.
+      new_modules = set(
+          m for m in sys.modules
+          if m not in before and sys.modules[m] is not None)
+
+      if self.stack:
+        parent = self.stack[-1]
+        parent.nested_secs += incl_secs
+        parent.nested_objects += incl_objects
+        parent.nested_bytes += incl_bytes
+        parent.nested_modules.update(new_modules)
+
+      own_modules = new_modules - frame.nested_modules
+      if own_modules:
+        # e.g. 'import a.b' loads both; blame the more specific one
+        module = max(own_modules, key=len)
+        self.rows.append((
+            module, len(self.stack),
+            incl_secs * 1000, (incl_secs - frame.nested_secs) * 1000,
+            incl_objects - frame.nested_objects,
+            incl_bytes - frame.nested_bytes))
+
+  def Stop(self, path):
+    __builtin__.__import__ = self.orig_import
+    if self.gc_was_enabled:
+      gc.enable()
+    total_ms = (time.time() - self.start_time) * 1000
+
+    if path == '-':
+      self.Report(sys.stderr, total_ms)
+    else:
+      with open(path, 'w') as f:
+        self.WriteCsv(f)
+
+  def WriteCsv(self, f):
+    print(','.join(_FIELDS), file=f)
+    for module, depth, incl_ms, excl_ms, num_objects, num_bytes in self.rows:
+      print('%s,%d,%.3f,%.3f,%d,%d' % (
+            module, depth, incl_ms, excl_ms, num_objects, num_bytes), file=f)
+
+  def Report(self, f, total_ms):
+    import_ms = sum(row[3] for row in self.rows)
+    print('%d modules imported in %.1f ms (%.1f ms total)' % (
+          len(self.rows), import_ms, total_ms), file=f)
+    print('%8s %8s %8s %10s  %s' % (
+          'excl_ms', 'incl_ms', 'objects', 'bytes', 'module'), file=f)
+    for row in sorted(self.rows, key=lambda row: row[3], reverse=True):
+      module, depth, incl_ms, excl_ms, num_objects, num_bytes = row
+      print('%8.2f %8.2f %8d %10d  %s%s' % (
+            excl_ms, incl_ms, num_objects, num_bytes, '  ' * depth, module),
+            file=f)
+
+
+def ReadCsv(path):
+  rows = []
+  with open(path) as f:
+    header = f.readline().strip().split(',')
+    if header != _FIELDS:
+      raise RuntimeError('Unexpected header %s' % header)
+    for line in f:
+      module, depth, incl_ms, excl_ms, num_objects, num_bytes = \
+          line.strip().split(',')
+      rows.append((module, int(depth), float(incl_ms), float(excl_ms),
+                   int(num_objects), int(num_bytes)))
+  return rows
+
+
+def main(argv):
+  if len(argv) < 2:
+    print('Usage: %s check CSV_PATH BUDGET_MS' % argv[0], file=sys.stderr)
+    return 2
+  action = argv[1]
+
+  if action == 'check':  # check a CSV file against a budget
+    path = argv[2]
+    budget_ms = float(argv[3])
+
+    rows = ReadCsv(path)
+    import_ms = sum(row[3] for row in rows)
+    if import_ms > budget_ms:
+      print('FAIL: imports took %.1f ms, over the budget of %.1f ms' % (
+            import_ms, budget_ms), file=sys.stderr)
+      for row in sorted(rows, key=lambda row: row[3], reverse=True)[:10]:
+        print('  %8.2f ms  %s' % (row[3], row[0]), file=sys.stderr)
+      return 1
+
+    print('OK: imports took %.1f ms, within the budget of %.1f ms' % (
+          import_ms, budget_ms), file=sys.stderr)
+    return 0
+
+  else:
+    raise RuntimeError('Invalid action %r' % action)
+
+
+if __name__ == '__main__':
+  try:
+    sys.exit(main(sys.argv))
+  except RuntimeError as e:
+    print('FATAL: %s' % e, file=sys.stderr)
+    sys.exit(1)
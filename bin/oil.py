@@ -33,6 +33,15 @@ if _trace_path:
 else:
   _tracer = None
 
+# Per-module import costs.  See benchmarks/startup_profile.py.
+_profile_path = posix.environ.get('OIL_STARTUP_PROFILE')
+if _profile_path:
+  from benchmarks import startup_profile
+  _profiler = startup_profile.ImportProfiler()
+  _profiler.Start()
+else:
+  _profiler = None
+
 # Uncomment this to see startup time problems.
 if posix.environ.get('OIL_TIMING'):
   start_time = time.time()
@@ -43,12 +52,19 @@ else:
   def _tlog(msg):
     pass
 
+# If there's a startup image in the app bundle, or from build/make_image.py,
+# the resource loader installs an importer for it.  Do this before importing
+# anything else.
+if (posix.environ.get('_OVM_IS_BUNDLE') == '1' or
+    posix.environ.get('OIL_IMAGE')):
+  from core import pyutil
+  pyutil.GetResourceLoader()
+
 _tlog('before imports')
 
-import atexit
 import errno
 
-from _devbuild.gen.runtime_asdl import builtin_e, arg_vector
+from _devbuild.gen.runtime_asdl import builtin_e, arg_vector, value_e
 from _devbuild.gen.syntax_asdl import source
 
 from asdl import runtime
@@ -61,9 +77,10 @@ from core import main_loop
 from core import meta
 from core import process
 from core import pyutil
+from core import server
 from core import ui
 from core import util
-from core.util import log
+from core.util import log, e_die
 
 from frontend import args
 from frontend import reader
@@ -84,6 +101,7 @@ from osh import builtin_pure
 from osh import cmd_exec
 from osh import expr_eval as osh_expr_eval
 from osh import history
+from osh import path_index
 from osh import prompt
 from osh import split
 from osh import state
@@ -103,6 +121,13 @@ except ImportError:
   line_input = None
 
 
+# build/app_deps.py finds the modules for the app bundle by importing this one.
+# These are imported on first use, so import them now to include them.
+if __name__ != '__main__':
+  from oil_lang import expr_parse
+  from oil_lang import expr_to_ast
+  _ = expr_parse, expr_to_ast  # not used here
+
 _tlog('after imports')
 
 
@@ -144,9 +169,25 @@ OSH_SPEC.LongFlag('--runtime-mem-dump', args.Str)
 # it can simply by --rcfile /dev/null.
 OSH_SPEC.LongFlag('--rcfile', args.Str)
 
+# Serve 'osh -c' requests from bin/osh-client on a Unix socket.
+OSH_SPEC.LongFlag('--server', args.Str)
+
 builtin_pure.AddOptionsToArgSpec(OSH_SPEC)
 
 
+def _InitGlobalFuncs(mem, splitter):
+  builtin_funcs.Init(mem)
+
+  # split() builtin.  Without a separator, it splits like the shell, with $IFS.
+  def _Split(s, sep=None):
+    if sep is None:
+      return splitter.SplitForWordEval(s)
+    if not sep:
+      e_die("split() expected a non-empty separator")
+    return s.split(sep)
+  builtin_funcs.SetGlobalFunc(mem, 'split', _Split)
+
+
 def _MakeArgVector(argv):
   argv = [''] + argv  # add dummy since arg_vec includes argv[0]
   # no location info
@@ -170,32 +211,105 @@ def _InitDefaultCompletions(ex, complete_builtin, comp_lookup):
     comp_lookup.RegisterName('slowc', {}, C1)
 
 
-def _MaybeWriteHistoryFile(history_filename):
-  if not line_input:
-    return
-  try:
-    line_input.write_history_file(history_filename)
-  except IOError:
-    pass
+class _LazyCompletion(object):
+  """Completion and history objects, created on first use.
 
+  A batch script never presses TAB, so we don't build them at startup.  They're
+  created when the shell becomes interactive, or when the complete, compgen, or
+  compopt builtins are called.
+  """
 
-def _InitReadline(readline_mod, history_filename, root_comp, display, debug_f):
+  def __init__(self, ex, mem, parse_ctx, word_ev, splitter, grammar_loader,
+               errfmt, debug_f):
+    self.ex = ex
+    self.mem = mem
+    self.parse_ctx = parse_ctx
+    self.word_ev = word_ev
+    self.splitter = splitter
+    self.grammar_loader = grammar_loader
+    self.errfmt = errfmt
+    self.debug_f = debug_f
+
+    self.comp_lookup = None  # set by Init()
+
+  def Init(self):
+    if self.comp_lookup is not None:
+      return
+
+    self.comp_lookup = completion.Lookup()
+
+    # Various Global State objects to work around readline interfaces
+    self.compopt_state = completion.OptionState()
+    self.comp_ui_state = comp_ui.State()
+    self.prompt_state = comp_ui.PromptState()
+
+    spec_builder = builtin_comp.SpecBuilder(self.ex, self.parse_ctx,
+                                            self.word_ev, self.splitter,
+                                            self.comp_lookup)
+    self.complete_builtin = builtin_comp.Complete(spec_builder,
+                                                  self.comp_lookup)
+    self.compgen_builtin = builtin_comp.CompGen(spec_builder)
+    self.compopt_builtin = builtin_comp.CompOpt(self.compopt_state,
+                                                self.errfmt)
+
+  def Complete(self, arg_vec):
+    self.Init()
+    return self.complete_builtin(arg_vec)
+
+  def CompGen(self, arg_vec):
+    self.Init()
+    return self.compgen_builtin(arg_vec)
+
+  def CompOpt(self, arg_vec):
+    self.Init()
+    return self.compopt_builtin(arg_vec)
+
+  def _MakeParseContext(self, source_name, trail, one_pass_parse=False):
+    # Shares aliases with the main ParseContext.
+    arena = alloc.Arena()
+    arena.PushSource(source.Unused(source_name))
+    return parse_lib.ParseContext(arena, self.parse_ctx.parse_opts,
+                                  self.parse_ctx.aliases, None, trail=trail,
+                                  one_pass_parse=one_pass_parse,
+                                  grammar_loader=self.grammar_loader)
+
+  def HistoryEvaluator(self, hist_file):
+    self.Init()
+    hist_ctx = self._MakeParseContext('history', parse_lib.Trail())
+    # History evaluation is a no-op if hist_file is None.
+    return history.Evaluator(hist_file, hist_ctx, self.debug_f)
+
+  def RootCompleter(self, ev):
+    self.Init()
+    # one_pass_parse needs to be turned on to complete inside backticks.  TODO:
+    # fix the issue where ` gets erased because it's not part of
+    # set_completer_delims().
+    comp_ctx = self._MakeParseContext('completion', parse_lib.Trail(),
+                                      one_pass_parse=True)
+    return completion.RootCompleter(ev, self.mem, self.comp_lookup,
+                                    self.compopt_state, self.comp_ui_state,
+                                    comp_ctx, self.debug_f)
+
+
+def _InitReadline(readline_mod, hist_file, history_filename, root_comp, display,
+                  debug_f):
   assert readline_mod
 
-  try:
-    readline_mod.read_history_file(history_filename)
-  except IOError:
-    pass
+  # Lines are appended to the file as they're accepted.  Load the file after
+  # drawing the first prompt, since it may be big.
+  hist_file.SetPath(history_filename)
+  readline_mod.set_pre_input_hook(hist_file.Load)
 
-  # The 'atexit' module is a small wrapper around sys.exitfunc.
-  atexit.register(_MaybeWriteHistoryFile, history_filename)
   readline_mod.parse_and_bind("tab: complete")
 
   # How does this map to C?
   # https://cnswww.cns.cwru.edu/php/chet/readline/readline.html#SEC45
 
-  complete_cb = completion.ReadlineCallback(readline_mod, root_comp, debug_f)
+  complete_cb = completion.ReadlineCallback(readline_mod, root_comp, debug_f,
+                                            display=display)
   readline_mod.set_completer(complete_cb)
+  # Candidates are cached until the next line.
+  readline_mod.set_startup_hook(root_comp.ClearCache)
 
   # http://web.mit.edu/gnu/doc/html/rlman_2.html#SEC39
   # "The basic list of characters that signal a break between words for the
@@ -305,7 +419,6 @@ def ShellMain(lang, argv0, argv, login_shell):
   # required arg.
   mem = state.Mem(dollar0, argv[arg_r.i + 1:], posix.environ, arena,
                   has_main=has_main)
-  builtin_funcs.Init(mem)
 
   procs = {}
 
@@ -325,30 +438,14 @@ def ShellMain(lang, argv0, argv, login_shell):
   builtin_pure.SetExecOpts(exec_opts, opts.opt_changes, opts.shopt_changes)
   aliases = {}  # feedback between runtime and parser
 
-  oil_grammar = meta.LoadOilGrammar(loader)
+  # Loaded when the parser first sees an Oil expression.
+  grammar_loader = meta.OilGrammarLoader(loader)
 
   if opts.one_pass_parse and not exec_opts.noexec:
     raise args.UsageError('--one-pass-parse requires noexec (-n)')
-  parse_ctx = parse_lib.ParseContext(arena, parse_opts, aliases, oil_grammar,
-                                     one_pass_parse=opts.one_pass_parse)
-
-  # Three ParseContext instances SHARE aliases.
-  comp_arena = alloc.Arena()
-  comp_arena.PushSource(source.Unused('completion'))
-  trail1 = parse_lib.Trail()
-  # one_pass_parse needs to be turned on to complete inside backticks.  TODO:
-  # fix the issue where ` gets erased because it's not part of
-  # set_completer_delims().
-  comp_ctx = parse_lib.ParseContext(comp_arena, parse_opts, aliases,
-                                    oil_grammar, trail=trail1,
-                                    one_pass_parse=True)
-
-  hist_arena = alloc.Arena()
-  hist_arena.PushSource(source.Unused('history'))
-  trail2 = parse_lib.Trail()
-  hist_ctx = parse_lib.ParseContext(hist_arena, parse_opts, aliases,
-                                    oil_grammar, 
-                                    trail=trail2)
+  parse_ctx = parse_lib.ParseContext(arena, parse_opts, aliases, None,
+                                     one_pass_parse=opts.one_pass_parse,
+                                     grammar_loader=grammar_loader)
 
   # Deps helps manages dependencies.  These dependencies are circular:
   # - ex and word_ev, arith_ev -- for command sub, arith sub
@@ -401,6 +498,8 @@ def ShellMain(lang, argv0, argv, login_shell):
     debug_f.log('Writing logs to %r', debug_path)
 
   interp = posix.environ.get('OSH_HIJACK_SHEBANG', '')
+  path_idx = path_index.PathIndex()
+  exec_deps.path_index = path_idx  # for completion
   exec_deps.search_path = state.SearchPath(mem)
   exec_deps.ext_prog = process.ExternalProgram(interp, fd_state,
                                                exec_deps.search_path,
@@ -409,9 +508,7 @@ def ShellMain(lang, argv0, argv, login_shell):
   splitter = split.SplitContext(mem)
   exec_deps.splitter = splitter
 
-  # split() builtin
-  builtin_funcs.SetGlobalFunc(
-      mem, 'split', lambda s: splitter.SplitForWordEval(s))
+  _InitGlobalFuncs(mem, splitter)
 
   # This could just be OSH_DEBUG_STREAMS='debug crash' ?  That might be
   # stuffing too much into one, since a .json crash dump isn't a stream.
@@ -424,17 +521,13 @@ def ShellMain(lang, argv0, argv, login_shell):
     trace_f = util.DebugFile(sys.stderr)
   exec_deps.trace_f = trace_f
 
-  comp_lookup = completion.Lookup()
-
-  # Various Global State objects to work around readline interfaces
-  compopt_state = completion.OptionState()
-  comp_ui_state = comp_ui.State()
-  prompt_state = comp_ui.PromptState()
-
   dir_stack = state.DirStack()
 
   new_var = builtin_assign.NewVar(mem, procs, errfmt)
 
+  # Interactive history.  Only backed by a file in interactive shells.
+  hist_file = history.HistoryFile(line_input) if line_input else None
+
   builtins = {  # Lookup
       builtin_e.ECHO: builtin_pure.Echo(exec_opts),
       builtin_e.PRINTF: builtin_printf.Printf(mem, parse_ctx, errfmt),
@@ -446,10 +539,9 @@ def ShellMain(lang, argv0, argv, login_shell):
 
       builtin_e.READ: builtin.Read(splitter, mem),
       builtin_e.HELP: builtin.Help(loader, errfmt),
-      builtin_e.HISTORY: builtin.History(line_input),
+      builtin_e.HISTORY: builtin.History(hist_file),
 
       # Completion (more added below)
-      builtin_e.COMPOPT: builtin_comp.CompOpt(compopt_state, errfmt),
       builtin_e.COMPADJUST: builtin_comp.CompAdjust(mem),
 
       # test / [ differ by need_right_bracket
@@ -525,15 +617,17 @@ def ShellMain(lang, argv0, argv, login_shell):
 
   word_ev.expr_ev = expr_ev
 
-  spec_builder = builtin_comp.SpecBuilder(ex, parse_ctx, word_ev, splitter,
-                                          comp_lookup)
+  # Not created for batch scripts unless they call complete, etc.
+  comp = _LazyCompletion(ex, mem, parse_ctx, word_ev, splitter,
+                         grammar_loader, errfmt, debug_f)
 
   # Add some builtins that depend on the executor!
-  complete_builtin = builtin_comp.Complete(spec_builder, comp_lookup)
-  builtins[builtin_e.COMPLETE] = complete_builtin
-  builtins[builtin_e.COMPGEN] = builtin_comp.CompGen(spec_builder)
+  builtins[builtin_e.COMPLETE] = comp.Complete
+  builtins[builtin_e.COMPGEN] = comp.CompGen
+  builtins[builtin_e.COMPOPT] = comp.CompOpt
   builtins[builtin_e.CD] = builtin.Cd(mem, dir_stack, ex, errfmt)
   builtins[builtin_e.JSON] = builtin_oil.Json(mem, ex, errfmt)
+  builtins[builtin_e.TSV2] = builtin_oil.Tsv2(mem, ex, errfmt)
 
   sig_state = process.SignalState()
   sig_state.InitShell()
@@ -547,8 +641,42 @@ def ShellMain(lang, argv0, argv, login_shell):
   exec_deps.prompt_ev = prompt_ev
   word_ev.prompt_ev = prompt_ev  # HACK for circular deps
 
-  # History evaluation is a no-op if line_input is None.
-  hist_ev = history.Evaluator(line_input, hist_ctx, debug_f)
+  if opts.server:
+    # Everything above is shared by the requests.  Each one runs in a fresh
+    # child process.
+    def _RunRequest(req_argv, environ, ppid):
+      req_arg_r = args.Reader(req_argv)
+      try:
+        req_opts = OSH_SPEC.Parse(req_arg_r)
+      except args.UsageError as e:
+        ui.Stderr('osh usage error: %s', e.msg)
+        return 2
+      if req_opts.c is None:
+        ui.Stderr('osh --server: only -c is supported')
+        return 2
+
+      if req_arg_r.AtEnd():
+        mem.Reset(argv0, [], environ)
+      else:
+        mem.Reset(req_arg_r.Peek(), req_argv[req_arg_r.i + 1:], environ,
+                  has_main=True)
+      state.SetGlobalString(mem, 'PPID', str(ppid))
+      _InitGlobalFuncs(mem, splitter)
+      builtin_pure.SetExecOpts(exec_opts, req_opts.opt_changes,
+                               req_opts.shopt_changes)
+
+      arena.PushSource(source.CFlag())
+      line_reader = reader.StringLineReader(req_opts.c, arena)
+      c_parser = parse_ctx.MakeOshParser(line_reader)
+      try:
+        status = main_loop.Batch(ex, c_parser, arena)
+        if ex.MaybeRunExitTrap():
+          status = ex.LastStatus()
+      except util.UserExit as e:
+        status = e.status
+      return status
+
+    return server.Serve(opts.server, _RunRequest)
 
   if opts.c is not None:
     arena.PushSource(source.CFlag())
@@ -559,7 +687,8 @@ def ShellMain(lang, argv0, argv, login_shell):
   elif opts.i:  # force interactive
     arena.PushSource(source.Stdin(' -i'))
     line_reader = py_reader.InteractiveLineReader(
-        arena, prompt_ev, hist_ev, line_input, prompt_state)
+        arena, prompt_ev, comp.HistoryEvaluator(hist_file), hist_file,
+        comp.prompt_state)
     exec_opts.interactive = True
 
   else:
@@ -569,7 +698,8 @@ def ShellMain(lang, argv0, argv, login_shell):
       if sys.stdin.isatty():
         arena.PushSource(source.Interactive())
         line_reader = py_reader.InteractiveLineReader(
-            arena, prompt_ev, hist_ev, line_input, prompt_state)
+            arena, prompt_ev, comp.HistoryEvaluator(hist_file), hist_file,
+            comp.prompt_state)
         exec_opts.interactive = True
       else:
         arena.PushSource(source.Stdin(''))
@@ -589,6 +719,8 @@ def ShellMain(lang, argv0, argv, login_shell):
   c_parser = parse_ctx.MakeOshParser(line_reader)
 
   if exec_opts.interactive:
+    comp.Init()
+
     # Calculate ~/.config/oil/oshrc or oilrc
     # Use ~/.config/oil to avoid cluttering the user's home directory.  Some
     # users may want to ln -s ~/.config/oil/oshrc ~/oshrc or ~/.oshrc.
@@ -599,12 +731,12 @@ def ShellMain(lang, argv0, argv, login_shell):
     rc_path = opts.rcfile or os_path.join(home_dir, '.config/oil', lang + 'rc')
 
     history_filename = os_path.join(home_dir, '.config/oil', 'history_' + lang)
+    path_idx.SetPath(os_path.join(home_dir, '.config/oil', 'path_index'))
 
     if line_input:
       # NOTE: We're using a different WordEvaluator here.
       ev = word_eval.CompletionWordEvaluator(mem, exec_opts, exec_deps, arena)
-      root_comp = completion.RootCompleter(ev, mem, comp_lookup, compopt_state,
-                                           comp_ui_state, comp_ctx, debug_f)
+      root_comp = comp.RootCompleter(ev)
 
       term_width = 0
       if opts.completion_display == 'nice':
@@ -614,16 +746,19 @@ def ShellMain(lang, argv0, argv, login_shell):
           pass
 
       if term_width != 0:
-        display = comp_ui.NiceDisplay(term_width, comp_ui_state, prompt_state,
-                                      debug_f, line_input)
+        display = comp_ui.NiceDisplay(term_width, comp.comp_ui_state,
+                                      comp.prompt_state, debug_f, line_input)
       else:
-        display = comp_ui.MinimalDisplay(comp_ui_state, prompt_state, debug_f)
+        display = comp_ui.MinimalDisplay(comp.comp_ui_state, comp.prompt_state,
+                                         debug_f)
 
-      _InitReadline(line_input, history_filename, root_comp, display, debug_f)
-      _InitDefaultCompletions(ex, complete_builtin, comp_lookup)
+      _InitReadline(line_input, hist_file, history_filename, root_comp,
+                    display, debug_f)
+      _InitDefaultCompletions(ex, comp.complete_builtin, comp.comp_lookup)
 
     else:  # Without readline module
-      display = comp_ui.MinimalDisplay(comp_ui_state, prompt_state, debug_f)
+      display = comp_ui.MinimalDisplay(comp.comp_ui_state, comp.prompt_state,
+                                       debug_f)
 
     sig_state.InitInteractiveShell(display)
 
@@ -635,6 +770,12 @@ def ShellMain(lang, argv0, argv, login_shell):
 
     line_reader.Reset()  # After sourcing startup file, render $PS1
 
+    if line_input:
+      # After the startup file, which may change $PATH.
+      path_val = mem.GetVar('PATH')
+      if path_val.tag == value_e.Str:
+        path_idx.Prewarm(path_val.s.split(':'))
+
     prompt_plugin = prompt.UserPlugin(mem, parse_ctx, ex)
     try:
       status = main_loop.Interactive(opts, ex, c_parser, display,
@@ -897,6 +1038,8 @@ def main(argv):
     _tlog('Exiting main()')
     if _trace_path:
       _tracer.Stop(_trace_path)
+    if _profile_path:
+      _profiler.Stop(_profile_path)
 
 
 # Called from Python-2.7.13/Modules/main.c.
@@ -227,6 +227,7 @@ build() {
     $c_module_src_list \
     Modules/ovm.c \
     -l m \
+    -l pthread \
     ${BASE_LDFLAGS} \
     ${LDFLAGS} \
     $readline_flags \
@@ -187,6 +187,13 @@ line-input() {
   native/line_input_test.py "$@" > /dev/null
 }
 
+fastjson() {
+  rm -f _devbuild/py-ext/x86_64/fastjson.so
+
+  py-ext fastjson build/setup_fastjson.py
+  native/fastjson_test.py "$@" > /dev/null
+}
+
 posix_() {
   rm -f _devbuild/py-ext/x86_64/posix_.so
 
@@ -195,7 +202,7 @@ posix_() {
 }
 
 clean() {
-  rm -f --verbose libc.so fastlex.so line_input.so posix_.so
+  rm -f --verbose libc.so fastlex.so fastjson.so line_input.so posix_.so
   rm -r -f --verbose _devbuild/py-ext
 }
 
@@ -225,6 +232,7 @@ minimal() {
   pylibc
   line-input
   posix_
+  fastjson
 }
 
 oil-grammar() {
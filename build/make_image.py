@@ -0,0 +1,143 @@
+#!/usr/bin/env python2
+"""
+make_image.py
+
+Takes a list of manifests and writes a startup image: the app's code objects
+and resources in one file, which core/pyutil.py can map in at startup instead
+of going through zipimport.
+
+The input is the same as for make_zip.py.  See pyutil.Image for the layout.
+"""
+
+import marshal
+import sys
+
+
+def _Align8(i):
+  return (i + 7) & ~7
+
+
+def ReadManifest(f):
+  """Returns a list of (full_path, rel_path) pairs, without duplicates."""
+  entries = []
+  seen = {}
+  for line in f:
+    line = line.strip()
+    if not line:  # Some files are hand-edited.  Allow empty lines.
+      continue
+    try:
+      full_path, rel_path = line.split(None, 1)
+    except ValueError:
+      raise RuntimeError('Invalid line %r' % line)
+
+    if rel_path in seen:
+      expected = seen[rel_path]
+      if expected != full_path:
+        print >>sys.stderr, 'WARNING: expected %r, got %r' % (expected,
+            full_path)
+      continue
+
+    entries.append((full_path, rel_path))
+    seen[rel_path] = full_path
+  return entries
+
+
+def _ModuleName(rel_path):
+  """core/util.py -> (core.util, False), core/__init__.pyc -> (core, True)"""
+  name = rel_path.rsplit('.', 1)[0].replace('/', '.')
+  if name.endswith('.__init__'):
+    return name[:-len('.__init__')], True
+  if name == '__init__':  # the repo root in dev builds
+    return None, True
+  return name, False
+
+
+def _CodeBlob(full_path, rel_path):
+  """Returns marshaled code for a .py or .pyc file."""
+  with open(full_path, 'rb') as f:
+    contents = f.read()
+
+  if full_path.endswith('.pyc'):
+    blob = contents[8:]  # skip magic number and mtime
+    code = marshal.loads(blob)
+    if not hasattr(code, 'co_code'):
+      raise RuntimeError('%s is not a .pyc file' % full_path)
+    return blob
+
+  code = compile(contents, rel_path, 'exec')
+  return marshal.dumps(code)
+
+
+def WriteImage(entries, f):
+  """Write an image of the manifest entries to a file."""
+  # Not at the top, so make_zip.py runs without the repo on PYTHONPATH.
+  from core import pyutil
+
+  # name -> (kind, full_path, rel_path).  .pyc files take precedence over .py.
+  items = {}
+  for full_path, rel_path in entries:
+    if rel_path.endswith('.py') or rel_path.endswith('.pyc'):
+      name, is_package = _ModuleName(rel_path)
+      if name is None:
+        continue
+      if name in items and rel_path.endswith('.py'):
+        continue
+      kind = pyutil.IMAGE_PACKAGE if is_package else pyutil.IMAGE_MODULE
+    else:
+      name = rel_path
+      kind = pyutil.IMAGE_RESOURCE
+    items[name] = (kind, full_path, rel_path)
+
+  blobs = []
+  for name in sorted(items):
+    kind, full_path, rel_path = items[name]
+    if kind == pyutil.IMAGE_RESOURCE:
+      with open(full_path, 'rb') as r:
+        blob = r.read()
+    else:
+      blob = _CodeBlob(full_path, rel_path)
+    blobs.append((name, kind, blob))
+
+  # The index has fixed-size integers, so we can compute its size before
+  # knowing the offsets.
+  dummy = dict((name, (kind, 0, 0)) for name, kind, _ in blobs)
+  index_len = len(marshal.dumps(dummy))
+  pos = _Align8(pyutil.IMAGE_HEADER_SIZE + index_len)
+
+  index = {}
+  for name, kind, blob in blobs:
+    index[name] = (kind, pos, len(blob))
+    pos = _Align8(pos + len(blob))
+
+  index_str = marshal.dumps(index)
+  assert len(index_str) == index_len, (len(index_str), index_len)
+
+  header = pyutil.IMAGE_MAGIC + '%08x' % index_len
+  assert len(header) == pyutil.IMAGE_HEADER_SIZE, header
+
+  f.write(header)
+  f.write(index_str)
+  n = pyutil.IMAGE_HEADER_SIZE + index_len
+  for _, _, blob in blobs:
+    pad = _Align8(n) - n
+    f.write('\0' * pad)
+    f.write(blob)
+    n += pad + len(blob)
+
+  return len(blobs)
+
+
+def main(argv):
+  out_path = argv[1]
+  entries = ReadManifest(sys.stdin)
+  with open(out_path, 'wb') as f:
+    n = WriteImage(entries, f)
+  print >>sys.stderr, 'make_image: Wrote %d entries to %s' % (n, out_path)
+
+
+if __name__ == '__main__':
+  try:
+    main(sys.argv)
+  except RuntimeError as e:
+    print >>sys.stderr, 'make_image:', e.args[0]
+    sys.exit(1)
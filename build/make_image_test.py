@@ -0,0 +1,107 @@
+#!/usr/bin/env python2
+from __future__ import print_function
+"""
+make_image_test.py: Tests for make_image.py
+"""
+
+import cStringIO
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import zipfile
+import zipimport
+
+from core import pyutil
+
+import make_image  # module under test
+
+
+class MakeImageTest(unittest.TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.tmp_dir)
+
+  def _WriteFile(self, name, contents):
+    path = os.path.join(self.tmp_dir, name)
+    with open(path, 'w') as f:
+      f.write(contents)
+    return path
+
+  def testReadManifest(self):
+    f = cStringIO.StringIO('a.py a.py\n\nb.txt b.txt\na.py a.py\n')
+    entries = make_image.ReadManifest(f)
+    self.assertEqual([('a.py', 'a.py'), ('b.txt', 'b.txt')], entries)
+
+  def testRoundTrip(self):
+    entries = [
+        (self._WriteFile('init.py', 'X = 1\n'), 'imgpkg/__init__.py'),
+        (self._WriteFile('mod.py', 'from imgpkg import X\nY = X + 41\n'),
+         'imgpkg/mod.py'),
+        (self._WriteFile('data.txt', 'hello\n'), 'imgpkg/data.txt'),
+    ]
+    image_path = os.path.join(self.tmp_dir, 'test.image')
+    with open(image_path, 'wb') as f:
+      self.assertEqual(3, make_image.WriteImage(entries, f))
+
+    image = pyutil.Image(image_path)
+    self.assertEqual((pyutil.IMAGE_RESOURCE, 'hello\n'),
+                     image.Get('imgpkg/data.txt'))
+    self.assertEqual(None, image.Get('imgpkg/other.txt'))
+    for kind, offset, length in image.index.itervalues():
+      self.assertEqual(0, offset % 8)
+
+    importer = pyutil.ImageImporter(image)
+    self.assertEqual(None, importer.find_module('imgpkg.data.txt'))
+    self.assertEqual(None, importer.find_module('imgpkg/data.txt'))
+
+    sys.meta_path.insert(0, importer)
+    try:
+      from imgpkg import mod
+      self.assertEqual(42, mod.Y)
+      self.assertEqual(importer, mod.__loader__)
+      self.assertEqual('imgpkg', mod.__package__)
+    finally:
+      sys.meta_path.remove(importer)
+      sys.modules.pop('imgpkg', None)
+      sys.modules.pop('imgpkg.mod', None)
+
+  def testBundleImage(self):
+    entries = [(self._WriteFile('data.txt', 'hello\n'), 'data.txt')]
+    f = cStringIO.StringIO()
+    make_image.WriteImage(entries, f)
+
+    # Like build/make_zip.py --image, with data before the zip like an app
+    # bundle.
+    zip_path = os.path.join(self.tmp_dir, 'test.zip')
+    z = zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_STORED)
+    z.write(entries[0][0], 'data.txt')
+    z.writestr(zipfile.ZipInfo(pyutil.BUNDLE_IMAGE_NAME), f.getvalue())
+    z.close()
+
+    bundle_path = os.path.join(self.tmp_dir, 'test.ovm')
+    with open(bundle_path, 'wb') as out:
+      out.write('\x7fELF' + '\0' * 100)
+      with open(zip_path, 'rb') as zip_f:
+        out.write(zip_f.read())
+
+    importer = zipimport.zipimporter(bundle_path)
+    offset, length = pyutil._FindBundleImage(importer, bundle_path)
+    self.assertEqual(len(f.getvalue()), length)
+
+    image = pyutil.Image(bundle_path, offset=offset, length=length)
+    loader = pyutil._ImageResourceLoader(image)
+    self.assertEqual('hello\n', loader.open('data.txt').read())
+    self.assertRaises(IOError, loader.open, 'other.txt')
+
+  def testBadImage(self):
+    path = self._WriteFile('bad.image', 'not an image')
+    self.assertRaises(pyutil.ImageError, pyutil.Image, path)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -3,14 +3,28 @@
 make_zip.py
 
 Takes a list of manifests and merges them into a zip file.
+
+Usage:
+  make_zip.py [--image] OUT_PATH < MANIFEST
+
+With --image, the zip also contains a startup image of the same files (see
+make_image.py), stored uncompressed so the app bundle can map it in.  The zip
+members remain for bootstrapping and as a fallback.
 """
 
+import cStringIO
 import sys
 import zipfile
 
+import make_image
+
 
 def main(argv):
   # Write input files to a .zip
+  with_image = False
+  if argv[1] == '--image':
+    with_image = True
+    argv = argv[1:]
   out_path = argv[1]
 
   # NOTE: Startup is ~3 ms faster WITHOUT compression.  38 ms. vs 41. ms.
@@ -21,26 +35,20 @@ def main(argv):
 
   z = zipfile.ZipFile(out_path, 'w', mode)
 
-  seen = {}
-  for line in sys.stdin:
-    line = line.strip()
-    if not line:  # Some files are hand-edited.  Allow empty lines.
-      continue
-    try:
-      full_path, rel_path = line.split(None, 1)
-    except ValueError:
-      raise RuntimeError('Invalid line %r' % line)
-
-    if rel_path in seen:
-      expected = seen[rel_path]
-      if expected != full_path:
-        print >>sys.stderr, 'WARNING: expected %r, got %r' % (expected,
-            full_path)
-      continue
-
+  entries = make_image.ReadManifest(sys.stdin)
+  for full_path, rel_path in entries:
     #print >>sys.stderr, '%s -> %s' % (full_path, rel_path)
     z.write(full_path, rel_path)
-    seen[rel_path] = full_path
+
+  if with_image:
+    from core import pyutil
+
+    f = cStringIO.StringIO()
+    make_image.WriteImage(entries, f)
+    # ZIP_STORED so pyutil can find the image at an offset in the bundle.
+    z.writestr(zipfile.ZipInfo(pyutil.BUNDLE_IMAGE_NAME), f.getvalue())
+
+  z.close()
 
   # TODO: Make summary
 
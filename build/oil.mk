@@ -58,6 +58,11 @@ _build/oil/bytecode-opy-manifest.txt: $(OIL_BYTECODE_DEPS) \
 	  $(ACTIONS_SH) pyc-version-manifest $@; \
 	} > $@
 
+# The zip also has a startup image of the same files.  See core/pyutil.py.
 _build/oil/bytecode-%.zip: _build/oil/bytecode-%-manifest.txt
-	build/make_zip.py $@ < $^
+	PYTHONPATH=$(OIL_PYPATH) build/make_zip.py --image $@ < $^
+
+# The same files as a startup image.  See core/pyutil.py.
+_build/oil/image-%.bin: _build/oil/bytecode-%-manifest.txt
+	PYTHONPATH=$(OIL_PYPATH) build/make_image.py $@ < $^
 
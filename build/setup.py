@@ -3,6 +3,7 @@ from distutils.core import setup, Extension
 
 module = Extension('libc',
                     sources = ['native/libc.c'],
+                    libraries = ['pthread'],  # for libc.globstar()
                     undef_macros = ['NDEBUG'])
 
 setup(name = 'libc',
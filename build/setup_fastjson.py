@@ -0,0 +1,11 @@
+#!/usr/bin/env python2
+from distutils.core import setup, Extension
+
+module = Extension('fastjson',
+                    sources = ['native/fastjson.c'],
+                    undef_macros = ['NDEBUG'])
+
+setup(name = 'fastjson',
+      version = '1.0',
+      description = 'Module to encode and decode JSON',
+      ext_modules = [module])
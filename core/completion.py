@@ -54,6 +54,8 @@ from osh.string_ops import ShellQuoteB
 import libc
 import posix_ as posix
 
+from typing import List, Optional, Tuple
+
 
 # To quote completion candidates.
 #   !    is for history expansion, which only happens interactively, but
@@ -471,37 +473,16 @@ class ExternalCommandAction(CompletionAction):
 
   This is PART of compge -A command.
   """
-  def __init__(self, mem):
+  def __init__(self, mem, index):
     """
     Args:
       mem: for looking up Path
+      index: path_index.PathIndex, shared with other shells
     """
     self.mem = mem
-    # Should we list everything executable in $PATH here?  And then whenever
-    # $PATH is changed, regenerated it?
-    # Or we can cache directory listings?  What if the contents of the dir
-    # changed?
-    # Can we look at the dir timestamp?
-    #
-    # (dir, timestamp) -> list of entries perhaps?  And then every time you hit
-    # tab, do you have to check the timestamp?  It should be cached by the
-    # kernel, so yes.
-    self.ext = []
-
-    # (dir, timestamp) -> list
-    # NOTE: This cache assumes that listing a directory is slower than statting
-    # it to get the mtime.  That may not be true on all systems?  Either way
-    # you are reading blocks of metadata.  But I guess /bin on many systems is
-    # huge, and will require lots of sys calls.
-    self.cache = {}
+    self.index = index
 
   def Matches(self, comp):
-    """
-    TODO: Cache is never cleared.
-
-    - When we get a newer timestamp, we should clear the old one.
-    - When PATH is changed, we can remove old entries.
-    """
     val = self.mem.GetVar('PATH')
     if val.tag != value_e.Str:
       # No matches if not a string
@@ -511,28 +492,8 @@ class ExternalCommandAction(CompletionAction):
 
     executables = []
     for d in path_dirs:
-      try:
-        st = posix.stat(d)
-      except OSError as e:
-        # There could be a directory that doesn't exist in the $PATH.
-        continue
-      key = (d, st.st_mtime)
-
-      dir_exes = self.cache.get(key)
-      if dir_exes is None:
-        entries = posix.listdir(d)
-        dir_exes = []
-        for name in entries:
-          path = os_path.join(d, name)
-          # TODO: Handle exception if file gets deleted in between listing and
-          # check?
-          if not posix.access(path, posix.X_OK):
-            continue
-          dir_exes.append(name)  # append the name, not the path
-
-        self.cache[key] = dir_exes
-
-      executables.extend(dir_exes)
+      executables.extend(self.index.Executables(d))
+    self.index.Save()  # if we listed any directories
 
     # TODO: Shouldn't do the prefix / space thing ourselves.  readline does
     # that at the END of the line.
@@ -681,6 +642,17 @@ class RootCompleter(object):
     self.parse_ctx = parse_ctx
     self.debug_f = debug_f
 
+    # Readline asks again when TAB is pressed twice, e.g. to list candidates.
+    # Keep the last complete result until the line changes or is accepted.
+    self.cache_key = None  # type: Optional[Tuple[str, int, int]]
+    self.cache_matches = None  # type: List[str]
+    self.cache_display_pos = -1
+
+  def ClearCache(self):
+    """Called when readline starts reading a new line."""
+    self.cache_key = None
+    self.cache_matches = None
+
   def Matches(self, comp):
     """
     Args:
@@ -690,6 +662,28 @@ class RootCompleter(object):
     Returns a list of matches relative to readline's completion_delims.
     We have to post-process the output of various completers.
     """
+    key = (comp.line, comp.begin, comp.end)
+    if key == self.cache_key:
+      self.debug_f.log('Reusing %d matches for %r', len(self.cache_matches),
+                       comp.line)
+      self.comp_ui_state.line_until_tab = comp.line[:comp.end]
+      self.comp_ui_state.display_pos = self.cache_display_pos
+      return iter(self.cache_matches)
+
+    return self._CacheMatches(comp, key)
+
+  def _CacheMatches(self, comp, key):
+    matches = []
+    for m in self._Matches(comp):
+      matches.append(m)
+      yield m
+
+    # Only reached if readline asked for every match.
+    self.cache_key = key
+    self.cache_matches = matches
+    self.cache_display_pos = self.comp_ui_state.display_pos
+
+  def _Matches(self, comp):
     arena = self.parse_ctx.arena  # Used by inner functions
 
     # Pass the original line "out of band" to the completion callback.
@@ -1073,16 +1067,81 @@ class RootCompleter(object):
         plural, comp.line, elapsed_ms)
 
    
+# Show progress after this many seconds, and then at this interval.
+_PROGRESS_SECS = 0.2
+
+
+def _InputPending():
+  """Has the user typed something since pressing TAB?"""
+  try:
+    return libc.bytes_available(0) > 0
+  except IOError:  # stdin isn't a terminal
+    return False
+
+
 class ReadlineCallback(object):
-  """A callable we pass to the readline module."""
+  """A callable we pass to the readline module.
+
+  Completion functions can be slow, e.g. if they shell out or list a directory
+  on NFS.  Between candidates, we:
+
+  - Show progress on the display, after _PROGRESS_SECS.
+  - Return the candidates so far when the deadline passes.
+  - Cancel if the user types another key.  (A single slow action can't be
+    interrupted, since it runs on the main thread.)
+  """
 
-  def __init__(self, readline_mod, root_comp, debug_f):
+  def __init__(self, readline_mod, root_comp, debug_f, display=None,
+               deadline_secs=2.0, input_pending=_InputPending):
     self.readline_mod = readline_mod
     self.root_comp = root_comp
     self.debug_f = debug_f
+    self.display = display
+    self.deadline_secs = deadline_secs
+    self.input_pending = input_pending
 
     self.comp_iter = None  # current completion being processed
 
+  def _CollectMatches(self, comp):
+    """Returns a list of matches, which may be cut short."""
+    matches = []
+    start_time = time.time()
+    progress_time = start_time + _PROGRESS_SECS
+
+    it = self.root_comp.Matches(comp)
+    try:
+      for m in it:
+        matches.append(m)
+
+        # Don't let readline insert a common prefix while the user is typing.
+        if self.input_pending():
+          self.debug_f.log('Completion cancelled by input after %d matches',
+                           len(matches))
+          return []
+
+        now = time.time()
+        elapsed = now - start_time
+        if elapsed > self.deadline_secs:
+          self.debug_f.log('Completion deadline passed after %d matches',
+                           len(matches))
+          if self.display:
+            self.display.PrintOptional(
+                '... stopped after %d matches in %.1f seconds', len(matches),
+                elapsed)
+          break
+
+        if now > progress_time:
+          if self.display:
+            self.display.PrintOptional(
+                '... %d matches (type to cancel)', len(matches))
+          progress_time = now + _PROGRESS_SECS
+    finally:
+      # Runs cleanup in RootCompleter if we stopped early.
+      if hasattr(it, 'close'):
+        it.close()
+
+    return matches
+
   def _GetNextCompletion(self, state):
     if state == 0:
       # TODO: Tokenize it according to our language.  If this is $PS2, we also
@@ -1098,7 +1157,7 @@ class ReadlineCallback(object):
 
       comp = Api(line=buf, begin=begin, end=end)
 
-      self.comp_iter = self.root_comp.Matches(comp)
+      self.comp_iter = iter(self._CollectMatches(comp))
 
     assert self.comp_iter is not None, self.comp_iter
 
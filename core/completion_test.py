@@ -24,6 +24,7 @@ from core import util
 from core.util import log
 
 from frontend import parse_lib
+from osh import path_index
 from osh import state
 from testdata.completion import bash_oracle
 
@@ -117,7 +118,7 @@ class CompletionTest(unittest.TestCase):
 
   def testExternalCommandAction(self):
     mem = state.Mem('dummy', [], {}, None)
-    a = completion.ExternalCommandAction(mem)
+    a = completion.ExternalCommandAction(mem, path_index.PathIndex())
     comp = self._CompApi([], 0, 'f')
     print(list(a.Matches(comp)))
 
@@ -251,6 +252,99 @@ class RootCompleterTest(unittest.TestCase):
     m = list(r.Matches(MockApi('var=$v')))
     m = list(r.Matches(MockApi('local var=$v')))
 
+  def testCachesMatches(self):
+    class _CountingAction(completion.TestAction):
+      num_calls = 0
+      def Matches(self, comp):
+        _CountingAction.num_calls += 1
+        return completion.TestAction.Matches(self, comp)
+
+    A = _CountingAction(['foo.py', 'foo', 'bar.py'])
+    comp_lookup = completion.Lookup()
+    comp_lookup.RegisterName('grep', BASE_OPTS,
+                             completion.UserSpec([A], [], [], lambda c: True))
+    r = _MakeRootCompleter(comp_lookup=comp_lookup)
+
+    m = list(r.Matches(MockApi('grep f')))
+    self.assertEqual(['grep foo.py ', 'grep foo '], m)
+    display_pos = r.comp_ui_state.display_pos
+    r.comp_ui_state.display_pos = -1
+
+    # Pressing TAB again reuses the matches
+    m = list(r.Matches(MockApi('grep f')))
+    self.assertEqual(['grep foo.py ', 'grep foo '], m)
+    self.assertEqual(1, _CountingAction.num_calls)
+    self.assertEqual(display_pos, r.comp_ui_state.display_pos)
+
+    # A different line doesn't
+    m = list(r.Matches(MockApi('grep b')))
+    self.assertEqual(['grep bar.py '], m)
+    self.assertEqual(2, _CountingAction.num_calls)
+
+    # Matches that weren't all consumed aren't cached
+    it = r.Matches(MockApi('grep f'))
+    it.next()
+    list(r.Matches(MockApi('grep f')))
+    self.assertEqual(4, _CountingAction.num_calls)
+
+    # Cleared for the next line
+    r.ClearCache()
+    list(r.Matches(MockApi('grep f')))
+    self.assertEqual(5, _CountingAction.num_calls)
+
+  def testReadlineCallbackStopsEarly(self):
+    class _MockReadline(object):
+      def __init__(self, line):
+        self.line = line
+      def get_line_buffer(self):
+        return self.line
+      def get_begidx(self):
+        return self.line.rfind(' ') + 1
+      def get_endidx(self):
+        return len(self.line)
+
+    class _MockDisplay(object):
+      def __init__(self):
+        self.messages = []
+      def PrintOptional(self, msg, *args):
+        self.messages.append(msg % args)
+
+    A = completion.TestAction(['foo%d' % i for i in xrange(10)], delay=0.01)
+    comp_lookup = completion.Lookup()
+    comp_lookup.RegisterName('grep', BASE_OPTS,
+                             completion.UserSpec([A], [], [], lambda c: True))
+    r = _MakeRootCompleter(comp_lookup=comp_lookup)
+    display = _MockDisplay()
+
+    # The deadline passes, and we get partial results
+    cb = completion.ReadlineCallback(_MockReadline('grep f'), r,
+                                     util.NullDebugFile(), display=display,
+                                     deadline_secs=0.025,
+                                     input_pending=lambda: False)
+    m = []
+    while True:
+      c = cb(None, len(m))
+      if c is None:
+        break
+      m.append(c)
+    self.assertTrue(0 < len(m) < 10, m)
+    self.assertEqual(1, len(display.messages), display.messages)
+
+    # The partial results weren't cached
+    cb.deadline_secs = 10.0
+    self.assertEqual('grep foo0 ', cb(None, 0))
+    for i in xrange(1, 10):
+      cb(None, i)
+    self.assertEqual(None, cb(None, 10))
+
+    # Typing cancels completion
+    cb = completion.ReadlineCallback(_MockReadline('grep x'), r,
+                                     util.NullDebugFile(),
+                                     input_pending=lambda: True)
+    r.ClearCache()
+    A.words = ['xyz']
+    self.assertEqual(None, cb(None, 0))
+
   def testCompletesHomeDirs(self):
     r = _MakeRootCompleter()
 
@@ -117,3 +117,23 @@ def LoadOilGrammar(loader):
   f.close()
   oil_grammar.loads(contents)
   return oil_grammar
+
+
+class OilGrammarLoader(object):
+  """Loads the Oil grammar the first time the parser needs it.
+
+  Most shell scripts never use var, proc, $[...], etc., so we don't pay for
+  reading and unmarshaling grammar.marshal at startup.  One instance is shared
+  by all the ParseContext instances.
+  """
+
+  def __init__(self, loader):
+    # type: (_ResourceLoader) -> None
+    self.loader = loader
+    self.oil_grammar = None  # type: grammar.Grammar
+
+  def Load(self):
+    # type: () -> grammar.Grammar
+    if self.oil_grammar is None:
+      self.oil_grammar = LoadOilGrammar(self.loader)
+    return self.oil_grammar
@@ -4,6 +4,7 @@ pyutil.py: Code that's only needed in Python.  C++ will use other mechanisms.
 from __future__ import print_function
 
 import cStringIO
+import marshal
 import sys
 import zipimport  # NOT the zipfile module.
 
@@ -11,7 +12,7 @@ from pylib import os_path
 
 import posix_ as posix
 
-from typing import IO
+from typing import IO, Dict, List, Optional, Tuple, Any
 
 
 class _ResourceLoader(object):
@@ -36,9 +37,9 @@ class _FileResourceLoader(_ResourceLoader):
 class _ZipResourceLoader(_ResourceLoader):
   """Open resources INSIDE argv[0] as a zip file."""
 
-  def __init__(self, argv0):
-    # type: (str) -> None
-    self.z = zipimport.zipimporter(argv0)
+  def __init__(self, z):
+    # type: (Any) -> None
+    self.z = z  # zipimport.zipimporter
 
   def open(self, rel_path):
     # type: (str) -> IO[str]
@@ -46,6 +47,178 @@ class _ZipResourceLoader(_ResourceLoader):
     return cStringIO.StringIO(contents)
 
 
+# Written by build/make_image.py.  Bump the version when the layout changes.
+IMAGE_MAGIC = 'OILIMG01'
+IMAGE_HEADER_SIZE = 16  # magic, then the index length as 8 hex digits
+
+# Kinds of index entries
+IMAGE_MODULE = 0
+IMAGE_PACKAGE = 1
+IMAGE_RESOURCE = 2
+
+
+class ImageError(Exception):
+  pass
+
+
+class Image(object):
+  """A snapshot of the app's code objects and resources, in one file.
+
+  The layout is in the spirit of ovm2/oheap2.py: a fixed header, a marshaled
+  index, and blobs aligned to 8 bytes.
+
+    'OILIMG01' '%08x' % index_len
+    marshal.dumps({name: (kind, offset, length), ...})
+    blob blob blob ...
+
+  Offsets are relative to the start of the image, so an image can be embedded
+  in a larger file.  Modules are keyed by dotted name, resources by path.
+
+  With the mmap module (CPython), nothing is read until a module is imported.
+  OVM doesn't have mmap, so the image is read with a single read() instead of
+  opening and decoding one zip member per module.
+  """
+
+  def __init__(self, path, offset=0, length=-1):
+    # type: (str, int, int) -> None
+    self.path = path
+    self.base = offset
+
+    f = open(path, 'rb')
+    try:
+      try:
+        import mmap
+      except ImportError:  # OVM
+        f.seek(offset)
+        self.data = f.read(length)  # type: Any
+        self.base = 0
+      else:
+        self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+      f.close()
+
+    b = self.base
+    header = self.data[b : b + IMAGE_HEADER_SIZE]
+    if len(header) != IMAGE_HEADER_SIZE or not header.startswith(IMAGE_MAGIC):
+      raise ImageError('%r is not an Oil image' % path)
+    index_len = int(header[len(IMAGE_MAGIC):], 16)
+
+    start = b + IMAGE_HEADER_SIZE
+    self.index = marshal.loads(self.data[start : start + index_len])
+    # type: Dict[str, Tuple[int, int, int]]
+
+  def Get(self, name):
+    # type: (str) -> Optional[Tuple[int, str]]
+    """Returns (kind, bytes), or None if the name isn't in the image."""
+    entry = self.index.get(name)
+    if entry is None:
+      return None
+    kind, offset, length = entry
+    start = self.base + offset
+    return kind, self.data[start : start + length]
+
+  def GetCode(self, name):
+    # type: (str) -> Tuple[bool, Any]
+    """Returns (is_package, code object) for a module."""
+    kind, blob = self.Get(name)
+    return kind == IMAGE_PACKAGE, marshal.loads(blob)
+
+
+class ImageImporter(object):
+  """A PEP 302 importer for modules in an Image.
+
+  Install it on sys.meta_path.  Modules that aren't in the image, like C
+  extensions, fall through to the regular importers.
+  """
+
+  def __init__(self, image):
+    # type: (Image) -> None
+    self.image = image
+
+  def find_module(self, fullname, path=None):
+    # type: (str, Optional[List[str]]) -> Optional[ImageImporter]
+    entry = self.image.index.get(fullname)
+    if entry is None or entry[0] == IMAGE_RESOURCE:
+      return None
+    return self
+
+  def load_module(self, fullname):
+    # type: (str) -> Any
+    mod = sys.modules.get(fullname)
+    if mod is not None:  # reload()
+      return mod
+
+    is_package, code = self.image.GetCode(fullname)
+
+    mod = type(sys)(fullname)  # a new module, without the imp module
+    mod.__file__ = code.co_filename
+    mod.__loader__ = self
+    if is_package:
+      # Submodules are found through sys.meta_path, not __path__.
+      mod.__path__ = []
+      mod.__package__ = fullname
+    else:
+      mod.__package__ = fullname.rpartition('.')[0]
+
+    sys.modules[fullname] = mod
+    try:
+      exec code in mod.__dict__
+    except:
+      del sys.modules[fullname]
+      raise
+    # The module may have replaced itself in sys.modules.
+    return sys.modules[fullname]
+
+
+def InstallImage(path, offset=0, length=-1):
+  # type: (str, int, int) -> Image
+  """Import modules from the image at 'path' from now on."""
+  image = Image(path, offset=offset, length=length)
+  sys.meta_path.insert(0, ImageImporter(image))
+  return image
+
+
+class _ImageResourceLoader(_ResourceLoader):
+  """Open resources inside a startup image."""
+
+  def __init__(self, image):
+    # type: (Image) -> None
+    self.image = image
+
+  def open(self, rel_path):
+    # type: (str) -> IO[str]
+    entry = self.image.Get(rel_path)
+    if entry is None or entry[0] != IMAGE_RESOURCE:
+      raise IOError('%r is not in %r' % (rel_path, self.image.path))
+    return cStringIO.StringIO(entry[1])
+
+
+# build/make_zip.py --image stores the image under this name, uncompressed.
+BUNDLE_IMAGE_NAME = 'oil.image'
+
+
+def _FindBundleImage(z, bundle_path):
+  # type: (Any, str) -> Optional[Tuple[int, int]]
+  """Returns the (offset, length) of the image in the app bundle, or None."""
+  info = z._files.get(BUNDLE_IMAGE_NAME)
+  if info is None:
+    return None
+  _, compress, data_size, _, header_offset, _, _, _ = info
+  if compress != 0:
+    return None  # can't map a compressed member
+
+  # The data follows a 30 byte local header, then the file name and extra
+  # field, whose lengths are little-endian 16-bit integers at byte 26.
+  with open(bundle_path, 'rb') as f:
+    f.seek(header_offset)
+    h = f.read(30)
+  if len(h) != 30 or not h.startswith('PK\x03\x04'):
+    return None
+  name_len = ord(h[26]) | (ord(h[27]) << 8)
+  extra_len = ord(h[28]) | (ord(h[29]) << 8)
+  return header_offset + 30 + name_len + extra_len, data_size
+
+
 _loader = None  # type: _ResourceLoader
 
 def GetResourceLoader():
@@ -57,13 +230,26 @@ def GetResourceLoader():
   # Ovm_Main in main.c sets this.
   if posix.environ.get('_OVM_IS_BUNDLE') == '1':
     ovm_path = posix.environ.get('_OVM_PATH')
-    _loader = _ZipResourceLoader(ovm_path)
+    z = zipimport.zipimporter(ovm_path)
+    # If the bundle has a startup image, modules and resources come from it.
+    # Otherwise each import reads and unmarshals a zip member.
+    loc = _FindBundleImage(z, ovm_path)
+    if loc:
+      offset, length = loc
+      image = InstallImage(ovm_path, offset=offset, length=length)
+      _loader = _ImageResourceLoader(image)
+    else:
+      _loader = _ZipResourceLoader(z)
 
     # Now clear them so we don't pollute the environment.  In Python, this
     # calls unsetenv().
     del posix.environ['_OVM_IS_BUNDLE']
     del posix.environ['_OVM_PATH']
 
+  elif posix.environ.get('OIL_IMAGE'):  # from build/make_image.py
+    image = InstallImage(posix.environ.get('OIL_IMAGE'))
+    _loader = _ImageResourceLoader(image)
+
   elif posix.environ.get('_OVM_RESOURCE_ROOT'):  # Unit tests set this
     root_dir = posix.environ.get('_OVM_RESOURCE_ROOT')
     _loader = _FileResourceLoader(root_dir)
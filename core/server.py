@@ -0,0 +1,250 @@
+#!/usr/bin/env python2
+"""
+server.py - Run many 'osh -c' commands in one warm process.
+
+Build tools start 'sh -c' thousands of times, and each one pays for OSH's
+startup.  Instead, start a server once:
+
+  osh --server /tmp/osh.sock &
+
+and then use the client like 'osh':
+
+  OSH_SERVER=/tmp/osh.sock bin/osh-client -c 'echo hi' arg0 arg1
+
+The client sends its argv, environment, working directory and stdin, stdout,
+and stderr over the socket (the descriptors with SCM_RIGHTS).  For each
+request, the server forks a child, which forks the shell.  The shell starts
+from the server's pristine state and resets its Mem, so the command runs like
+'osh -c' would.  The child waits for the shell and writes its exit status back
+to the client.
+
+This module has few dependencies, so the client starts quickly.
+
+Limitations:
+- Only -c is supported, not scripts or interactive shells.
+- Signals sent to the client aren't forwarded to the shell.
+- OSH_DEBUG_DIR, OSH_HIJACK_SHEBANG, etc. are read from the server's
+  environment.
+"""
+from __future__ import print_function
+
+import errno
+import marshal
+import sys
+
+import libc
+import posix_ as posix
+
+from typing import Callable, Dict, List, Tuple
+
+# The request starts with its length, in hex.
+_HEADER_SIZE = 8
+_RECV_SIZE = 65536
+
+# A request has descriptors for stdin, stdout, and stderr.
+_NUM_FDS = 3
+
+
+def EncodeRequest(argv, environ, cwd, ppid):
+  # type: (List[str], Dict[str, str], str, int) -> str
+  payload = marshal.dumps((argv, environ, cwd, ppid))
+  return '%08x' % len(payload) + payload
+
+
+def DecodeRequest(msg):
+  # type: (str) -> Tuple[List[str], Dict[str, str], str, int]
+  argv, environ, cwd, ppid = marshal.loads(msg[_HEADER_SIZE:])
+  return argv, environ, cwd, ppid
+
+
+def _WriteAll(fd, s):
+  # type: (int, str) -> None
+  while s:
+    n = posix.write(fd, s)
+    s = s[n:]
+
+
+def _ReadRequest(conn):
+  # type: (int) -> Tuple[str, List[int]]
+  """Returns the encoded request and the descriptors sent with it."""
+  msg, fds = libc.recv_fds(conn, _RECV_SIZE)
+  if not msg:  # Connected and closed, e.g. by Serve() checking for a server
+    return msg, fds
+  if len(msg) < _HEADER_SIZE:
+    raise RuntimeError('Truncated request header')
+  total = _HEADER_SIZE + int(msg[:_HEADER_SIZE], 16)
+
+  chunks = [msg]
+  n = len(msg)
+  while n < total:
+    chunk = posix.read(conn, min(total - n, _RECV_SIZE))
+    if not chunk:
+      raise RuntimeError('Truncated request')
+    chunks.append(chunk)
+    n += len(chunk)
+  return ''.join(chunks), fds
+
+
+def _WaitStatus(pid):
+  # type: (int) -> int
+  while True:
+    try:
+      _, status = posix.waitpid(pid, 0)
+      break
+    except OSError as e:
+      if e.errno != errno.EINTR:
+        raise
+  if posix.WIFSIGNALED(status):
+    return 128 + posix.WTERMSIG(status)
+  return posix.WEXITSTATUS(status)
+
+
+def _RunShell(msg, fds, handler):
+  # type: (str, List[int], Callable) -> int
+  """In the shell process: set up fds and the working dir, then run."""
+  for i, fd in enumerate(fds):
+    posix.dup2(fd, i)  # dup2() clears FD_CLOEXEC
+  for fd in fds:
+    if fd >= _NUM_FDS:
+      posix.close(fd)
+
+  argv, environ, cwd, ppid = DecodeRequest(msg)
+  try:
+    posix.chdir(cwd)
+  except OSError as e:
+    print('osh: Couldn\'t change to %r: %s' % (cwd, posix.strerror(e.errno)),
+          file=sys.stderr)
+    return 1
+  return handler(argv, environ, ppid)
+
+
+def _HandleConnection(conn, handler):
+  # type: (int, Callable) -> None
+  """In a child of the server: run one request and report its status."""
+  status = 2
+  try:
+    msg, fds = _ReadRequest(conn)
+    if not msg:
+      return
+    if len(fds) != _NUM_FDS:
+      raise RuntimeError('Expected %d descriptors, got %d' % (_NUM_FDS,
+                         len(fds)))
+
+    pid = posix.fork()
+    if pid == 0:
+      posix.close(conn)
+      try:
+        status = _RunShell(msg, fds, handler)
+      finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        posix._exit(status)
+
+    for fd in fds:
+      posix.close(fd)
+    status = _WaitStatus(pid)
+  except (RuntimeError, ValueError, EOFError, IOError, OSError) as e:
+    print('osh --server: Bad request: %s' % e, file=sys.stderr)
+  finally:
+    try:
+      _WriteAll(conn, '%d\n' % status)
+    except OSError:
+      pass  # the client went away
+    posix._exit(0)
+
+
+def _ReapChildren():
+  # type: () -> None
+  while True:
+    try:
+      pid, _ = posix.waitpid(-1, posix.WNOHANG)
+    except OSError:  # ECHILD
+      break
+    if pid == 0:
+      break
+
+
+def Serve(sock_path, handler):
+  # type: (str, Callable) -> int
+  """Accept requests forever.
+
+  Args:
+    sock_path: the Unix socket to listen on.
+    handler: called in a fresh child with (argv, environ, ppid), after its
+      stdio and working directory have been set.  Returns an exit status.
+  """
+  try:
+    posix.close(libc.unix_connect(sock_path))
+  except IOError as e:
+    if e.errno == errno.ECONNREFUSED:  # left by a server that was killed
+      posix.unlink(sock_path)
+  else:
+    raise RuntimeError('Another server is listening on %r' % sock_path)
+
+  listen_fd = libc.unix_listen(sock_path, 128)
+  try:
+    while True:
+      _ReapChildren()
+      try:
+        conn = libc.unix_accept(listen_fd)
+      except IOError as e:
+        if e.errno == errno.EINTR:
+          continue
+        raise
+
+      pid = posix.fork()
+      if pid == 0:
+        posix.close(listen_fd)
+        _HandleConnection(conn, handler)  # doesn't return
+      posix.close(conn)
+  finally:
+    posix.close(listen_fd)
+    posix.unlink(sock_path)
+
+
+def Request(sock_path, argv, environ, cwd, ppid):
+  # type: (str, List[str], Dict[str, str], str, int) -> int
+  """Run argv in the server, with this process's stdio.  Returns the status."""
+  conn = libc.unix_connect(sock_path)
+  try:
+    msg = EncodeRequest(argv, environ, cwd, ppid)
+    n = libc.send_fds(conn, msg, range(_NUM_FDS))
+    _WriteAll(conn, msg[n:])
+
+    chunks = []
+    while True:
+      chunk = posix.read(conn, 4096)
+      if not chunk:
+        break
+      chunks.append(chunk)
+  finally:
+    posix.close(conn)
+
+  reply = ''.join(chunks)
+  try:
+    return int(reply)
+  except ValueError:
+    raise RuntimeError('Invalid reply from server: %r' % reply)
+
+
+def main(argv):
+  # type: (List[str]) -> int
+  sock_path = posix.environ.get('OSH_SERVER')
+  if not sock_path:
+    print('osh-client: OSH_SERVER should be the path of a socket',
+          file=sys.stderr)
+    return 2
+  try:
+    return Request(sock_path, argv[1:], posix.environ, posix.getcwd(),
+                   posix.getppid())
+  except (IOError, OSError) as e:
+    print('osh-client: %s: %s' % (sock_path, posix.strerror(e.errno)),
+          file=sys.stderr)
+    return 2
+  except RuntimeError as e:
+    print('osh-client: %s' % e, file=sys.stderr)
+    return 2
+
+
+if __name__ == '__main__':
+  sys.exit(main(sys.argv))
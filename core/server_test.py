@@ -0,0 +1,68 @@
+#!/usr/bin/env python2
+"""
+server_test.py: Tests for server.py
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from core import server  # module under test
+
+import posix_ as posix
+
+
+class ServerTest(unittest.TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    self.sock_path = os.path.join(self.tmp_dir, 'osh.sock')
+
+  def tearDown(self):
+    shutil.rmtree(self.tmp_dir)
+
+  def testEncodeDecode(self):
+    msg = server.EncodeRequest(['-c', 'echo hi'], {'FOO': 'bar'}, '/tmp', 42)
+    self.assertEqual(
+        (['-c', 'echo hi'], {'FOO': 'bar'}, '/tmp', 42),
+        server.DecodeRequest(msg))
+
+  def testRequest(self):
+    out_path = os.path.join(self.tmp_dir, 'out.txt')
+
+    def Handler(argv, environ, ppid):
+      with open(out_path, 'w') as f:
+        f.write('%s %s %s %d' % (' '.join(argv), environ['FOO'],
+                                 posix.getcwd(), ppid))
+      return 42
+
+    pid = posix.fork()
+    if pid == 0:
+      try:
+        server.Serve(self.sock_path, Handler)
+      finally:
+        posix._exit(1)
+
+    try:
+      for i in xrange(100):  # wait for the server
+        if os.path.exists(self.sock_path):
+          break
+        time.sleep(0.01)
+
+      # Bigger than one message
+      environ = {'FOO': 'x' * 100000}
+      status = server.Request(self.sock_path, ['-c', 'true'], environ,
+                              self.tmp_dir, 99)
+      self.assertEqual(42, status)
+      with open(out_path) as f:
+        self.assertEqual(
+            '-c true %s %s 99' % (environ['FOO'], self.tmp_dir), f.read())
+    finally:
+      posix.kill(pid, 9)
+      posix.waitpid(pid, 0)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -33,6 +33,7 @@ from osh import builtin_comp
 from osh import builtin_pure
 from osh import cmd_exec
 from osh import expr_eval
+from osh import path_index
 from osh import split
 from osh import state
 from osh import word_eval
@@ -171,6 +172,7 @@ def InitExecutor(parse_ctx=None, comp_lookup=None, arena=None, mem=None,
 
   debug_f = util.DebugFile(sys.stderr)
   exec_deps = cmd_exec.Deps()
+  exec_deps.path_index = path_index.PathIndex()
   exec_deps.search_path = state.SearchPath(mem)
   exec_deps.errfmt = errfmt
   exec_deps.job_state = job_state
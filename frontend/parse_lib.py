@@ -17,8 +17,6 @@ from frontend import reader
 from frontend import tdop
 from frontend import match
 
-from oil_lang import expr_parse
-from oil_lang import expr_to_ast
 from osh import arith_parse
 from osh import cmd_parse
 from osh import word_parse
@@ -26,6 +24,7 @@ from osh import word_parse
 from typing import Any, List, Tuple, Dict, Optional, IO, TYPE_CHECKING
 if TYPE_CHECKING:
   from core.alloc import Arena
+  from core.meta import OilGrammarLoader
   from core.util import DebugFile
   from frontend.lexer import Lexer
   from frontend.reader import _Reader
@@ -33,6 +32,8 @@ if TYPE_CHECKING:
   from osh.word_parse import WordParser
   from osh.cmd_parse import CommandParser
   from pgen2.grammar import Grammar
+  from oil_lang.expr_parse import ExprParser, ParseTreePrinter
+  from oil_lang.expr_to_ast import Transformer
   from pgen2.parse import PNode
 
 class _BaseTrail(object):
@@ -233,12 +234,46 @@ class ParseContext(object):
   """
 
   def __init__(self, arena, parse_opts, aliases, oil_grammar, trail=None,
-               one_pass_parse=False):
-    # type: (Arena, OilParseOptions, Dict[str, Any], Grammar, Optional[_BaseTrail], bool) -> None
+               one_pass_parse=False, grammar_loader=None):
+    # type: (Arena, OilParseOptions, Dict[str, Any], Grammar, Optional[_BaseTrail], bool, Optional[OilGrammarLoader]) -> None
+    """
+    Args:
+      oil_grammar: The Oil grammar, or None.  If it's None and grammar_loader
+        is passed, the grammar is loaded the first time we parse an Oil
+        expression.
+    """
     self.arena = arena
     self.parse_opts = parse_opts
     self.aliases = aliases
 
+    self.oil_grammar = oil_grammar
+    self.grammar_loader = grammar_loader
+
+    # Created by _InitOil(), so POSIX shell scripts don't import the Oil
+    # expression parser or load its grammar.
+    self.e_parser = None  # type: ExprParser
+    self.tr = None  # type: Transformer
+    self.p_printer = None  # type: ParseTreePrinter
+
+    self.parsing_expr = False  # "single-threaded" state
+
+    # Completion state lives here since it may span multiple parsers.
+    self.trail = trail or _NullTrail()
+    self.one_pass_parse = one_pass_parse
+
+  def _InitOil(self):
+    # type: () -> None
+    """Called before parsing any Oil expression."""
+    if self.e_parser is not None:
+      return
+
+    from oil_lang import expr_parse
+    from oil_lang import expr_to_ast
+
+    if self.oil_grammar is None and self.grammar_loader:
+      self.oil_grammar = self.grammar_loader.Load()
+    oil_grammar = self.oil_grammar
+
     self.e_parser = expr_parse.ExprParser(self, oil_grammar)
     # NOTE: The transformer is really a pure function.
     if oil_grammar:
@@ -248,12 +283,6 @@ class ParseContext(object):
       self.tr = None
       names = {}
 
-    self.parsing_expr = False  # "single-threaded" state
-
-    # Completion state lives here since it may span multiple parsers.
-    self.trail = trail or _NullTrail()
-    self.one_pass_parse = one_pass_parse
-
     self.p_printer = expr_parse.ParseTreePrinter(names)  # print raw nodes
 
   def _MakeLexer(self, line_reader):
@@ -315,6 +344,7 @@ class ParseContext(object):
   def _ParseOil(self, lexer, start_symbol):
     # type: (Lexer, int) -> Tuple[PNode, token]
     """Helper Oil expression parsing."""
+    self._InitOil()
     self.parsing_expr = True
     try:
       return self.e_parser.Parse(lexer, start_symbol)
@@ -329,6 +359,7 @@ class ParseContext(object):
     if self.parsing_expr:
       p_die("ShAssignment expression can't be nested like this", token=kw_token)
 
+    self._InitOil()
     self.parsing_expr = True
     try:
       pnode, last_token = self.e_parser.Parse(lexer, grammar_nt.oil_var_decl)
@@ -346,6 +377,7 @@ class ParseContext(object):
     # type: (token, Lexer) -> Tuple[command_t, token]
 
     # TODO: Create an ExprParser so it's re-entrant.
+    self._InitOil()
     pnode, last_token = self.e_parser.Parse(lexer,
                                             grammar_nt.oil_place_mutation)
     if 0:
@@ -370,6 +402,7 @@ class ParseContext(object):
   def ParseOilExpr(self, lexer, start_symbol):
     # type: (Lexer, int) -> Tuple[expr_t, token]
     """For Oil expressions that aren't assignments."""
+    self._InitOil()
     pnode, last_token = self.e_parser.Parse(lexer, start_symbol)
 
     if 0:
@@ -381,6 +414,7 @@ class ParseContext(object):
   def ParseOilForExpr(self, lexer, start_symbol):
     # type: (Lexer, int) -> Tuple[List[name_type], expr_t, token]
     """ for (x Int, y Int in foo) """
+    self._InitOil()
     pnode, last_token = self.e_parser.Parse(lexer, start_symbol)
 
     if 0:
@@ -392,6 +426,7 @@ class ParseContext(object):
   def ParseProc(self, lexer, out):
     # type: (Lexer, command__Proc) -> token
     """ proc f(x, y, @args) { """
+    self._InitOil()
     pnode, last_token = self.e_parser.Parse(lexer, grammar_nt.oil_proc)
 
     if 0:
@@ -403,6 +438,7 @@ class ParseContext(object):
   def ParseFunc(self, lexer, out):
     # type: (Lexer, command__Func) -> token
     """ func f(x Int, y Int = 0, ...args; z Int = 3, ...named) { """
+    self._InitOil()
     pnode, last_token = self.e_parser.Parse(lexer, grammar_nt.oil_func)
 
     if 0:
@@ -18,7 +18,7 @@ if TYPE_CHECKING:
 _PS2 = '> '
 
 class InteractiveLineReader(_Reader):
-  def __init__(self, arena, prompt_ev, hist_ev, line_input, prompt_state):
+  def __init__(self, arena, prompt_ev, hist_ev, hist_file, prompt_state):
     # type: (Arena, Any, Any, Any, Any) -> None
     # TODO: Hook up PromptEvaluator and history.Evaluator when they have types.
     """
@@ -28,7 +28,7 @@ class InteractiveLineReader(_Reader):
     _Reader.__init__(self, arena)
     self.prompt_ev = prompt_ev
     self.hist_ev = hist_ev
-    self.line_input = line_input  # may be None!
+    self.hist_file = hist_file  # may be None!
     self.prompt_state = prompt_state
 
     self.prev_line = None  # type: str
@@ -70,8 +70,8 @@ class InteractiveLineReader(_Reader):
       # Add the line if it's not EOL, not whitespace-only, not the same as the
       # previous line, and we have line_input.
       if (line.strip() and line != self.prev_line and
-          self.line_input is not None):
-        self.line_input.add_history(line.rstrip())  # no trailing newlines
+          self.hist_file is not None):
+        self.hist_file.Append(line.rstrip())  # no trailing newlines
         self.prev_line = line
 
     self.prompt_str = _PS2  # TODO: Do we need $PS2?  Would be easy.
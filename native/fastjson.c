@@ -0,0 +1,838 @@
+/*
+ * Encode and decode JSON, for the 'json' builtin.
+ *
+ * Strings are UTF-8 encoded bytes, i.e. Python 2 str, not unicode.  The
+ * decoder never creates unicode objects, and the encoder writes non-ASCII
+ * bytes as they are, so there's nothing to convert on either side.
+ */
+
+#include <math.h>  // isfinite()
+#include <stdarg.h>  // va_list, etc.
+#include <stdio.h>  // snprintf()
+#include <stdlib.h>
+#include <string.h>
+
+#define PY_SSIZE_T_CLEAN  // for s#
+#include <Python.h>
+
+// Deeper values are an error, so a cycle can't overflow the C stack.
+#define MAX_DEPTH 1000
+
+//
+// Decoder
+//
+
+typedef struct {
+  const char *s;
+  Py_ssize_t len;
+  Py_ssize_t pos;
+  int depth;
+} Decoder;
+
+static PyObject *decode_value(Decoder *d);
+
+static PyObject *
+decode_error(Decoder *d, const char *msg) {
+  // The message says whether we ran out of input, so a caller reading a
+  // stream can tell a truncated value from an invalid one.
+  if (d->pos >= d->len) {
+    PyErr_Format(PyExc_ValueError, "Unexpected end of input at byte %zd",
+                 d->pos);
+  } else {
+    PyErr_Format(PyExc_ValueError, "%s at byte %zd", msg, d->pos);
+  }
+  return NULL;
+}
+
+static void
+skip_space(Decoder *d) {
+  while (d->pos < d->len) {
+    char c = d->s[d->pos];
+    if (c != ' ' && c != '\t' && c != '\n' && c != '\r') {
+      break;
+    }
+    d->pos++;
+  }
+}
+
+static int
+hex_value(char c) {
+  if ('0' <= c && c <= '9') return c - '0';
+  if ('a' <= c && c <= 'f') return c - 'a' + 10;
+  if ('A' <= c && c <= 'F') return c - 'A' + 10;
+  return -1;
+}
+
+// Parse the 4 hex digits after \u, or return -1.
+static long
+decode_hex4(Decoder *d, Py_ssize_t i) {
+  if (i + 4 > d->len) {
+    return -1;
+  }
+  long code = 0;
+  for (int j = 0; j < 4; ++j) {
+    int h = hex_value(d->s[i + j]);
+    if (h < 0) {
+      return -1;
+    }
+    code = (code << 4) | h;
+  }
+  return code;
+}
+
+// Write a code point as UTF-8, returning the number of bytes.
+static int
+encode_utf8(long code, char *out) {
+  if (code < 0x80) {
+    out[0] = (char)code;
+    return 1;
+  }
+  if (code < 0x800) {
+    out[0] = (char)(0xC0 | (code >> 6));
+    out[1] = (char)(0x80 | (code & 0x3F));
+    return 2;
+  }
+  if (code < 0x10000) {
+    out[0] = (char)(0xE0 | (code >> 12));
+    out[1] = (char)(0x80 | ((code >> 6) & 0x3F));
+    out[2] = (char)(0x80 | (code & 0x3F));
+    return 3;
+  }
+  out[0] = (char)(0xF0 | (code >> 18));
+  out[1] = (char)(0x80 | ((code >> 12) & 0x3F));
+  out[2] = (char)(0x80 | ((code >> 6) & 0x3F));
+  out[3] = (char)(0x80 | (code & 0x3F));
+  return 4;
+}
+
+// d->pos is at the opening quote.
+static PyObject *
+decode_string(Decoder *d) {
+  Py_ssize_t start = d->pos + 1;
+  Py_ssize_t i = start;
+  int has_escapes = 0;
+
+  // Find the end first.  Most strings have no escapes, so they're copied
+  // with one call.
+  while (1) {
+    if (i >= d->len) {
+      d->pos = i;
+      return decode_error(d, "Unterminated string");
+    }
+    unsigned char c = d->s[i];
+    if (c == '"') {
+      break;
+    }
+    if (c < 0x20) {
+      d->pos = i;
+      return decode_error(d, "Invalid control character in string");
+    }
+    if (c == '\\') {
+      has_escapes = 1;
+      i++;  // skip the escaped char; it's checked below
+    }
+    i++;
+  }
+  Py_ssize_t end = i;
+
+  if (!has_escapes) {
+    d->pos = end + 1;
+    return PyString_FromStringAndSize(d->s + start, end - start);
+  }
+
+  // The decoded string is never longer than the escaped one.
+  PyObject *result = PyString_FromStringAndSize(NULL, end - start);
+  if (result == NULL) {
+    return NULL;
+  }
+  char *out = PyString_AS_STRING(result);
+  Py_ssize_t n = 0;
+
+  i = start;
+  while (i < end) {
+    char c = d->s[i];
+    if (c != '\\') {
+      out[n++] = c;
+      i++;
+      continue;
+    }
+    c = d->s[i + 1];
+    switch (c) {
+    case '"': out[n++] = '"'; break;
+    case '\\': out[n++] = '\\'; break;
+    case '/': out[n++] = '/'; break;
+    case 'b': out[n++] = '\b'; break;
+    case 'f': out[n++] = '\f'; break;
+    case 'n': out[n++] = '\n'; break;
+    case 'r': out[n++] = '\r'; break;
+    case 't': out[n++] = '\t'; break;
+    case 'u': {
+      long code = decode_hex4(d, i + 2);
+      if (code < 0) {
+        Py_DECREF(result);
+        d->pos = i;
+        return decode_error(d, "Invalid \\u escape");
+      }
+      i += 4;
+      // Combine a surrogate pair.  A lone surrogate is written as is.
+      if (0xD800 <= code && code < 0xDC00 && i + 2 < end &&
+          d->s[i + 2] == '\\' && d->s[i + 3] == 'u') {
+        long low = decode_hex4(d, i + 4);
+        if (0xDC00 <= low && low < 0xE000) {
+          code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00);
+          i += 6;
+        }
+      }
+      n += encode_utf8(code, out + n);
+      break;
+    }
+    default:
+      Py_DECREF(result);
+      d->pos = i;
+      return decode_error(d, "Invalid escape in string");
+    }
+    i += 2;
+  }
+
+  d->pos = end + 1;
+  if (_PyString_Resize(&result, n) < 0) {
+    return NULL;
+  }
+  return result;
+}
+
+static PyObject *
+decode_number(Decoder *d) {
+  Py_ssize_t start = d->pos;
+  Py_ssize_t i = start;
+  int is_float = 0;
+
+  if (i < d->len && d->s[i] == '-') {
+    i++;
+  }
+  if (i < d->len && d->s[i] == '0') {
+    i++;
+  } else if (i < d->len && '1' <= d->s[i] && d->s[i] <= '9') {
+    while (i < d->len && '0' <= d->s[i] && d->s[i] <= '9') i++;
+  } else {
+    d->pos = i;
+    return decode_error(d, "Invalid number");
+  }
+  if (i < d->len && d->s[i] == '.') {
+    is_float = 1;
+    i++;
+    if (!(i < d->len && '0' <= d->s[i] && d->s[i] <= '9')) {
+      d->pos = i;
+      return decode_error(d, "Expected digits after decimal point");
+    }
+    while (i < d->len && '0' <= d->s[i] && d->s[i] <= '9') i++;
+  }
+  if (i < d->len && (d->s[i] == 'e' || d->s[i] == 'E')) {
+    is_float = 1;
+    i++;
+    if (i < d->len && (d->s[i] == '+' || d->s[i] == '-')) i++;
+    if (!(i < d->len && '0' <= d->s[i] && d->s[i] <= '9')) {
+      d->pos = i;
+      return decode_error(d, "Expected digits in exponent");
+    }
+    while (i < d->len && '0' <= d->s[i] && d->s[i] <= '9') i++;
+  }
+  d->pos = i;
+
+  // The number may not be NUL-terminated, so copy it.
+  Py_ssize_t n = i - start;
+  char small[64];
+  char *buf = small;
+  if (n >= (Py_ssize_t)sizeof(small)) {
+    buf = PyMem_Malloc(n + 1);
+    if (buf == NULL) {
+      return PyErr_NoMemory();
+    }
+  }
+  memcpy(buf, d->s + start, n);
+  buf[n] = '\0';
+
+  PyObject *result;
+  if (is_float) {
+    double x = PyOS_string_to_double(buf, NULL, NULL);  // 1e999 is inf
+    result = (x == -1.0 && PyErr_Occurred()) ? NULL : PyFloat_FromDouble(x);
+  } else {
+    result = PyInt_FromString(buf, NULL, 10);  // a long if it's big
+  }
+
+  if (buf != small) {
+    PyMem_Free(buf);
+  }
+  return result;
+}
+
+static int
+expect_literal(Decoder *d, const char *word, Py_ssize_t n) {
+  if (d->pos + n <= d->len && memcmp(d->s + d->pos, word, n) == 0) {
+    d->pos += n;
+    return 1;
+  }
+  return 0;
+}
+
+// d->pos is at the opening bracket.
+static PyObject *
+decode_array(Decoder *d) {
+  PyObject *result = PyList_New(0);
+  if (result == NULL) {
+    return NULL;
+  }
+  d->pos++;
+  skip_space(d);
+  if (d->pos < d->len && d->s[d->pos] == ']') {
+    d->pos++;
+    return result;
+  }
+
+  while (1) {
+    PyObject *item = decode_value(d);
+    if (item == NULL) {
+      goto error;
+    }
+    int status = PyList_Append(result, item);
+    Py_DECREF(item);
+    if (status < 0) {
+      goto error;
+    }
+
+    skip_space(d);
+    if (d->pos < d->len && d->s[d->pos] == ',') {
+      d->pos++;
+      continue;
+    }
+    if (d->pos < d->len && d->s[d->pos] == ']') {
+      d->pos++;
+      return result;
+    }
+    decode_error(d, "Expected , or ]");
+    goto error;
+  }
+
+error:
+  Py_DECREF(result);
+  return NULL;
+}
+
+// d->pos is at the opening brace.
+static PyObject *
+decode_object(Decoder *d) {
+  PyObject *result = PyDict_New();
+  if (result == NULL) {
+    return NULL;
+  }
+  d->pos++;
+  skip_space(d);
+  if (d->pos < d->len && d->s[d->pos] == '}') {
+    d->pos++;
+    return result;
+  }
+
+  while (1) {
+    skip_space(d);
+    if (!(d->pos < d->len && d->s[d->pos] == '"')) {
+      decode_error(d, "Expected a string key");
+      goto error;
+    }
+    PyObject *key = decode_string(d);
+    if (key == NULL) {
+      goto error;
+    }
+    // Records in a stream usually have the same keys.
+    PyString_InternInPlace(&key);
+
+    skip_space(d);
+    if (!(d->pos < d->len && d->s[d->pos] == ':')) {
+      Py_DECREF(key);
+      decode_error(d, "Expected :");
+      goto error;
+    }
+    d->pos++;
+
+    PyObject *val = decode_value(d);
+    if (val == NULL) {
+      Py_DECREF(key);
+      goto error;
+    }
+    int status = PyDict_SetItem(result, key, val);
+    Py_DECREF(key);
+    Py_DECREF(val);
+    if (status < 0) {
+      goto error;
+    }
+
+    skip_space(d);
+    if (d->pos < d->len && d->s[d->pos] == ',') {
+      d->pos++;
+      continue;
+    }
+    if (d->pos < d->len && d->s[d->pos] == '}') {
+      d->pos++;
+      return result;
+    }
+    decode_error(d, "Expected , or }");
+    goto error;
+  }
+
+error:
+  Py_DECREF(result);
+  return NULL;
+}
+
+static PyObject *
+decode_value(Decoder *d) {
+  skip_space(d);
+  if (d->pos >= d->len) {
+    return decode_error(d, "Expected a value");
+  }
+
+  PyObject *result;
+  switch (d->s[d->pos]) {
+  case '"':
+    return decode_string(d);
+  case '{':
+  case '[':
+    if (++d->depth > MAX_DEPTH) {
+      return decode_error(d, "Too deeply nested");
+    }
+    result = d->s[d->pos] == '{' ? decode_object(d) : decode_array(d);
+    d->depth--;
+    return result;
+  case 't':
+    if (expect_literal(d, "true", 4)) {
+      Py_RETURN_TRUE;
+    }
+    break;
+  case 'f':
+    if (expect_literal(d, "false", 5)) {
+      Py_RETURN_FALSE;
+    }
+    break;
+  case 'n':
+    if (expect_literal(d, "null", 4)) {
+      Py_RETURN_NONE;
+    }
+    break;
+  default:
+    return decode_number(d);
+  }
+  return decode_error(d, "Invalid literal");
+}
+
+static PyObject *
+fastjson_decode(PyObject *self, PyObject *args) {
+  Decoder d;
+  d.pos = 0;
+  d.depth = 0;
+  if (!PyArg_ParseTuple(args, "s#|n", &d.s, &d.len, &d.pos)) {
+    return NULL;
+  }
+  if (d.pos < 0 || d.pos > d.len) {
+    PyErr_SetString(PyExc_ValueError, "Invalid position");
+    return NULL;
+  }
+
+  PyObject *value = decode_value(&d);
+  if (value == NULL) {
+    return NULL;
+  }
+  skip_space(&d);
+  return Py_BuildValue("(Nn)", value, d.pos);
+}
+
+//
+// Encoder
+//
+
+typedef struct {
+  char *buf;
+  Py_ssize_t len;
+  Py_ssize_t cap;
+  int indent;  // negative for one line
+} Encoder;
+
+// Typed arrays are array.array subclasses.
+static PyObject *array_type = NULL;
+
+static int
+enc_reserve(Encoder *e, Py_ssize_t n) {
+  if (e->len + n <= e->cap) {
+    return 0;
+  }
+  Py_ssize_t cap = e->cap * 2;
+  if (cap < e->len + n) {
+    cap = e->len + n;
+  }
+  char *buf = PyMem_Realloc(e->buf, cap);
+  if (buf == NULL) {
+    PyErr_NoMemory();
+    return -1;
+  }
+  e->buf = buf;
+  e->cap = cap;
+  return 0;
+}
+
+static int
+enc_write(Encoder *e, const char *s, Py_ssize_t n) {
+  if (enc_reserve(e, n) < 0) {
+    return -1;
+  }
+  memcpy(e->buf + e->len, s, n);
+  e->len += n;
+  return 0;
+}
+
+// Start a line for an item at the given depth, if we're pretty printing.
+static int
+enc_newline(Encoder *e, int depth) {
+  if (e->indent < 0) {
+    return 0;
+  }
+  Py_ssize_t n = 1 + (Py_ssize_t)e->indent * depth;
+  if (enc_reserve(e, n) < 0) {
+    return -1;
+  }
+  e->buf[e->len] = '\n';
+  memset(e->buf + e->len + 1, ' ', n - 1);
+  e->len += n;
+  return 0;
+}
+
+static int
+enc_string(Encoder *e, const char *s, Py_ssize_t n) {
+  // Worst case: every byte is \u00XX.
+  if (enc_reserve(e, 6 * n + 2) < 0) {
+    return -1;
+  }
+  char *out = e->buf + e->len;
+  *out++ = '"';
+  for (Py_ssize_t i = 0; i < n; ++i) {
+    unsigned char c = s[i];
+    if (c >= 0x20 && c != '"' && c != '\\') {
+      *out++ = c;  // including UTF-8 bytes
+      continue;
+    }
+    *out++ = '\\';
+    switch (c) {
+    case '"': *out++ = '"'; break;
+    case '\\': *out++ = '\\'; break;
+    case '\b': *out++ = 'b'; break;
+    case '\f': *out++ = 'f'; break;
+    case '\n': *out++ = 'n'; break;
+    case '\r': *out++ = 'r'; break;
+    case '\t': *out++ = 't'; break;
+    default:
+      out += sprintf(out, "u%04x", c);
+    }
+  }
+  *out++ = '"';
+  e->len = out - e->buf;
+  return 0;
+}
+
+static int
+enc_str_object(Encoder *e, PyObject *obj) {
+  if (PyString_Check(obj)) {
+    return enc_string(e, PyString_AS_STRING(obj), PyString_GET_SIZE(obj));
+  }
+  PyObject *utf8 = PyUnicode_AsUTF8String(obj);
+  if (utf8 == NULL) {
+    return -1;
+  }
+  int status = enc_string(e, PyString_AS_STRING(utf8),
+                          PyString_GET_SIZE(utf8));
+  Py_DECREF(utf8);
+  return status;
+}
+
+static int
+enc_long(Encoder *e, long x) {
+  char buf[32];
+  int n = snprintf(buf, sizeof(buf), "%ld", x);
+  return enc_write(e, buf, n);
+}
+
+static int
+enc_double(Encoder *e, double x) {
+  if (!isfinite(x)) {
+    PyErr_SetString(PyExc_ValueError, "Can't encode NaN or Infinity");
+    return -1;
+  }
+  // The shortest repr that round trips, e.g. 0.1 and 2.0
+  char *s = PyOS_double_to_string(x, 'r', 0, Py_DTSF_ADD_DOT_0, NULL);
+  if (s == NULL) {
+    return -1;
+  }
+  int status = enc_write(e, s, strlen(s));
+  PyMem_Free(s);
+  return status;
+}
+
+static int encode_value(Encoder *e, PyObject *obj, int depth);
+
+// Write an array of machine ints or doubles straight from its buffer.
+// Returns 1 if it isn't one of those types.
+static int
+enc_typed_array(Encoder *e, PyObject *obj, int depth) {
+  PyObject *typecode = PyObject_GetAttrString(obj, "typecode");
+  if (typecode == NULL) {
+    return -1;
+  }
+  char code = PyString_Check(typecode) && PyString_GET_SIZE(typecode) == 1 ?
+      PyString_AS_STRING(typecode)[0] : '\0';
+  Py_DECREF(typecode);
+  if (code != 'l' && code != 'd') {
+    return 1;  // e.g. BoolArray, which yields bools when iterated
+  }
+
+  const void *buf;
+  Py_ssize_t num_bytes;
+  if (PyObject_AsReadBuffer(obj, &buf, &num_bytes) < 0) {
+    return -1;
+  }
+  Py_ssize_t n = num_bytes / (code == 'l' ? sizeof(long) : sizeof(double));
+
+  if (enc_write(e, "[", 1) < 0) {
+    return -1;
+  }
+  for (Py_ssize_t i = 0; i < n; ++i) {
+    if (i != 0 && enc_write(e, ",", 1) < 0) {
+      return -1;
+    }
+    if (enc_newline(e, depth + 1) < 0) {
+      return -1;
+    }
+    int status = code == 'l' ? enc_long(e, ((const long *)buf)[i])
+                             : enc_double(e, ((const double *)buf)[i]);
+    if (status < 0) {
+      return -1;
+    }
+  }
+  if (n != 0 && enc_newline(e, depth) < 0) {
+    return -1;
+  }
+  return enc_write(e, "]", 1);
+}
+
+static int
+enc_sequence(Encoder *e, PyObject *obj, int depth) {
+  if (PyList_Check(obj) || PyTuple_Check(obj)) {
+    // Fast path, including StrArray.  The size is checked on each iteration,
+    // since encoding an item could call Python code that mutates the list.
+    if (enc_write(e, "[", 1) < 0) {
+      return -1;
+    }
+    Py_ssize_t i;
+    for (i = 0; i < PySequence_Fast_GET_SIZE(obj); ++i) {
+      if (i != 0 && enc_write(e, ",", 1) < 0) {
+        return -1;
+      }
+      if (enc_newline(e, depth + 1) < 0) {
+        return -1;
+      }
+      PyObject *item = PySequence_Fast_GET_ITEM(obj, i);
+      Py_INCREF(item);
+      int status = encode_value(e, item, depth + 1);
+      Py_DECREF(item);
+      if (status < 0) {
+        return -1;
+      }
+    }
+    if (i != 0 && enc_newline(e, depth) < 0) {
+      return -1;
+    }
+    return enc_write(e, "]", 1);
+  }
+
+  PyObject *it = PyObject_GetIter(obj);
+  if (it == NULL) {
+    return -1;
+  }
+  if (enc_write(e, "[", 1) < 0) {
+    goto error;
+  }
+  Py_ssize_t n = 0;
+  PyObject *item;
+  while ((item = PyIter_Next(it)) != NULL) {
+    int status = 0;
+    if (n != 0) {
+      status = enc_write(e, ",", 1);
+    }
+    if (status == 0) {
+      status = enc_newline(e, depth + 1);
+    }
+    if (status == 0) {
+      status = encode_value(e, item, depth + 1);
+    }
+    Py_DECREF(item);
+    if (status < 0) {
+      goto error;
+    }
+    n++;
+  }
+  if (PyErr_Occurred()) {
+    goto error;
+  }
+  Py_DECREF(it);
+  if (n != 0 && enc_newline(e, depth) < 0) {
+    return -1;
+  }
+  return enc_write(e, "]", 1);
+
+error:
+  Py_DECREF(it);
+  return -1;
+}
+
+static int
+enc_dict(Encoder *e, PyObject *obj, int depth) {
+  if (enc_write(e, "{", 1) < 0) {
+    return -1;
+  }
+  Py_ssize_t pos = 0;
+  Py_ssize_t n = 0;
+  PyObject *key, *val;
+  while (PyDict_Next(obj, &pos, &key, &val)) {
+    if (!PyString_Check(key) && !PyUnicode_Check(key)) {
+      PyErr_Format(PyExc_TypeError, "Keys must be strings, got %s",
+                   Py_TYPE(key)->tp_name);
+      return -1;
+    }
+    if (n != 0 && enc_write(e, ",", 1) < 0) {
+      return -1;
+    }
+    if (enc_newline(e, depth + 1) < 0) {
+      return -1;
+    }
+    if (enc_str_object(e, key) < 0) {
+      return -1;
+    }
+    if (enc_write(e, ": ", e->indent < 0 ? 1 : 2) < 0) {
+      return -1;
+    }
+    Py_INCREF(val);
+    int status = encode_value(e, val, depth + 1);
+    Py_DECREF(val);
+    if (status < 0) {
+      return -1;
+    }
+    n++;
+  }
+  if (n != 0 && enc_newline(e, depth) < 0) {
+    return -1;
+  }
+  return enc_write(e, "}", 1);
+}
+
+static int
+encode_value(Encoder *e, PyObject *obj, int depth) {
+  if (depth > MAX_DEPTH) {
+    PyErr_SetString(PyExc_ValueError,
+                    "Too deeply nested, or a container contains itself");
+    return -1;
+  }
+
+  if (obj == Py_None) {
+    return enc_write(e, "null", 4);
+  }
+  if (obj == Py_True) {
+    return enc_write(e, "true", 4);
+  }
+  if (obj == Py_False) {
+    return enc_write(e, "false", 5);
+  }
+  if (PyString_Check(obj) || PyUnicode_Check(obj)) {
+    return enc_str_object(e, obj);
+  }
+  if (PyInt_Check(obj)) {
+    return enc_long(e, PyInt_AS_LONG(obj));
+  }
+  if (PyLong_Check(obj)) {
+    PyObject *s = PyObject_Str(obj);
+    if (s == NULL) {
+      return -1;
+    }
+    int status = enc_write(e, PyString_AS_STRING(s), PyString_GET_SIZE(s));
+    Py_DECREF(s);
+    return status;
+  }
+  if (PyFloat_Check(obj)) {
+    return enc_double(e, PyFloat_AS_DOUBLE(obj));
+  }
+  if (PyDict_Check(obj)) {
+    return enc_dict(e, obj, depth);
+  }
+  if (PyObject_TypeCheck(obj, (PyTypeObject *)array_type)) {
+    int status = enc_typed_array(e, obj, depth);
+    if (status <= 0) {
+      return status;
+    }
+    // Otherwise iterate over it below.
+  }
+  if (PyList_Check(obj) || PyTuple_Check(obj) || PySequence_Check(obj)) {
+    return enc_sequence(e, obj, depth);
+  }
+
+  PyErr_Format(PyExc_TypeError, "Can't encode object of type %s as JSON",
+               Py_TYPE(obj)->tp_name);
+  return -1;
+}
+
+static PyObject *
+fastjson_encode(PyObject *self, PyObject *args) {
+  PyObject *obj;
+  Encoder e;
+  e.indent = -1;
+  if (!PyArg_ParseTuple(args, "O|i", &obj, &e.indent)) {
+    return NULL;
+  }
+
+  if (array_type == NULL) {
+    PyObject *array_mod = PyImport_ImportModule("array");
+    if (array_mod == NULL) {
+      return NULL;
+    }
+    array_type = PyObject_GetAttrString(array_mod, "array");
+    Py_DECREF(array_mod);
+    if (array_type == NULL) {
+      return NULL;
+    }
+  }
+
+  e.len = 0;
+  e.cap = 256;
+  e.buf = PyMem_Malloc(e.cap);
+  if (e.buf == NULL) {
+    return PyErr_NoMemory();
+  }
+
+  PyObject *result = NULL;
+  if (encode_value(&e, obj, 0) == 0) {
+    result = PyString_FromStringAndSize(e.buf, e.len);
+  }
+  PyMem_Free(e.buf);
+  return result;
+}
+
+#ifdef OVM_MAIN
+#include "native/fastjson.c/methods.def"
+#else
+static PyMethodDef methods[] = {
+  // (s, pos=0) -> (value, end_pos).  Decodes one value starting at pos, and
+  // skips the whitespace after it.  Raises ValueError.
+  {"decode", fastjson_decode, METH_VARARGS, ""},
+  // (obj, indent=-1) -> str.  A negative indent writes one line.  Raises
+  // TypeError or ValueError.
+  {"encode", fastjson_encode, METH_VARARGS, ""},
+  {NULL, NULL},
+};
+#endif
+
+void initfastjson(void) {
+  Py_InitModule("fastjson", methods);
+}
@@ -0,0 +1,106 @@
+#!/usr/bin/env python2
+"""
+fastjson_test.py: Tests for fastjson
+"""
+from __future__ import print_function
+
+import unittest
+
+from oil_lang import objects
+
+import fastjson  # module under test
+
+
+def _Decode(s):
+  value, end = fastjson.decode(s)
+  assert end == len(s), (end, len(s))
+  return value
+
+
+class FastJsonTest(unittest.TestCase):
+
+  def testDecode(self):
+    self.assertEqual(
+        {'a': [1, -2.5, True, False, None], 'b': {}, 'c': []},
+        _Decode(' {"a": [1, -2.5e0, true, false, null], "b": {}, "c": []} '))
+    self.assertEqual(10 ** 30, _Decode('1000000000000000000000000000000'))
+    self.assertEqual(float('inf'), _Decode('1e999'))
+
+    # Strings are UTF-8 bytes
+    s = _Decode(r'"a\tb \"q\" \\ \/ \u00e9 \ud83d\ude00 \ud800"')
+    self.assertEqual(str, type(s))
+    self.assertEqual(
+        'a\tb "q" \\ / \xc3\xa9 \xf0\x9f\x98\x80 \xed\xa0\x80', s)
+    self.assertEqual('\xc3\xa9', _Decode('"\xc3\xa9"'))
+
+  def testDecodeStream(self):
+    s = '{"x": 1}\n{"x": 2}\n'
+    value, pos = fastjson.decode(s)
+    self.assertEqual(({'x': 1}, 9), (value, pos))
+    value, pos = fastjson.decode(s, pos)
+    self.assertEqual(({'x': 2}, len(s)), (value, pos))
+
+  def testDecodeErrors(self):
+    for s, msg in [
+        ('', 'Unexpected end of input at byte 0'),
+        ('[1, 2', 'Unexpected end of input'),
+        ('"abc', 'Unexpected end of input'),
+        ('[1 2]', 'Expected , or ] at byte 3'),
+        ('{1: 2}', 'Expected a string key at byte 1'),
+        ('{"a" 2}', 'Expected : at byte 5'),
+        ('tru', 'Invalid literal'),
+        ('01', None),  # trailing data
+        ('-', 'Unexpected end of input'),
+        ('1.', 'Unexpected end of input'),
+        ('"\\x"', 'Invalid escape in string at byte 1'),
+        ('"\\u12"', 'Invalid \\u escape'),
+        ('"a\nb"', 'Invalid control character'),
+        ('[' * 2000, 'Too deeply nested'),
+        ]:
+      try:
+        value, end = fastjson.decode(s)
+      except ValueError as e:
+        self.assertIn(msg, str(e))
+      else:
+        self.assertEqual(None, msg)
+        self.assertNotEqual(len(s), end)
+
+  def testEncode(self):
+    self.assertEqual('null', fastjson.encode(None))
+    self.assertEqual('[true,false,1,-2.5,2.0,100000000000000000000]',
+                     fastjson.encode([True, False, 1, -2.5, 2.0, 10 ** 20]))
+    self.assertEqual(r'"a\tb \"q\" \\ \u0001 ' + '\xc3\xa9"',
+                     fastjson.encode('a\tb "q" \\ \x01 \xc3\xa9'))
+    self.assertEqual('"\xc3\xa9"', fastjson.encode(u'\xe9'))
+    self.assertEqual('{"a":[]}', fastjson.encode({'a': ()}))
+
+    self.assertEqual('{\n  "a": [\n    1,\n    2\n  ],\n  "b": {}\n}',
+                     fastjson.encode({'a': [1, 2], 'b': {}}, 2))
+
+    self.assertRaises(TypeError, fastjson.encode, {1: 2})
+    self.assertRaises(TypeError, fastjson.encode, object())
+    self.assertRaises(ValueError, fastjson.encode, float('nan'))
+    a = []
+    a.append(a)
+    self.assertRaises(ValueError, fastjson.encode, a)
+
+  def testEncodeTypedArrays(self):
+    self.assertEqual('[1,-2,3]', fastjson.encode(objects.IntArray([1, -2, 3])))
+    self.assertEqual('[0.5,2.0]', fastjson.encode(objects.FloatArray([0.5, 2])))
+    self.assertEqual('[true,false]',
+                     fastjson.encode(objects.BoolArray([True, False])))
+    self.assertEqual('["a","b"]', fastjson.encode(objects.StrArray(['a', 'b'])))
+    self.assertEqual('[\n  1\n]', fastjson.encode(objects.IntArray([1]), 2))
+    self.assertEqual('[]', fastjson.encode(objects.IntArray()))
+
+    m = objects.Match('ab', (0, 2, 1, 2))
+    self.assertEqual('["ab","b"]', fastjson.encode(m))
+
+  def testRoundTrip(self):
+    obj = {'name': 'caf\xc3\xa9', 'n': [1, 2.5, None, {'x': ['\n']}]}
+    for indent in (-1, 0, 2):
+      self.assertEqual(obj, _Decode(fastjson.encode(obj, indent)))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -18,6 +18,16 @@
 #include <fnmatch.h>
 #include <glob.h>
 #include <regex.h>
+#include <dirent.h>  // DT_DIR, etc.
+#include <fcntl.h>  // openat()
+#include <pthread.h>
+#include <stdint.h>
+#include <string.h>
+#include <sys/socket.h>
+#include <sys/stat.h>
+#include <sys/syscall.h>  // SYS_getdents64
+#include <sys/un.h>
+#include <unistd.h>
 
 #include <Python.h>
 
@@ -157,6 +167,465 @@ func_glob(PyObject *self, PyObject *args) {
   return matches;
 }
 
+// Recursive globbing for shopt -s globstar.
+//
+// glob(3) doesn't know about **, so we walk the tree ourselves.  The pattern
+// is passed in already split on /, and each directory is matched against the
+// SET of pattern components that are "active" at that depth.  A ** component
+// stays active as we descend, which is how it matches zero or more
+// directories.  (This is a small NFA; the set is a 64-bit mask.)
+//
+// Directories are read with openat() and getdents64() on Linux, and d_type
+// lets us avoid a stat() per entry.  Wide trees are walked by a small pool of
+// threads sharing a work stack, with the GIL released.  Like bash, the results
+// are sorted as a whole at the end.
+
+#define GLOBSTAR_MAX_PARTS 64
+#define GLOBSTAR_MAX_THREADS 16
+
+typedef struct {
+  char* path;  // display path, e.g. "" for the root or "src/core"
+  uint64_t states;  // active pattern components
+} WalkItem;
+
+typedef struct {
+  char** items;
+  size_t len;
+  size_t cap;
+} StrVec;
+
+typedef struct {
+  // Immutable during the walk
+  const char* parts[GLOBSTAR_MAX_PARTS];
+  int star2[GLOBSTAR_MAX_PARTS];  // is the component exactly ** ?
+  int num_parts;
+  int dirs_only;  // pattern had a trailing /
+  int dotglob;
+  int fnm_flags;
+
+  // Shared work stack, protected by mu
+  pthread_mutex_t mu;
+  pthread_cond_t cv;
+  WalkItem* stack;
+  size_t stack_len;
+  size_t stack_cap;
+  int num_busy;  // workers currently processing an item
+  int oom;
+} Walker;
+
+typedef struct {
+  Walker* w;
+  StrVec results;
+  pthread_t tid;
+} Worker;
+
+static int strvec_push(StrVec* v, char* s) {
+  if (v->len == v->cap) {
+    size_t new_cap = v->cap ? v->cap * 2 : 64;
+    char** p = (char**) realloc(v->items, new_cap * sizeof(char*));
+    if (p == NULL) {
+      return -1;
+    }
+    v->items = p;
+    v->cap = new_cap;
+  }
+  v->items[v->len++] = s;
+  return 0;
+}
+
+// Follow epsilon transitions: a ** can match zero directories.
+static uint64_t globstar_closure(Walker* w, uint64_t states) {
+  int i;
+  for (i = 0; i < w->num_parts - 1; ++i) {
+    if ((states & (1ULL << i)) && w->star2[i]) {
+      states |= 1ULL << (i + 1);
+    }
+  }
+  return states;
+}
+
+static char* globstar_join(const char* dir, const char* name) {
+  size_t dir_len = strlen(dir);
+  size_t name_len = strlen(name);
+  char* s = (char*) malloc(dir_len + name_len + 2);
+  if (s == NULL) {
+    return NULL;
+  }
+  char* p = s;
+  if (dir_len) {
+    memcpy(p, dir, dir_len);
+    p += dir_len;
+    if (dir[dir_len - 1] != '/') {
+      *p++ = '/';
+    }
+  }
+  memcpy(p, name, name_len + 1);
+  return s;
+}
+
+// Push a directory to visit.  Takes ownership of path.
+static void globstar_push(Walker* w, char* path, uint64_t states) {
+  pthread_mutex_lock(&w->mu);
+  if (w->stack_len == w->stack_cap) {
+    size_t new_cap = w->stack_cap ? w->stack_cap * 2 : 64;
+    WalkItem* p = (WalkItem*) realloc(w->stack, new_cap * sizeof(WalkItem));
+    if (p == NULL) {
+      w->oom = 1;
+      pthread_mutex_unlock(&w->mu);
+      free(path);
+      return;
+    }
+    w->stack = p;
+    w->stack_cap = new_cap;
+  }
+  w->stack[w->stack_len].path = path;
+  w->stack[w->stack_len].states = states;
+  w->stack_len++;
+  pthread_cond_signal(&w->cv);
+  pthread_mutex_unlock(&w->mu);
+}
+
+// Does the entry refer to a directory?  Symlinks are followed, like glob().
+static int globstar_is_dir(int dir_fd, const char* name, int d_type) {
+  if (d_type == DT_DIR) {
+    return 1;
+  }
+  if (d_type != DT_LNK && d_type != DT_UNKNOWN) {
+    return 0;
+  }
+  struct stat st;
+  if (fstatat(dir_fd, name, &st, 0) < 0) {
+    return 0;
+  }
+  return S_ISDIR(st.st_mode);
+}
+
+// Match one directory entry against the active states, recording a result
+// and/or queueing the entry as a directory to descend into.
+static void globstar_entry(Worker* worker, int dir_fd, const char* dir_path,
+                           uint64_t states, const char* name, int d_type) {
+  Walker* w = worker->w;
+  int n = w->num_parts;
+
+  if (d_type == DT_UNKNOWN) {
+    struct stat st;
+    if (fstatat(dir_fd, name, &st, AT_SYMLINK_NOFOLLOW) == 0) {
+      if (S_ISDIR(st.st_mode)) {
+        d_type = DT_DIR;
+      } else if (S_ISLNK(st.st_mode)) {
+        d_type = DT_LNK;
+      } else {
+        d_type = DT_REG;  // anything that isn't a directory or a link
+      }
+    }
+  }
+
+  int hidden = name[0] == '.';
+  int matched = 0;  // the entry itself is a result
+  int matched_then_star2 = 0;  // matched, and only a trailing ** remains
+  uint64_t child = 0;
+  int is_dir = -1;  // lazily computed, may need a stat()
+
+  int i;
+  for (i = 0; i < n; ++i) {
+    if (!(states & (1ULL << i))) {
+      continue;
+    }
+    if (w->star2[i]) {
+      // Like bash, ** doesn't match hidden files, and it doesn't descend into
+      // symlinks to directories.
+      if (hidden && !w->dotglob) {
+        continue;
+      }
+      if (i == n - 1) {
+        matched = 1;
+      }
+      if (d_type == DT_DIR) {
+        child |= 1ULL << i;
+      }
+    } else {
+      if (fnmatch(w->parts[i], name, w->fnm_flags) != 0) {
+        continue;
+      }
+      if (i == n - 1) {
+        matched = 1;
+      } else {
+        if (is_dir == -1) {
+          is_dir = globstar_is_dir(dir_fd, name, d_type);
+        }
+        if (is_dir) {
+          child |= 1ULL << (i + 1);
+          if (i + 1 == n - 1 && w->star2[i + 1]) {
+            matched_then_star2 = 1;  // ** can match zero dirs
+          }
+        }
+      }
+    }
+  }
+
+  if (!matched && !matched_then_star2 && !child) {
+    return;
+  }
+
+  char* path = globstar_join(dir_path, name);
+  if (path == NULL) {
+    w->oom = 1;
+    return;
+  }
+
+  if (matched) {
+    char* result = NULL;
+    if (w->dirs_only) {
+      if (is_dir == -1) {
+        is_dir = globstar_is_dir(dir_fd, name, d_type);
+      }
+      if (is_dir) {
+        result = globstar_join(path, "");  // append /
+      }
+    } else {
+      result = strdup(path);
+    }
+    if (result && strvec_push(&worker->results, result) < 0) {
+      free(result);
+      w->oom = 1;
+    }
+  }
+  if (matched_then_star2 && !matched) {
+    // e.g. */** matches 'dir', but */**/ matches 'dir/'
+    char* result = w->dirs_only ? globstar_join(path, "") : strdup(path);
+    if (result && strvec_push(&worker->results, result) < 0) {
+      free(result);
+      w->oom = 1;
+    }
+  }
+
+  if (child) {
+    globstar_push(w, path, globstar_closure(w, child));
+  } else {
+    free(path);
+  }
+}
+
+#ifdef __linux__
+// glibc doesn't expose this struct.
+struct globstar_dirent64 {
+  uint64_t d_ino;
+  int64_t d_off;
+  unsigned short d_reclen;
+  unsigned char d_type;
+  char d_name[];
+};
+#endif
+
+static void globstar_visit(Worker* worker, WalkItem* item) {
+  const char* open_path = item->path[0] ? item->path : ".";
+  int fd = openat(AT_FDCWD, open_path,
+                  O_RDONLY | O_DIRECTORY | O_NONBLOCK | O_CLOEXEC);
+  if (fd < 0) {
+    return;  // like glob() without GLOB_ERR, unreadable dirs are skipped
+  }
+
+#ifdef __linux__
+  char buf[32 * 1024];
+  while (1) {
+    long nread = syscall(SYS_getdents64, fd, buf, sizeof(buf));
+    if (nread <= 0) {
+      break;
+    }
+    long pos = 0;
+    while (pos < nread) {
+      struct globstar_dirent64* d = (struct globstar_dirent64*) (buf + pos);
+      pos += d->d_reclen;
+      const char* name = d->d_name;
+      if (name[0] == '.' &&
+          (name[1] == '\0' || (name[1] == '.' && name[2] == '\0'))) {
+        continue;
+      }
+      globstar_entry(worker, fd, item->path, item->states, name, d->d_type);
+    }
+  }
+  close(fd);
+#else
+  DIR* dir = fdopendir(fd);
+  if (dir == NULL) {
+    close(fd);
+    return;
+  }
+  struct dirent* d;
+  while ((d = readdir(dir)) != NULL) {
+    const char* name = d->d_name;
+    if (name[0] == '.' &&
+        (name[1] == '\0' || (name[1] == '.' && name[2] == '\0'))) {
+      continue;
+    }
+    globstar_entry(worker, fd, item->path, item->states, name, d->d_type);
+  }
+  closedir(dir);  // also closes fd
+#endif
+}
+
+static void* globstar_worker(void* arg) {
+  Worker* worker = (Worker*) arg;
+  Walker* w = worker->w;
+
+  pthread_mutex_lock(&w->mu);
+  while (1) {
+    while (w->stack_len == 0 && w->num_busy > 0) {
+      pthread_cond_wait(&w->cv, &w->mu);
+    }
+    if (w->stack_len == 0 || w->oom) {
+      break;  // nothing left to do, and nobody can produce more work
+    }
+    WalkItem item = w->stack[--w->stack_len];
+    w->num_busy++;
+    pthread_mutex_unlock(&w->mu);
+
+    globstar_visit(worker, &item);
+    free(item.path);
+
+    pthread_mutex_lock(&w->mu);
+    w->num_busy--;
+    if (w->num_busy == 0 && w->stack_len == 0) {
+      pthread_cond_broadcast(&w->cv);  // wake up idle workers so they exit
+    }
+  }
+  pthread_cond_broadcast(&w->cv);
+  pthread_mutex_unlock(&w->mu);
+  return NULL;
+}
+
+static int globstar_compare(const void* a, const void* b) {
+  return strcoll(*(const char**) a, *(const char**) b);
+}
+
+static PyObject *
+func_globstar(PyObject *self, PyObject *args) {
+  const char* root;
+  PyObject* parts_list;
+  int dirs_only;
+  int dotglob;
+  int num_threads;
+  if (!PyArg_ParseTuple(args, "sO!iii", &root, &PyList_Type, &parts_list,
+                        &dirs_only, &dotglob, &num_threads)) {
+    return NULL;
+  }
+
+  Py_ssize_t n = PyList_Size(parts_list);
+  if (n == 0 || n > GLOBSTAR_MAX_PARTS) {
+    PyErr_SetString(PyExc_ValueError, "globstar: too many path components");
+    return NULL;
+  }
+
+  Walker w;
+  memset(&w, 0, sizeof(w));
+  Py_ssize_t i;
+  for (i = 0; i < n; ++i) {
+    PyObject* s = PyList_GetItem(parts_list, i);  // borrowed; list outlives w
+    if (!PyString_Check(s)) {
+      PyErr_SetString(PyExc_TypeError, "globstar: expected list of strings");
+      return NULL;
+    }
+    w.parts[i] = PyString_AS_STRING(s);
+    w.star2[i] = strcmp(w.parts[i], "**") == 0;
+  }
+  w.num_parts = n;
+  w.dirs_only = dirs_only;
+  w.dotglob = dotglob;
+  w.fnm_flags = dotglob ? 0 : FNM_PERIOD;
+#ifdef __GLIBC__
+  w.fnm_flags |= FNM_EXTMATCH;
+#endif
+
+  if (num_threads <= 0) {
+    long ncpu = sysconf(_SC_NPROCESSORS_ONLN);
+    num_threads = ncpu > 0 ? ncpu : 1;
+  }
+  if (num_threads > GLOBSTAR_MAX_THREADS) {
+    num_threads = GLOBSTAR_MAX_THREADS;
+  }
+
+  char* root_copy = strdup(root);
+  if (root_copy == NULL) {
+    return PyErr_NoMemory();
+  }
+
+  Worker workers[GLOBSTAR_MAX_THREADS];
+  memset(workers, 0, sizeof(workers));
+  StrVec all = {NULL, 0, 0};
+
+  Py_BEGIN_ALLOW_THREADS
+  pthread_mutex_init(&w.mu, NULL);
+  pthread_cond_init(&w.cv, NULL);
+
+  uint64_t start = globstar_closure(&w, 1ULL);
+  globstar_push(&w, root_copy, start);
+
+  int t;
+  int num_started = 0;
+  for (t = 0; t < num_threads; ++t) {
+    workers[t].w = &w;
+    if (t == 0) {
+      continue;  // the calling thread is worker 0
+    }
+    if (pthread_create(&workers[t].tid, NULL, globstar_worker,
+                       &workers[t]) != 0) {
+      break;  // run with fewer threads
+    }
+    num_started = t;
+  }
+  globstar_worker(&workers[0]);
+  for (t = 1; t <= num_started; ++t) {
+    pthread_join(workers[t].tid, NULL);
+  }
+
+  // Anything left over is from an early exit due to OOM.
+  size_t k;
+  for (k = 0; k < w.stack_len; ++k) {
+    free(w.stack[k].path);
+  }
+  free(w.stack);
+  pthread_cond_destroy(&w.cv);
+  pthread_mutex_destroy(&w.mu);
+
+  // Merge and sort the results of all workers.
+  for (t = 0; t <= num_started; ++t) {
+    StrVec* v = &workers[t].results;
+    for (k = 0; k < v->len; ++k) {
+      if (strvec_push(&all, v->items[k]) < 0) {
+        free(v->items[k]);
+        w.oom = 1;
+      }
+    }
+    free(v->items);
+  }
+  if (all.len) {
+    qsort(all.items, all.len, sizeof(char*), globstar_compare);
+  }
+  Py_END_ALLOW_THREADS
+
+  PyObject* matches = NULL;
+  if (w.oom) {
+    PyErr_NoMemory();
+  } else {
+    matches = PyList_New(all.len);
+  }
+  size_t j;
+  for (j = 0; j < all.len; ++j) {
+    if (matches) {
+      PyObject* m = PyString_FromString(all.items[j]);
+      if (m == NULL) {
+        Py_CLEAR(matches);
+      } else {
+        PyList_SET_ITEM(matches, j, m);
+      }
+    }
+    free(all.items[j]);
+  }
+  free(all.items);
+
+  return matches;
+}
+
 static PyObject *
 func_regex_parse(PyObject *self, PyObject *args) {
   const char* pattern;
@@ -294,6 +763,122 @@ func_regex_match(PyObject *self, PyObject *args) {
   return ret;
 }
 
+// A compiled regex, so callers can avoid calling regcomp() on every match.
+// It's an opaque PyCapsule that owns a regex_t.
+
+#define REGEX_CAPSULE_NAME "libc.regex"
+
+static void regex_capsule_free(PyObject* capsule) {
+  regex_t* pat = (regex_t*) PyCapsule_GetPointer(capsule, REGEX_CAPSULE_NAME);
+  if (pat) {
+    regfree(pat);
+    free(pat);
+  }
+}
+
+static PyObject *
+func_regex_compile(PyObject *self, PyObject *args) {
+  const char* pattern;
+  if (!PyArg_ParseTuple(args, "s", &pattern)) {
+    return NULL;
+  }
+
+  regex_t* pat = (regex_t*) malloc(sizeof(regex_t));
+  if (pat == NULL) {
+    return PyErr_NoMemory();
+  }
+  if (regcomp(pat, pattern, REG_EXTENDED) != 0) {
+    free(pat);
+    PyErr_SetString(PyExc_RuntimeError,
+                    "Invalid regex syntax (func_regex_compile)");
+    return NULL;
+  }
+
+  PyObject* capsule = PyCapsule_New(pat, REGEX_CAPSULE_NAME,
+                                    regex_capsule_free);
+  if (capsule == NULL) {
+    regfree(pat);
+    free(pat);
+  }
+  return capsule;
+}
+
+// Match a compiled regex against str[pos:end].  Returns a tuple of (start,
+// end) offsets for the whole match and every group, flattened, or None if
+// there's no match.  Groups that didn't participate are (-1, -1).
+//
+// ^ matches at pos, and $ matches at end.
+static PyObject *
+func_regex_search(PyObject *self, PyObject *args) {
+  PyObject* capsule;
+  const char* str;
+  int str_len;
+  int pos;
+  int end;
+  if (!PyArg_ParseTuple(args, "Os#ii", &capsule, &str, &str_len, &pos,
+                        &end)) {
+    return NULL;
+  }
+  regex_t* pat = (regex_t*) PyCapsule_GetPointer(capsule, REGEX_CAPSULE_NAME);
+  if (pat == NULL) {
+    return NULL;
+  }
+  if (pos < 0 || end > str_len || pos > end) {
+    PyErr_SetString(PyExc_IndexError, "regex_search: invalid range");
+    return NULL;
+  }
+
+  int outlen = pat->re_nsub + 1;
+  regmatch_t *pmatch = (regmatch_t*) malloc(sizeof(regmatch_t) * outlen);
+  if (pmatch == NULL) {
+    return PyErr_NoMemory();
+  }
+
+  int result;
+  int base;  // offsets are relative to this position in str
+#ifdef REG_STARTEND
+  // NOTE: glibc only matches ^ at the real start of the string, so offset the
+  // string instead of setting rm_so.
+  pmatch[0].rm_so = 0;
+  pmatch[0].rm_eo = end - pos;
+  result = regexec(pat, str + pos, outlen, pmatch, REG_STARTEND);
+  base = pos;
+#else
+  char* sub = strndup(str + pos, end - pos);
+  if (sub == NULL) {
+    free(pmatch);
+    return PyErr_NoMemory();
+  }
+  result = regexec(pat, sub, outlen, pmatch, 0);
+  free(sub);
+  base = pos;
+#endif
+
+  if (result != 0) {
+    free(pmatch);
+    Py_RETURN_NONE;
+  }
+
+  PyObject* ret = PyTuple_New(outlen * 2);
+  if (ret == NULL) {
+    free(pmatch);
+    return NULL;
+  }
+  int i;
+  for (i = 0; i < outlen; i++) {
+    long start = -1;
+    long stop = -1;
+    if (pmatch[i].rm_so != -1) {
+      start = base + pmatch[i].rm_so;
+      stop = base + pmatch[i].rm_eo;
+    }
+    PyTuple_SET_ITEM(ret, 2 * i, PyInt_FromLong(start));
+    PyTuple_SET_ITEM(ret, 2 * i + 1, PyInt_FromLong(stop));
+  }
+  free(pmatch);
+  return ret;
+}
+
 // For ${//}, the number of groups is always 1, so we want 2 match position
 // results -- the whole regex (which we ignore), and then first group.
 //
@@ -338,6 +923,153 @@ func_regex_first_group_match(PyObject *self, PyObject *args) {
   return Py_BuildValue("(i,i)", pos + start, pos + end);
 }
 
+// UTF-8 helpers for ${#s} and ${s:i:n}.  They validate like
+// osh/string_ops.py, and return a negative error code on invalid UTF-8 rather
+// than raising, so the caller can construct the right exception.
+
+#define UTF8_INCOMPLETE_CHAR -1
+#define UTF8_INVALID_CONT -2
+#define UTF8_INVALID_START -3
+
+// Return the byte position of the char after s[i], or an error code.
+static Py_ssize_t utf8_next(const unsigned char* s, Py_ssize_t i,
+                            Py_ssize_t n) {
+  unsigned char b = s[i];
+  int num_bytes;
+  if ((b >> 7) == 0) {
+    return i + 1;
+  } else if ((b >> 5) == 0x6) {
+    num_bytes = 2;
+  } else if ((b >> 4) == 0xE) {
+    num_bytes = 3;
+  } else if ((b >> 3) == 0x1E) {
+    num_bytes = 4;
+  } else {
+    return UTF8_INVALID_START;
+  }
+  int k;
+  for (k = 1; k < num_bytes; ++k) {
+    if (i + k >= n) {
+      return UTF8_INCOMPLETE_CHAR;
+    }
+    if ((s[i + k] >> 6) != 0x2) {
+      return UTF8_INVALID_CONT;
+    }
+  }
+  return i + num_bytes;
+}
+
+// Skip a run of ASCII bytes, starting at i, without passing 'limit' chars.
+static Py_ssize_t utf8_skip_ascii(const unsigned char* s, Py_ssize_t i,
+                                  Py_ssize_t n, Py_ssize_t limit) {
+  Py_ssize_t end = (n - i < limit) ? n : i + limit;
+  while (i < end && s[i] < 0x80) {
+    i++;
+  }
+  return i;
+}
+
+static PyObject *
+func_utf8_count(PyObject *self, PyObject *args) {
+  const unsigned char* s;
+  int n;  // the length for s# is an int without PY_SSIZE_T_CLEAN
+  if (!PyArg_ParseTuple(args, "s#", &s, &n)) {
+    return NULL;
+  }
+  Py_ssize_t num_chars = 0;
+  Py_ssize_t i = 0;
+  while (i < n) {
+    Py_ssize_t j = utf8_skip_ascii(s, i, n, n);
+    num_chars += j - i;
+    i = j;
+    if (i == n) {
+      break;
+    }
+    i = utf8_next(s, i, n);
+    if (i < 0) {
+      return PyInt_FromSsize_t(i);
+    }
+    num_chars++;
+  }
+  return PyInt_FromSsize_t(num_chars);
+}
+
+static PyObject *
+func_utf8_advance(PyObject *self, PyObject *args) {
+  const unsigned char* s;
+  int n;
+  Py_ssize_t num_chars;
+  Py_ssize_t i;
+  if (!PyArg_ParseTuple(args, "s#nn", &s, &n, &num_chars, &i)) {
+    return NULL;
+  }
+  while (num_chars > 0 && i < n) {
+    Py_ssize_t j = utf8_skip_ascii(s, i, n, num_chars);
+    num_chars -= j - i;
+    i = j;
+    if (num_chars == 0 || i == n) {
+      break;
+    }
+    i = utf8_next(s, i, n);
+    if (i < 0) {
+      break;  // return the error code
+    }
+    num_chars--;
+  }
+  return PyInt_FromSsize_t(i);
+}
+
+// Return (num_chars, offsets) for a valid UTF-8 string, where offsets is a
+// list of the byte offsets of chars 0, stride, 2*stride, etc.  offsets is None
+// if the string is ASCII, since char and byte offsets are the same.  Returns
+// None if the string isn't valid UTF-8.
+static PyObject *
+func_utf8_index(PyObject *self, PyObject *args) {
+  const unsigned char* s;
+  int n;
+  Py_ssize_t stride;
+  if (!PyArg_ParseTuple(args, "s#n", &s, &n, &stride)) {
+    return NULL;
+  }
+  if (stride <= 0) {
+    PyErr_SetString(PyExc_ValueError, "utf8_index: stride must be positive");
+    return NULL;
+  }
+
+  Py_ssize_t i = utf8_skip_ascii(s, 0, n, n);
+  if (i == n) {
+    return Py_BuildValue("(iO)", n, Py_None);
+  }
+
+  PyObject* offsets = PyList_New(0);
+  if (offsets == NULL) {
+    return NULL;
+  }
+  Py_ssize_t num_chars = 0;
+  i = 0;
+  while (i < n) {
+    if (num_chars % stride == 0) {
+      PyObject* offset = PyInt_FromSsize_t(i);
+      if (offset == NULL || PyList_Append(offsets, offset) < 0) {
+        Py_XDECREF(offset);
+        Py_DECREF(offsets);
+        return NULL;
+      }
+      Py_DECREF(offset);
+    }
+    i = utf8_next(s, i, n);
+    if (i < 0) {
+      Py_DECREF(offsets);
+      Py_RETURN_NONE;
+    }
+    num_chars++;
+  }
+
+  PyObject* ret = Py_BuildValue("(nO)", num_chars, offsets);
+  Py_DECREF(offsets);
+  return ret;
+}
+
 // We do this in C so we can remove '%f' % 0.1 from the CPython build.  That
 // involves dtoa.c and pystrod.c, which are thousands of lines of code.
 static PyObject *
@@ -382,6 +1114,19 @@ func_get_terminal_width(PyObject *self, PyObject *unused) {
   return PyLong_FromLong(w.ws_col);
 }
 
+static PyObject *
+func_bytes_available(PyObject *self, PyObject *args) {
+  int fd;
+  if (!PyArg_ParseTuple(args, "i", &fd)) {
+    return NULL;
+  }
+  int n;
+  if (ioctl(fd, FIONREAD, &n) < 0) {
+    return PyErr_SetFromErrno(errno_error);
+  }
+  return PyInt_FromLong(n);
+}
+
 static PyObject *
 func_wcswidth(PyObject *self, PyObject *args){
     char *string;
@@ -408,6 +1153,209 @@ func_wcswidth(PyObject *self, PyObject *args){
     return PyInt_FromLong(width);
 }
 
+// Unix domain sockets for osh --server.  Python's socket module brings in too
+// many dependencies, and Python 2 can't pass file descriptors anyway.
+
+static int
+make_unix_addr(const char *path, struct sockaddr_un *addr) {
+  if (strlen(path) >= sizeof(addr->sun_path)) {
+    PyErr_Format(PyExc_ValueError, "Socket path too long: %s", path);
+    return -1;
+  }
+  memset(addr, 0, sizeof(*addr));
+  addr->sun_family = AF_UNIX;
+  strcpy(addr->sun_path, path);
+  return 0;
+}
+
+static PyObject *
+func_unix_listen(PyObject *self, PyObject *args) {
+  const char *path;
+  int backlog;
+  if (!PyArg_ParseTuple(args, "si", &path, &backlog)) {
+    return NULL;
+  }
+  struct sockaddr_un addr;
+  if (make_unix_addr(path, &addr) < 0) {
+    return NULL;
+  }
+  int fd = socket(AF_UNIX, SOCK_STREAM | SOCK_CLOEXEC, 0);
+  if (fd < 0) {
+    return PyErr_SetFromErrno(errno_error);
+  }
+  if (bind(fd, (struct sockaddr *) &addr, sizeof(addr)) < 0 ||
+      listen(fd, backlog) < 0) {
+    int saved = errno;
+    close(fd);
+    errno = saved;
+    return PyErr_SetFromErrno(errno_error);
+  }
+  return PyInt_FromLong(fd);
+}
+
+static PyObject *
+func_unix_connect(PyObject *self, PyObject *args) {
+  const char *path;
+  if (!PyArg_ParseTuple(args, "s", &path)) {
+    return NULL;
+  }
+  struct sockaddr_un addr;
+  if (make_unix_addr(path, &addr) < 0) {
+    return NULL;
+  }
+  int fd = socket(AF_UNIX, SOCK_STREAM | SOCK_CLOEXEC, 0);
+  if (fd < 0) {
+    return PyErr_SetFromErrno(errno_error);
+  }
+  if (connect(fd, (struct sockaddr *) &addr, sizeof(addr)) < 0) {
+    int saved = errno;
+    close(fd);
+    errno = saved;
+    return PyErr_SetFromErrno(errno_error);
+  }
+  return PyInt_FromLong(fd);
+}
+
+static PyObject *
+func_unix_accept(PyObject *self, PyObject *args) {
+  int listen_fd;
+  if (!PyArg_ParseTuple(args, "i", &listen_fd)) {
+    return NULL;
+  }
+  int fd;
+  Py_BEGIN_ALLOW_THREADS
+  fd = accept4(listen_fd, NULL, NULL, SOCK_CLOEXEC);
+  Py_END_ALLOW_THREADS
+  if (fd < 0) {
+    return PyErr_SetFromErrno(errno_error);
+  }
+  return PyInt_FromLong(fd);
+}
+
+#define MAX_FDS 16
+
+static PyObject *
+func_send_fds(PyObject *self, PyObject *args) {
+  int sock_fd;
+  const char *buf;
+  int len;
+  PyObject *fd_list;
+  if (!PyArg_ParseTuple(args, "is#O!", &sock_fd, &buf, &len, &PyList_Type,
+                        &fd_list)) {
+    return NULL;
+  }
+  Py_ssize_t num_fds = PyList_Size(fd_list);
+  if (num_fds > MAX_FDS) {
+    PyErr_Format(PyExc_ValueError, "Can't send more than %d fds", MAX_FDS);
+    return NULL;
+  }
+  if (len == 0) {
+    // At least one byte of data is required to send ancillary data.
+    PyErr_SetString(PyExc_ValueError, "Message must not be empty");
+    return NULL;
+  }
+
+  int fds[MAX_FDS];
+  for (int i = 0; i < num_fds; ++i) {
+    fds[i] = PyInt_AsLong(PyList_GET_ITEM(fd_list, i));
+    if (fds[i] == -1 && PyErr_Occurred()) {
+      return NULL;
+    }
+  }
+
+  struct iovec iov;
+  iov.iov_base = (void *) buf;
+  iov.iov_len = len;
+
+  char control[CMSG_SPACE(sizeof(int) * MAX_FDS)];
+  struct msghdr msg;
+  memset(&msg, 0, sizeof(msg));
+  msg.msg_iov = &iov;
+  msg.msg_iovlen = 1;
+  if (num_fds > 0) {
+    memset(control, 0, sizeof(control));
+    msg.msg_control = control;
+    msg.msg_controllen = CMSG_SPACE(sizeof(int) * num_fds);
+    struct cmsghdr *cmsg = CMSG_FIRSTHDR(&msg);
+    cmsg->cmsg_level = SOL_SOCKET;
+    cmsg->cmsg_type = SCM_RIGHTS;
+    cmsg->cmsg_len = CMSG_LEN(sizeof(int) * num_fds);
+    memcpy(CMSG_DATA(cmsg), fds, sizeof(int) * num_fds);
+  }
+
+  ssize_t n;
+  Py_BEGIN_ALLOW_THREADS
+  n = sendmsg(sock_fd, &msg, 0);
+  Py_END_ALLOW_THREADS
+  if (n < 0) {
+    return PyErr_SetFromErrno(errno_error);
+  }
+  return PyInt_FromLong(n);
+}
+
+static PyObject *
+func_recv_fds(PyObject *self, PyObject *args) {
+  int sock_fd;
+  int buf_size;
+  if (!PyArg_ParseTuple(args, "ii", &sock_fd, &buf_size)) {
+    return NULL;
+  }
+  PyObject *data = PyString_FromStringAndSize(NULL, buf_size);
+  if (data == NULL) {
+    return NULL;
+  }
+
+  struct iovec iov;
+  iov.iov_base = PyString_AS_STRING(data);
+  iov.iov_len = buf_size;
+
+  char control[CMSG_SPACE(sizeof(int) * MAX_FDS)];
+  struct msghdr msg;
+  memset(&msg, 0, sizeof(msg));
+  msg.msg_iov = &iov;
+  msg.msg_iovlen = 1;
+  msg.msg_control = control;
+  msg.msg_controllen = sizeof(control);
+
+  ssize_t n;
+  Py_BEGIN_ALLOW_THREADS
+  n = recvmsg(sock_fd, &msg, MSG_CMSG_CLOEXEC);
+  Py_END_ALLOW_THREADS
+  if (n < 0) {
+    Py_DECREF(data);
+    return PyErr_SetFromErrno(errno_error);
+  }
+  if (_PyString_Resize(&data, n) < 0) {
+    return NULL;
+  }
+
+  PyObject *fd_list = PyList_New(0);
+  if (fd_list == NULL) {
+    Py_DECREF(data);
+    return NULL;
+  }
+  struct cmsghdr *cmsg;
+  for (cmsg = CMSG_FIRSTHDR(&msg); cmsg != NULL;
+       cmsg = CMSG_NXTHDR(&msg, cmsg)) {
+    if (cmsg->cmsg_level != SOL_SOCKET || cmsg->cmsg_type != SCM_RIGHTS) {
+      continue;
+    }
+    int num_fds = (cmsg->cmsg_len - CMSG_LEN(0)) / sizeof(int);
+    int *fds = (int *) CMSG_DATA(cmsg);
+    for (int i = 0; i < num_fds; ++i) {
+      PyObject *fd = PyInt_FromLong(fds[i]);
+      if (fd == NULL || PyList_Append(fd_list, fd) < 0) {
+        Py_XDECREF(fd);
+        Py_DECREF(fd_list);
+        Py_DECREF(data);
+        return NULL;
+      }
+      Py_DECREF(fd);
+    }
+  }
+  return Py_BuildValue("(NN)", data, fd_list);
+}
+
 #ifdef OVM_MAIN
 #include "native/libc.c/methods.def"
 #else
@@ -423,6 +1371,10 @@ static PyMethodDef methods[] = {
   // We need this since Python's glob doesn't have char classes.
   {"glob", func_glob, METH_VARARGS, ""},
 
+  // Return a sorted list of files that match a pattern containing **, given
+  // a root dir and the remaining components.  For shopt -s globstar.
+  {"globstar", func_globstar, METH_VARARGS, ""},
+
   // Compile a regex in ERE syntax, returning whether it is valid
   {"regex_parse", func_regex_parse, METH_VARARGS, ""},
 
@@ -430,11 +1382,30 @@ static PyMethodDef methods[] = {
   // match.  Raises RuntimeError if the regex is invalid.
   {"regex_match", func_regex_match, METH_VARARGS, ""},
 
+  // Compile a regex in ERE syntax, returning an opaque handle.  Raises
+  // RuntimeError if the regex is invalid.
+  {"regex_compile", func_regex_compile, METH_VARARGS, ""},
+
+  // Match a compiled regex against a range of a string.  Returns a flat tuple
+  // of (start, end) positions for the match and each group, or None.
+  {"regex_search", func_regex_search, METH_VARARGS, ""},
+
   // If the regex matches the string, return the start and end position of the
   // first group.  Returns None if there is no match.  Raises RuntimeError if
   // the regex is invalid.
   {"regex_first_group_match", func_regex_first_group_match, METH_VARARGS, ""},
 
+  // Count the chars in a UTF-8 string, or return a negative error code.
+  {"utf8_count", func_utf8_count, METH_VARARGS, ""},
+
+  // Advance a number of UTF-8 chars from a byte offset, returning a byte
+  // offset or a negative error code.
+  {"utf8_advance", func_utf8_advance, METH_VARARGS, ""},
+
+  // Return the char count and a sparse char -> byte offset index for a UTF-8
+  // string, or None if it's invalid.
+  {"utf8_index", func_utf8_index, METH_VARARGS, ""},
+
   // "Print three floating point values for the 'time' builtin.
   {"print_time", func_print_time, METH_VARARGS, ""},
 
@@ -443,8 +1414,28 @@ static PyMethodDef methods[] = {
   // ioctl() to get the terminal width.
   {"get_terminal_width", func_get_terminal_width, METH_NOARGS, ""},
 
+  // ioctl() to get the number of bytes that can be read without blocking,
+  // e.g. keys the user typed during completion.
+  {"bytes_available", func_bytes_available, METH_VARARGS, ""},
+
   // Get the display width of a string. Throw an exception if the string is invalid UTF8.
   {"wcswidth", func_wcswidth, METH_VARARGS, ""},
+
+  // Create a Unix domain socket listening on a path, returning its fd.
+  {"unix_listen", func_unix_listen, METH_VARARGS, ""},
+
+  // Connect to a Unix domain socket, returning its fd.
+  {"unix_connect", func_unix_connect, METH_VARARGS, ""},
+
+  // Accept a connection on a listening socket, returning its fd.
+  {"unix_accept", func_unix_accept, METH_VARARGS, ""},
+
+  // Send a message and a list of file descriptors with SCM_RIGHTS.
+  {"send_fds", func_send_fds, METH_VARARGS, ""},
+
+  // Receive a message of up to N bytes.  Returns the message and a list of
+  // the file descriptors sent with it.
+  {"recv_fds", func_recv_fds, METH_VARARGS, ""},
   {NULL, NULL},
 };
 #endif
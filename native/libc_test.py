@@ -9,6 +9,9 @@
 """
 libc_test.py: Tests for libc.py
 """
+import os
+import shutil
+import tempfile
 import unittest
 
 import libc  # module under test
@@ -115,6 +118,39 @@ class LibcTest(unittest.TestCase):
     # This one will match a file named \
     print(libc.glob('\\\\'))
 
+  def testGlobstar(self):
+    tmp = tempfile.mkdtemp()
+    try:
+      for d in ['a/b', 'a/.hidden', 'c']:
+        os.makedirs(os.path.join(tmp, d))
+      for f in ['top.py', 'a/x.py', 'a/b/y.py', 'a/.hidden/z.py', 'c/readme']:
+        open(os.path.join(tmp, f), 'w').close()
+
+      def Rel(results):
+        return [os.path.relpath(r, tmp) + ('/' if r.endswith('/') else '')
+                for r in results]
+
+      self.assertEqual(
+          ['a/b/y.py', 'a/x.py', 'top.py'],
+          Rel(libc.globstar(tmp, ['**', '*.py'], False, False, 0)))
+      self.assertEqual(
+          ['a/.hidden/z.py', 'a/b/y.py', 'a/x.py', 'top.py'],
+          Rel(libc.globstar(tmp, ['**', '*.py'], False, True, 0)))
+      # Directories only, with a single thread
+      self.assertEqual(
+          ['a/', 'a/b/', 'c/'],
+          Rel(libc.globstar(tmp, ['**'], True, False, 1)))
+      # ** in the middle
+      self.assertEqual(
+          ['a/b/y.py', 'a/x.py'],
+          Rel(libc.globstar(tmp, ['a', '**', '*.py'], False, False, 2)))
+      self.assertEqual(
+          [], libc.globstar(os.path.join(tmp, 'nonexistent'), ['**'], False,
+                            False, 0))
+      self.assertRaises(ValueError, libc.globstar, tmp, [], False, False, 0)
+    finally:
+      shutil.rmtree(tmp)
+
   def testRegexParse(self):
     self.assertEqual(True, libc.regex_parse(r'.*\.py'))
 
@@ -171,6 +207,23 @@ class LibcTest(unittest.TestCase):
     if 0:
       libc.regex_first_group_match("(['+-'])", s, 6)
 
+  def testRegexSearch(self):
+    r = libc.regex_compile('(X.)|(Y)')
+    s = 'oXooXoooX'
+    self.assertEqual((1, 3, 1, 3, -1, -1), libc.regex_search(r, s, 0, len(s)))
+    self.assertEqual((4, 6, 4, 6, -1, -1), libc.regex_search(r, s, 2, len(s)))
+    # The match can't extend past the end
+    self.assertEqual(None, libc.regex_search(r, s, 5, len(s)))
+    self.assertEqual(None, libc.regex_search(r, s, 0, 1))
+
+    # ^ and $ match at the ends of the range
+    r = libc.regex_compile('^(o+)$')
+    self.assertEqual((5, 8, 5, 8), libc.regex_search(r, s, 5, 8))
+    self.assertEqual(None, libc.regex_search(r, s, 5, 9))
+
+    self.assertRaises(IndexError, libc.regex_search, r, s, 0, 10)
+    self.assertRaises(RuntimeError, libc.regex_compile, r'*')
+
   def testRealpathFailOnNonexistentDirectory(self):
     # This behaviour is actually inconsistent with GNU readlink,
     # but matches behaviour of busybox readlink
@@ -4,16 +4,19 @@ builtin_funcs.py
 """
 from __future__ import print_function
 
-from _devbuild.gen.runtime_asdl import value, scope_e
-from _devbuild.gen.syntax_asdl import sh_lhs_expr
+import array
 
+from _devbuild.gen.runtime_asdl import value
+from core.util import e_die
 from oil_lang import objects
 
+from typing import Dict, Tuple
+
 
 def SetGlobalFunc(mem, name, func):
   """Used by bin/oil.py to set split(), etc."""
   assert callable(func), func
-  mem.SetVar(sh_lhs_expr.Name(name), value.Obj(func), (), scope_e.GlobalOnly)
+  mem.SetBuiltinFunc(name, value.Obj(func))
 
 
 def _Join(array, delim=''):
@@ -24,6 +27,77 @@ def _Join(array, delim=''):
   return delim.join(array)
 
 
+def _Sort(items, reverse=False):
+  """
+  func sort(items Array, reverse=false) Array
+
+  Like sorted(), but an Array[Int] stays an Array[Int], etc.
+  """
+  result = sorted(items, reverse=reverse)
+  cls = items.__class__
+  if cls is list or not isinstance(items, (list, array.array)):
+    return result
+  return cls(result)
+
+
+def _Uniq(items):
+  """
+  func uniq(items Array) Array
+
+  Remove duplicates, keeping the first of each, like awk '!seen[$0]++'.
+  Unlike uniq(1), the input doesn't have to be sorted.
+  """
+  seen = set()
+  add = seen.add
+  # 'x in seen or add(x)' is None the first time
+  result = [x for x in items if not (x in seen or add(x))]
+  cls = items.__class__
+  if cls is list or not isinstance(items, (list, array.array)):
+    return result
+  return cls(result)
+
+
+def _Merge(*dicts):
+  """
+  func merge(...dicts Dict) Dict
+
+  A new dict with the entries of each one.  Later ones win.
+  """
+  result = {}
+  for d in dicts:
+    result.update(d)
+  return result
+
+
+class _Tr(object):
+  """
+  func tr(s Str, chars Str, repl Str) Str
+
+  Like tr(1): replace the i-th byte of chars with the i-th byte of repl.  If
+  repl is empty, delete them, like tr -d.  The tables are cached, since the
+  arguments are usually constants.
+  """
+  def __init__(self):
+    self.tables = {}  # type: Dict[Tuple[str, str], str]
+
+  def __call__(self, s, chars, repl):
+    if not repl:
+      return s.translate(None, chars)
+
+    key = (chars, repl)
+    table = self.tables.get(key)
+    if table is None:
+      if len(chars) != len(repl):
+        e_die('tr() expected strings of the same length, got %d and %d',
+              len(chars), len(repl))
+      t = [chr(i) for i in xrange(256)]
+      for c, r in zip(chars, repl):
+        t[ord(c)] = r
+      table = ''.join(t)
+      self.tables[key] = table
+    return s.translate(table)
+
+
 def Init(mem):
   """Populate the top level namespace with some builtin functions."""
 
@@ -36,6 +110,23 @@ def Init(mem):
   # $IFS.
   # TODO: How to ask for Python's split algorithm?  Or Awk's?
 
+  # Strings.  Python's unbound str methods take the string as the first
+  # argument, and run in C.
+  SetGlobalFunc(mem, 'find', str.find)
+  SetGlobalFunc(mem, 'rfind', str.rfind)
+  SetGlobalFunc(mem, 'startswith', str.startswith)
+  SetGlobalFunc(mem, 'endswith', str.endswith)
+  SetGlobalFunc(mem, 'replace', str.replace)
+  SetGlobalFunc(mem, 'strip', str.strip)
+  SetGlobalFunc(mem, 'tr', _Tr())
+
+  # Arrays.  Use 'x in a' for membership.
+  SetGlobalFunc(mem, 'sort', _Sort)
+  SetGlobalFunc(mem, 'uniq', _Uniq)
+
+  # Dicts
+  SetGlobalFunc(mem, 'merge', _Merge)
+
   #
   # Borrowed from Python
   #
@@ -0,0 +1,47 @@
+#!/usr/bin/env python2
+"""
+builtin_funcs_test.py: Tests for builtin_funcs.py
+"""
+from __future__ import print_function
+
+import unittest
+
+from core import util
+from oil_lang import builtin_funcs  # module under test
+from oil_lang import objects
+
+
+class BuiltinFuncsTest(unittest.TestCase):
+
+  def testSortAndUniq(self):
+    a = objects.IntArray([3, 1, 3, 2])
+    s = builtin_funcs._Sort(a)
+    self.assertEqual(objects.IntArray, type(s))
+    self.assertEqual([1, 2, 3, 3], list(s))
+    self.assertEqual([3, 3, 2, 1], list(builtin_funcs._Sort(a, reverse=True)))
+
+    u = builtin_funcs._Uniq(a)
+    self.assertEqual(objects.IntArray, type(u))
+    self.assertEqual([3, 1, 2], list(u))
+
+    # Shell arrays are plain lists; other iterables become lists.
+    self.assertEqual(list, type(builtin_funcs._Uniq(['b', 'a', 'b'])))
+    self.assertEqual([0, 1, 2], builtin_funcs._Sort(reversed(range(3))))
+
+  def testTr(self):
+    tr = builtin_funcs._Tr()
+    self.assertEqual('h-ll-', tr('hello', 'eo', '--'))
+    self.assertEqual('hll', tr('hello', 'eo', ''))
+    self.assertEqual(1, len(tr.tables))
+    self.assertRaises(util.FatalRuntimeError, tr, 'hello', 'eo', '-')
+
+  def testMerge(self):
+    a = {'x': 1}
+    d = builtin_funcs._Merge(a, {'x': 2, 'y': 3})
+    self.assertEqual({'x': 2, 'y': 3}, d)
+    self.assertEqual({'x': 1}, a)
+    self.assertEqual({}, builtin_funcs._Merge())
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -10,13 +10,26 @@ It's sort of like xargs too.
 """
 from __future__ import print_function
 
+import errno
 import sys
 
-from _devbuild.gen.runtime_asdl import value_e
+from _devbuild.gen.runtime_asdl import lvalue, value, value_e, scope_e
 
 from core.util import log
 from frontend import args
 from frontend import match
+from oil_lang import objects
+from oil_lang import tsv2
+
+import fastjson
+import posix_ as posix
+
+# Indent for 'json write'.  -i 0 writes one line.
+_JSON_INDENT = 2
+_READ_BLOCK_SIZE = 1 << 16
+
+# Rows per batch when 'tsv2 read' is passed a block
+_TSV2_BATCH_SIZE = 10000
 
 
 class Repr(object):
@@ -163,51 +176,253 @@ class Opts(object):
     raise NotImplementedError
 
 
+JSON_WRITE_SPEC = args.BuiltinFlags()
+JSON_WRITE_SPEC.ShortFlag('-i', args.Int)  # indent
+
+JSON_READ_SPEC = args.BuiltinFlags()
+JSON_READ_SPEC.ShortFlag('-l')  # one record per line (NDJSON)
+
+
+def _ReadVarName(arg_r):
+  var_name, var_spid = arg_r.ReadRequired2('requires a variable name')
+  if var_name.startswith(':'):  # optional : sigil
+    var_name = var_name[1:]
+  if not match.IsValidVarName(var_name):
+    raise args.UsageError('got invalid variable name %r' % var_name,
+                          span_id=var_spid)
+  return var_name, var_spid
+
+
+def _ReadBlocks(fd):
+  """Yield blocks of a file descriptor until EOF."""
+  while True:
+    try:
+      data = posix.read(fd, _READ_BLOCK_SIZE)
+    except OSError as e:
+      if e.errno == errno.EINTR:
+        continue
+      raise
+    if not data:
+      break
+    yield data
+
+
+def _ReadLines(fd):
+  """Yield the lines of a file descriptor, without newlines."""
+  partial = ''
+  for data in _ReadBlocks(fd):
+    lines = (partial + data).split('\n')
+    partial = lines.pop()
+    for line in lines:
+      yield line
+  if partial:  # no newline at the end
+    yield partial
+
+
+def _JsonObj(val):
+  """Convert value_t to an object that fastjson can encode."""
+  if val.tag == value_e.Str:
+    return val.s
+  if val.tag == value_e.MaybeStrArray:
+    return val.strs  # None is null
+  if val.tag == value_e.AssocArray:
+    return val.d
+  if val.tag == value_e.Obj:
+    return val.obj  # dicts, lists, and typed arrays are encoded directly
+  raise AssertionError(val.tag)
+
+
+def _JsonValue(obj):
+  """Convert a decoded object to value_t."""
+  if isinstance(obj, str):
+    return value.Str(obj)
+  return value.Obj(obj)
+
+
 class Json(object):
   """Json I/O.
 
-  -indent pretty prints it.  Is the default indent 2?  -pretty=0 can turn it
-  off.
-
-  json echo -indent 2 :var1 :var2 {
+  json write :d           # pretty printed with an indent of 2
+  json write -i 0 :d      # on one line
+  json write {            # the variables defined in the block
     x = 1
     d = {name: 'andy'}
   }
 
-  json read :x < foo.tsv2
+  json read :d < foo.json
+
+  # Streaming: run the block for each line of NDJSON input.
+  json read -l :rec < records.ndjson {
+    var n = rec->name
+    echo $n
+  }
   """
   def __init__(self, mem, ex, errfmt):
     self.mem = mem
     self.ex = ex
     self.errfmt = errfmt
 
-  def __call__(self, cmd_val):
-    arg_r = args.Reader(cmd_val.argv, spids=cmd_val.arg_spids)
-    #arg_r.Next()  # skip 'use'
+  def _SetVar(self, var_name, obj):
+    self.mem.SetVar(lvalue.Named(var_name), _JsonValue(obj), (),
+                    scope_e.LocalOnly)
+
+  def _Read(self, cmd_val, arg_r, action_spid):
+    arg, _ = JSON_READ_SPEC.Parse(arg_r)
+    var_name, _ = _ReadVarName(arg_r)
+
+    if not arg.l:
+      if cmd_val.block is not None:
+        raise args.UsageError('a block requires -l', span_id=action_spid)
+      s = ''.join(_ReadBlocks(0))  # stdin
+      try:
+        obj, pos = fastjson.decode(s)
+        if pos != len(s):
+          raise ValueError('Unexpected data at byte %d' % pos)
+      except ValueError as e:
+        self.errfmt.Print('json read: %s', e, span_id=action_spid)
+        return 1
+      self._SetVar(var_name, obj)
+      return 0
 
-    # TODO: GetVar() and print them
+    if cmd_val.block is None:
+      raise args.UsageError('-l requires a block', span_id=action_spid)
+    for line_num, line in enumerate(_ReadLines(0), 1):
+      if not line.strip():
+        continue
+      try:
+        obj, pos = fastjson.decode(line)
+        if pos != len(line):
+          raise ValueError('Unexpected data at byte %d' % pos)
+      except ValueError as e:
+        self.errfmt.Print('json read: line %d: %s', line_num, e,
+                          span_id=action_spid)
+        return 1
+      self._SetVar(var_name, obj)
+      unused = self.ex.EvalBlock(cmd_val.block)
+    return 0
 
-    if cmd_val.block:
-      # TODO: flatten value.{Str,Obj} into a flat dict?
+  def _Write(self, cmd_val, arg_r, action_spid):
+    arg, _ = JSON_WRITE_SPEC.Parse(arg_r)
+    indent = _JSON_INDENT if arg.i is None else arg.i
+    if indent < 0:
+      raise args.UsageError("-i shouldn't be negative", span_id=action_spid)
+    if indent == 0:
+      indent = -1  # compact, on one line
+
+    objs = []
+    if cmd_val.block is not None:
+      if not arg_r.AtEnd():
+        raise args.UsageError("doesn't accept variables with a block",
+                              span_id=action_spid)
       namespace = self.ex.EvalBlock(cmd_val.block)
+      objs.append(dict(
+          (name, _JsonObj(cell.val)) for name, cell in namespace.iteritems()
+          if not name.startswith('_')))  # e.g. _returned
+    else:
+      while True:  # at least one
+        var_name, var_spid = _ReadVarName(arg_r)
+        val = self.mem.GetVar(var_name)
+        if val.tag == value_e.Undef:
+          self.errfmt.Print("%r isn't defined", var_name, span_id=var_spid)
+          return 1
+        objs.append(_JsonObj(val))
+        if arg_r.AtEnd():
+          break
+
+    try:
+      for obj in objs:
+        sys.stdout.write(fastjson.encode(obj, indent))
+        sys.stdout.write('\n')
+    except (TypeError, ValueError) as e:
+      self.errfmt.Print('json write: %s', e, span_id=action_spid)
+      return 1
+    finally:
+      sys.stdout.flush()
+    return 0
 
-      # TODO: Use JSON library
-      from pprint import pprint
-      pprint(namespace, indent=2)
+  def __call__(self, cmd_val):
+    arg_r = args.Reader(cmd_val.argv, spids=cmd_val.arg_spids)
+    arg_r.Next()  # skip 'json'
+
+    action, action_spid = arg_r.ReadRequired2('expected read or write')
+    if action == 'read':
+      return self._Read(cmd_val, arg_r, action_spid)
+    if action == 'write':
+      return self._Write(cmd_val, arg_r, action_spid)
+    raise args.UsageError('expected read or write, got %r' % action,
+                          span_id=action_spid)
 
-    return 0
+
+TSV2_READ_SPEC = args.BuiltinFlags()
+TSV2_READ_SPEC.ShortFlag('-b', args.Int)  # rows per batch
 
 
 class Tsv2(object):
   """TSV2 I/O.
 
-  # Takes a block.
-  tsv2 echo :var1 :var2 {
-    # Does this make sense?
-    x = @(a b c)
-    age = @[1 2 3]
-  }
+  tsv2 read :t < foo.tsv2     # t is a Table
+  tsv2 write :t > foo.tsv2
 
-  tsv2 read :x < foo.tsv2
+  # Streaming: run the block for each batch of up to 10000 rows, so the file
+  # doesn't have to fit in memory.
+  tsv2 read -b 10000 :t < big.tsv2 {
+    echo $len(t->name)
+  }
   """
-  pass
+  def __init__(self, mem, ex, errfmt):
+    self.mem = mem
+    self.ex = ex
+    self.errfmt = errfmt
+
+  def _SetTable(self, var_name, table):
+    self.mem.SetVar(lvalue.Named(var_name), value.Obj(table), (),
+                    scope_e.LocalOnly)
+
+  def _Read(self, cmd_val, arg_r, action_spid):
+    arg, _ = TSV2_READ_SPEC.Parse(arg_r)
+    var_name, _ = _ReadVarName(arg_r)
+    if arg.b is not None and arg.b <= 0:
+      raise args.UsageError('-b should be positive', span_id=action_spid)
+
+    reader = tsv2.Reader(0)  # stdin
+    try:
+      reader.ReadHeader()
+      if cmd_val.block is None:
+        if arg.b is not None:
+          raise args.UsageError('-b requires a block', span_id=action_spid)
+        self._SetTable(var_name, reader.ReadAll())
+        return 0
+
+      batch_size = arg.b or _TSV2_BATCH_SIZE
+      while True:
+        table = reader.ReadBatch(batch_size)
+        if table is None:
+          break
+        self._SetTable(var_name, table)
+        unused = self.ex.EvalBlock(cmd_val.block)
+    except tsv2.Tsv2Error as e:
+      self.errfmt.Print('tsv2 read: %s', e, span_id=action_spid)
+      return 1
+    return 0
+
+  def _Write(self, arg_r):
+    var_name, var_spid = _ReadVarName(arg_r)
+    val = self.mem.GetVar(var_name)
+    if val.tag != value_e.Obj or not isinstance(val.obj, objects.Table):
+      self.errfmt.Print("%r isn't a Table", var_name, span_id=var_spid)
+      return 1
+    tsv2.WriteTable(sys.stdout, val.obj)
+    sys.stdout.flush()
+    return 0
+
+  def __call__(self, cmd_val):
+    arg_r = args.Reader(cmd_val.argv, spids=cmd_val.arg_spids)
+    arg_r.Next()  # skip 'tsv2'
+
+    action, action_spid = arg_r.ReadRequired2('expected read or write')
+    if action == 'read':
+      return self._Read(cmd_val, arg_r, action_spid)
+    if action == 'write':
+      return self._Write(arg_r)
+    raise args.UsageError('expected read or write, got %r' % action,
+                          span_id=action_spid)
@@ -13,6 +13,7 @@ from _devbuild.gen.runtime_asdl import (
     lvalue, value, value_e, scope_e,
 )
 from core import meta
+from core import util
 from core.util import e_die
 from core.util import log
 from oil_lang import objects
@@ -23,11 +24,157 @@ from osh import word_eval
 
 import libc
 
-from typing import Any, Optional, List
+from typing import Any, Callable, Dict, Optional, List
 
 _ = log
 
 
+def _ValueToPyObj(val):
+  """Convert value_t to a Python object, for Oil expressions."""
+  if val.tag == value_e.Str:
+    return val.s
+  if val.tag == value_e.MaybeStrArray:
+    return val.strs  # node: has None
+  if val.tag == value_e.AssocArray:
+    return val.d
+  if val.tag == value_e.Obj:
+    return val.obj
+
+
+def _ConstValue(c):
+  """Convert the token of an expr.Const to a Python object."""
+  id_ = c.id
+
+  if id_ == Id.Expr_DecInt:
+    return int(c.val)
+  elif id_ == Id.Expr_BinInt:
+    return int(c.val, 2)
+  elif id_ == Id.Expr_OctInt:
+    return int(c.val, 8)
+  elif id_ == Id.Expr_HexInt:
+    return int(c.val, 16)
+
+  elif id_ == Id.Expr_Float:
+    return float(c.val)
+
+  elif id_ == Id.Expr_Null:
+    return None
+  elif id_ == Id.Expr_True:
+    return True
+  elif id_ == Id.Expr_False:
+    return False
+
+  elif id_ == Id.Expr_Name:
+    # for {name: 'bob'}
+    # Maybe also :Symbol?
+    return c.val
+
+  # NOTE: We could allow Ellipsis for a[:, ...] here, but we're not using
+  # it yet.
+  raise AssertionError(id_)
+
+
+# Entries in OilEvaluator.compiled
+_COMPILED_CACHE_MAX = 10000
+
+# Entries in OilEvaluator.regex_cache
+_REGEX_CACHE_MAX = 100
+
+
+def _Const(obj):
+  return lambda: obj
+
+
+def _MaybeFold(f, is_const):
+  """Fold a constant expression by evaluating it now.
+
+  Returns:
+    (closure, is_const) like OilEvaluator._CompileConst.
+  """
+  if is_const:
+    try:
+      obj = f()
+    except (ArithmeticError, TypeError, ValueError, util.FatalRuntimeError):
+      return f, False  # e.g. 1 / 0 is an error at runtime, not parse time
+    return _Const(obj), True
+  return f, False
+
+
+def _CompileUnary(op_id, child_f):
+  if op_id == Id.Arith_Minus:
+    return lambda: -child_f()
+  if op_id == Id.Arith_Tilde:
+    return lambda: ~child_f()
+  if op_id == Id.Expr_Not:
+    return lambda: not child_f()
+
+  raise NotImplementedError(op_id)
+
+
+def _CompileBinary(op_id, left_f, right_f):
+  if op_id == Id.Arith_Plus:
+    return lambda: left_f() + right_f()
+  if op_id == Id.Arith_Minus:
+    return lambda: left_f() - right_f()
+  if op_id == Id.Arith_Star:
+    return lambda: left_f() * right_f()
+  if op_id == Id.Arith_Slash:
+    # NOTE: from __future__ import division changes 5/2!
+    # But just make it explicit.
+    return lambda: float(left_f()) / right_f()  # floating point division
+
+  if op_id == Id.Expr_Div:
+    return lambda: left_f() // right_f()  # integer divison
+  if op_id == Id.Expr_Mod:
+    return lambda: left_f() % right_f()
+
+  if op_id == Id.Arith_Caret:  # Exponentiation
+    return lambda: left_f() ** right_f()
+
+  # Bitwise
+  if op_id == Id.Arith_Amp:
+    return lambda: left_f() & right_f()
+  if op_id == Id.Arith_Pipe:
+    return lambda: left_f() | right_f()
+  if op_id == Id.Expr_Xor:
+    return lambda: left_f() ^ right_f()
+  if op_id == Id.Arith_DGreat:
+    return lambda: left_f() >> right_f()
+  if op_id == Id.Arith_DLess:
+    return lambda: left_f() << right_f()
+
+  # Logical.  NOTE: Both sides are evaluated.
+  if op_id == Id.Expr_And:
+    def logical_and():
+      left = left_f()
+      right = right_f()
+      return left and right
+    return logical_and
+  if op_id == Id.Expr_Or:
+    def logical_or():
+      left = left_f()
+      right = right_f()
+      return left or right
+    return logical_or
+
+  raise NotImplementedError(op_id)
+
+
+_COMPARE_OPS = {
+    Id.Arith_Less: lambda left, right: left < right,
+    Id.Arith_Great: lambda left, right: left > right,
+    Id.Arith_GreatEqual: lambda left, right: left >= right,
+    Id.Arith_LessEqual: lambda left, right: left <= right,
+    Id.Arith_DEqual: lambda left, right: left == right,
+
+    Id.Expr_In: lambda left, right: left in right,
+    Id.Node_NotIn: lambda left, right: left not in right,
+
+    Id.Expr_Is: lambda left, right: left is right,
+    Id.Node_IsNot: lambda left, right: left is not right,
+}
+
+
 class OilEvaluator(object):
   """Shared between arith and bool evaluators.
 
@@ -43,6 +190,10 @@ class OilEvaluator(object):
     self.ex = ex
     self.word_ev = word_ev
     self.errfmt = errfmt
+    # expr_t -> closure, so e.g. the expressions in a loop are compiled once
+    self.compiled = {}  # type: Dict[expr_t, Callable[[], Any]]
+    # ERE string -> handle from libc.regex_compile(), for s ~ 'ERE'
+    self.regex_cache = {}  # type: Dict[str, Any]
 
   def LookupVar(self, var_name):
     """Convert to a Python object so we can calculate on it natively."""
@@ -55,14 +206,7 @@ class OilEvaluator(object):
         # TODO: Location info
         e_die('Undefined variable %r', var_name)
 
-    if val.tag == value_e.Str:
-      return val.s
-    if val.tag == value_e.MaybeStrArray:
-      return val.strs  # node: has None
-    if val.tag == value_e.AssocArray:
-      return val.d
-    if val.tag == value_e.Obj:
-      return val.obj
+    return _ValueToPyObj(val)
 
   def EvalPlusEquals(self, lval, rhs_py):
     lhs_py = self.LookupVar(lval.name)
@@ -87,49 +231,59 @@ class OilEvaluator(object):
       raise NotImplementedError(node.__class__.__name__)
 
   # Copied from BoolEvaluator
+  def _CompiledRegex(self, right):
+    """Returns a handle for libc.regex_search()."""
+    # TODO: Rename EggEx?
+    if isinstance(right, objects.Regex):
+      return right.Compiled()
+
+    if isinstance(right, str):  # an ERE string
+      compiled = self.regex_cache.get(right)
+      if compiled is None:
+        if len(self.regex_cache) >= _REGEX_CACHE_MAX:
+          self.regex_cache.clear()
+        compiled = libc.regex_compile(right)
+        self.regex_cache[right] = compiled
+      return compiled
+
+    raise RuntimeError(
+        "RHS of ~ should be string or Regex (got %s)" % right.__class__.__name__)
+
   def _EvalMatch(self, left, right, set_match_result):
     """
     Args:
       set_match_result: Whether to assign
     """
-    # TODO: Rename EggEx?
-    if isinstance(right, str):
-      pass
-    elif isinstance(right, objects.Regex):
-      right = right.AsPosixEre()
-    else:
-      raise RuntimeError(
-          "RHS of ~ should be string or Regex (got %s)" % right.__class__.__name__)
-    
-    matches = libc.regex_match(right, left)
-    if matches:
+    positions = libc.regex_search(self._CompiledRegex(right), left, 0,
+                                  len(left))
+    if positions is not None:
       # TODO:
       # - Also set NAMED CAPTURES.
-      #   - Idea: Set an OBJECT:
-      #     M.group(0)   M.match()
       #     M.group(1)   M.group('foo')
       #     M.group(2)   M.group('bar')
       #
       #     Since it's statically parsed, it could be statically typed?
       #     $/ (digit+ as foo Int) /
       #
-      #     Can use Python's __getattr__ and __index__ under the hood
-      #     M[0]         M._ or M.match
+      #     Can use Python's __getattr__ under the hood
       #     M[1]         M.foo
       #     M[2]         M.bar
       #
       # - Is 'M' the right name?  What do Perl and Ruby do?
       #   - BASH_REMATCH?
       if set_match_result:
-        state.SetLocalArray(self.mem, 'M', matches)
+        self._SetMatch(objects.Match(left, positions))
       return True
     else:
       if set_match_result:
-        # TODO: Clearing this would save allocations
         # NOTE: M does not exist initially.
-        state.SetLocalArray(self.mem, 'M', [])
+        self._SetMatch(objects.NO_MATCH)
       return False
 
+  def _SetMatch(self, match):
+    self.mem.SetVar(lvalue.Named('M'), value.Obj(match), (),
+                    scope_e.LocalOnly)
+
   def EvalArgList(self, args):
     """ Used by do f(x) and echo $f(x). """
     pos_args = []
@@ -182,48 +336,180 @@ class OilEvaluator(object):
     This is a naive PyObject evaluator!  It uses the type dispatch of the host
     Python interpreter.
 
+    The tree is compiled to closures the first time it's evaluated, like
+    ArithEvaluator.Eval().  A loop like while (i < n) { setvar i = i + 1 }
+    then doesn't dispatch on node.tag, convert literals, or call GetVar()
+    twice for each variable on every iteration.
+
     Returns:
       A Python object of ANY type.  Should be wrapped in value.Obj() for
       storing in Mem.
     """
-    if 0:
-      print('EvalExpr()')
-      node.PrettyPrint()
-      print('')
+    f = self.compiled.get(node)
+    if f is None:
+      if len(self.compiled) >= _COMPILED_CACHE_MAX:
+        self.compiled.clear()  # e.g. eval in a loop creates new nodes
+      f, _ = self._CompileConst(node)
+      self.compiled[node] = f
+    return f()
+
+  def _CompileConst(self, node, fold=True):
+    # type: (expr_t, bool) -> Any
+    """
+    Args:
+      fold: False if the node may not be evaluated, e.g. a branch of an if
+        expression.  Folding it could raise an error, or do work, that
+        evaluation doesn't.
 
+    Returns:
+      (closure, is_const).  A constant expression has no variables or side
+      effects, so it's folded at compile time.  Mutable objects like lists
+      are never constant, since each evaluation creates a new one.
+    """
     if node.tag == expr_e.Const:
-      id_ = node.c.id
-
-      if id_ == Id.Expr_DecInt:
-        return int(node.c.val)
-      elif id_ == Id.Expr_BinInt:
-        return int(node.c.val, 2)
-      elif id_ == Id.Expr_OctInt:
-        return int(node.c.val, 8)
-      elif id_ == Id.Expr_HexInt:
-        return int(node.c.val, 16)
-
-      elif id_ == Id.Expr_Float:
-        return float(node.c.val)
-
-      elif id_ == Id.Expr_Null:
-        return None
-      elif id_ == Id.Expr_True:
-        return True
-      elif id_ == Id.Expr_False:
-        return False
-
-      elif id_ == Id.Expr_Name:
-        # for {name: 'bob'}
-        # Maybe also :Symbol?
-        return node.c.val
-
-      # NOTE: We could allow Ellipsis for a[:, ...] here, but we're not using
-      # it yet.
-      raise AssertionError(id_)
+      return _Const(_ConstValue(node.c)), True
 
     if node.tag == expr_e.Var:
-      return self.LookupVar(node.name.val)
+      return self._CompileVar(node.name.val), False
+
+    if node.tag == expr_e.Unary:
+      child_f, is_const = self._CompileConst(node.child, fold)
+      return _MaybeFold(_CompileUnary(node.op.id, child_f), fold and is_const)
+
+    if node.tag == expr_e.Binary:
+      left_f, left_const = self._CompileConst(node.left, fold)
+      right_f, right_const = self._CompileConst(node.right, fold)
+      f = _CompileBinary(node.op.id, left_f, right_f)
+      return _MaybeFold(f, fold and left_const and right_const)
+
+    if node.tag == expr_e.Compare:
+      return self._CompileCompare(node, fold)
+
+    if node.tag == expr_e.IfExp:
+      test_f, test_const = self._CompileConst(node.test, fold)
+      if fold and test_const:
+        # Only the branch that's taken is compiled.
+        branch = node.body if test_f() else node.orelse
+        return self._CompileConst(branch, fold)
+
+      body_f, _ = self._CompileConst(node.body, False)
+      orelse_f, _ = self._CompileConst(node.orelse, False)
+
+      def if_exp():
+        if test_f():
+          return body_f()
+        else:
+          return orelse_f()
+      return if_exp, False
+
+    if node.tag == expr_e.List:
+      elt_fs = [self._CompileConst(e, fold)[0] for e in node.elts]
+      return (lambda: [f() for f in elt_fs]), False
+
+    if node.tag == expr_e.Tuple:
+      elts = [self._CompileConst(e, fold) for e in node.elts]
+      elt_fs = [f for f, _ in elts]
+      is_const = all(is_const for _, is_const in elts)
+      return _MaybeFold(lambda: tuple(f() for f in elt_fs), fold and is_const)
+
+    if node.tag == expr_e.RegexLiteral:
+      # EvalRegex() replaces the leaves of the tree, so the literal has the
+      # same value every time.  Create the Regex once, so its native regex is
+      # also compiled once.  If the closure is evicted from the cache, the
+      # evaluated tree is evaluated again, which doesn't change it.
+      regexes = []
+
+      def regex_literal():
+        if not regexes:
+          regexes.append(objects.Regex(self.EvalRegex(node.regex)))
+        return regexes[0]
+      return regex_literal, False
+
+    if node.tag == expr_e.Subscript:
+      obj_f, _ = self._CompileConst(node.obj, fold)
+      if len(node.indices) == 1:
+        index_f, _ = self._CompileConst(node.indices[0], fold)
+      else:
+        # e.g. mydict[a,b]
+        index_fs = [self._CompileConst(ind, fold)[0] for ind in node.indices]
+        index_f = lambda: tuple(f() for f in index_fs)
+      return (lambda: obj_f()[index_f()]), False
+
+    # Everything else is evaluated by walking the tree.
+    return (lambda: self._EvalExpr(node)), False
+
+  def _CompileVar(self, name):
+    if name in state.COMPUTED_VARS:
+      return lambda: self.LookupVar(name)
+
+    get = self.mem.GetLocalOrGlobal
+
+    def var():
+      val = get(name)
+      if val.tag == value_e.Obj:  # the common case in Oil
+        return val.obj
+      if val.tag == value_e.Undef:
+        # TODO: Location info
+        e_die('Undefined variable %r', name)
+      return _ValueToPyObj(val)
+    return var
+
+  def _CompileCompareOp(self, op):
+    f = _COMPARE_OPS.get(op.id)
+    if f:
+      return f
+
+    if op.id == Id.Arith_Tilde:
+      match = lambda left, right: self._EvalMatch(left, right, True)
+    elif op.id == Id.Expr_NotTilde:
+      match = lambda left, right: not self._EvalMatch(left, right, False)
+    else:
+      raise AssertionError(op.id)
+
+    def regex_match(left, right):
+      try:
+        return match(left, right)
+      except RuntimeError as e:
+        # Status 2 indicates a regex parse error.  This is fatal in OSH but
+        # not in bash, which treats [[ like a command with an exit code.
+        e_die("Invalid regex %r", right, span_id=op.span_id, status=2)
+    return regex_match
+
+  def _CompileCompare(self, node, fold):
+    left_f, is_const = self._CompileConst(node.left, fold)
+    pairs = []
+    for i, (op, right_expr) in enumerate(zip(node.ops, node.comparators)):
+      # In a < b < c, c isn't evaluated if a < b is false.
+      right_f, right_const = self._CompileConst(right_expr, fold and i == 0)
+      pairs.append((self._CompileCompareOp(op), right_f))
+      # ~ sets the M variable
+      is_const = (is_const and right_const and
+                  op.id not in (Id.Arith_Tilde, Id.Expr_NotTilde))
+    is_const = fold and is_const
+
+    if len(pairs) == 1:  # a < b
+      cmp, right_f = pairs[0]
+      return _MaybeFold(lambda: cmp(left_f(), right_f()), is_const)
+
+    def compare():  # a < b < c
+      left = left_f()
+      result = True  # Implicit and
+      for cmp, right_f in pairs:
+        right = right_f()
+        result = cmp(left, right)
+        if not result:
+          return result
+        left = right
+      return result
+    return _MaybeFold(compare, is_const)
+
+  def _EvalExpr(self, node):
+    # type: (expr_t) -> Any
+    """Evaluate the nodes that _CompileConst() doesn't handle."""
+    if 0:
+      print('_EvalExpr()')
+      node.PrettyPrint()
+      print('')
 
     if node.tag == expr_e.CommandSub:
       return self.ex.RunCommandSub(node.command_list)
@@ -254,60 +540,6 @@ class OilEvaluator(object):
     if node.tag == expr_e.SimpleVarSub:
       return self.word_ev.EvalSimpleVarSubToString(node.token)
 
-    if node.tag == expr_e.Unary:
-      child = self.EvalExpr(node.child)
-      if node.op.id == Id.Arith_Minus:
-        return -child
-      if node.op.id == Id.Arith_Tilde:
-        return ~child
-      if node.op.id == Id.Expr_Not:
-        return not child
-
-      raise NotImplementedError(node.op.id)
-
-    if node.tag == expr_e.Binary:
-      left = self.EvalExpr(node.left)
-      right = self.EvalExpr(node.right)
-
-      if node.op.id == Id.Arith_Plus:
-        return left + right
-      if node.op.id == Id.Arith_Minus:
-        return left - right
-      if node.op.id == Id.Arith_Star:
-        return left * right
-      if node.op.id == Id.Arith_Slash:
-        # NOTE: from __future__ import division changes 5/2!
-        # But just make it explicit.
-        return float(left) / right  # floating point division
-
-      if node.op.id == Id.Expr_Div:
-        return left // right  # integer divison
-      if node.op.id == Id.Expr_Mod:
-        return left % right
-
-      if node.op.id == Id.Arith_Caret:  # Exponentiation
-        return left ** right
-
-      # Bitwise
-      if node.op.id == Id.Arith_Amp:
-        return left & right
-      if node.op.id == Id.Arith_Pipe:
-        return left | right
-      if node.op.id == Id.Expr_Xor:
-        return left ^ right
-      if node.op.id == Id.Arith_DGreat:
-        return left >> right
-      if node.op.id == Id.Arith_DLess:
-        return left << right
-
-      # Logical
-      if node.op.id == Id.Expr_And:
-        return left and right
-      if node.op.id == Id.Expr_Or:
-        return left or right
-
-      raise NotImplementedError(node.op.id)
-
     if node.tag == expr_e.Range:  # 1:10  or  1:10:2
       lower = self.EvalExpr(node.lower)
       upper = self.EvalExpr(node.upper)
@@ -318,68 +550,6 @@ class OilEvaluator(object):
       upper = self.EvalExpr(node.upper) if node.upper else None
       return slice(lower, upper)
 
-    if node.tag == expr_e.Compare:
-      left = self.EvalExpr(node.left)
-      result = True  # Implicit and
-      for op, right_expr in zip(node.ops, node.comparators):
-
-        right = self.EvalExpr(right_expr)
-
-        if op.id == Id.Arith_Less:
-          result = left < right
-        elif op.id == Id.Arith_Great:
-          result = left > right
-        elif op.id == Id.Arith_GreatEqual:
-          result = left >= right
-        elif op.id == Id.Arith_LessEqual:
-          result = left <= right
-        elif op.id == Id.Arith_DEqual:
-          result = left == right
-
-        elif op.id == Id.Expr_In:
-          result = left in right
-        elif op.id == Id.Node_NotIn:
-          result = left not in right
-
-        elif op.id == Id.Expr_Is:
-          result = left is right
-        elif op.id == Id.Node_IsNot:
-          result = left is not right
-
-        else:
-          try:
-            if op.id == Id.Arith_Tilde:
-              result = self._EvalMatch(left, right, True)
-
-            elif op.id == Id.Expr_NotTilde:
-              result = not self._EvalMatch(left, right, False)
-
-            else:
-              raise AssertionError(op.id)
-          except RuntimeError as e:
-            # Status 2 indicates a regex parse error.  This is fatal in OSH but
-            # not in bash, which treats [[ like a command with an exit code.
-            e_die("Invalid regex %r", right, span_id=op.span_id, status=2)
-
-        if not result:
-          return result
-
-        left = right
-      return result
- 
-    if node.tag == expr_e.IfExp:
-      b = self.EvalExpr(node.test)
-      if b:
-        return self.EvalExpr(node.body)
-      else:
-        return self.EvalExpr(node.orelse)
-
-    if node.tag == expr_e.List:
-      return [self.EvalExpr(e) for e in node.elts]
-
-    if node.tag == expr_e.Tuple:
-      return tuple(self.EvalExpr(e) for e in node.elts)
-
     if node.tag == expr_e.Dict:
       # NOTE: some keys are expr.Const
       keys = [self.EvalExpr(e) for e in node.keys]
@@ -474,11 +644,6 @@ class OilEvaluator(object):
       ret = func(*pos_args, **named_args)
       return ret
 
-    if node.tag == expr_e.Subscript:
-      obj = self.EvalExpr(node.obj)
-      index = self._EvalIndices(node.indices)
-      return obj[index]
-
     # TODO: obj.method() should be separate
     if node.tag == expr_e.Attribute:  # obj.attr 
       o = self.EvalExpr(node.obj)
@@ -503,10 +668,6 @@ class OilEvaluator(object):
 
       raise AssertionError(id_)
 
-    if node.tag == expr_e.RegexLiteral:  # obj.attr 
-      # TODO: Should this just be an object that ~ calls?
-      return objects.Regex(self.EvalRegex(node.regex))
-
     if node.tag == expr_e.ArrayLiteral:  # obj.attr 
       items = [self.EvalExpr(item) for item in node.items]
       if items:
@@ -616,6 +777,12 @@ class OilEvaluator(object):
     elif node.tag == re_e.PerlClass:
       recurse = False
 
+    # Leaves that were already evaluated, since EvalRegex() mutates the tree.
+    elif node.tag == re_e.Primitive:
+      recurse = False
+    elif node.tag == re_e.LiteralChars:
+      recurse = False
+
     return new_leaf, recurse
 
   def _MutateChildren(self, children):
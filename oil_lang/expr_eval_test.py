@@ -0,0 +1,119 @@
+#!/usr/bin/env python2
+"""
+expr_eval_test.py: Tests for expr_eval.py
+"""
+from __future__ import print_function
+
+import unittest
+
+from _devbuild.gen.runtime_asdl import lvalue, value, scope_e
+from _devbuild.gen.syntax_asdl import source
+from core import alloc
+from core import meta
+from core import pyutil
+from core import util
+from frontend import parse_lib
+from frontend import reader
+from oil_lang import expr_eval  # module under test
+from osh import state
+
+
+class OilEvaluatorTest(unittest.TestCase):
+
+  def setUp(self):
+    self.arena = alloc.Arena()
+    self.arena.PushSource(source.Unused(''))
+    parse_opts = parse_lib.OilParseOptions()
+    oil_grammar = meta.LoadOilGrammar(pyutil.GetResourceLoader())
+    self.parse_ctx = parse_lib.ParseContext(self.arena, parse_opts, {},
+                                            oil_grammar, one_pass_parse=True)
+
+    self.mem = state.Mem('', [], {}, self.arena)
+    self.expr_ev = expr_eval.OilEvaluator(self.mem, {}, None, None, None)
+
+  def _Parse(self, code_str):
+    line_reader = reader.StringLineReader('var x = %s\n' % code_str,
+                                          self.arena)
+    c_parser = self.parse_ctx.MakeOshParser(line_reader)
+    return c_parser.ParseLogicalLine().rhs
+
+  def _SetVar(self, name, obj):
+    self.mem.SetVar(lvalue.Named(name), value.Obj(obj), (),
+                    scope_e.GlobalOnly)
+
+  def testCompiled(self):
+    node = self._Parse('i * 2 + 3 - 1')
+    for i in xrange(3):
+      self._SetVar('i', i)
+      self.assertEqual(i * 2 + 2, self.expr_ev.EvalExpr(node))
+    self.assertEqual(1, len(self.expr_ev.compiled))
+
+    node = self._Parse('0 < i <= 2 if i == 2 else -0x10')
+    self.assertEqual(True, self.expr_ev.EvalExpr(node))
+    self._SetVar('i', 1)
+    self.assertEqual(-16, self.expr_ev.EvalExpr(node))
+
+    # A new list on every evaluation
+    node = self._Parse('[1, 2]')
+    a = self.expr_ev.EvalExpr(node)
+    a.append(3)
+    self.assertEqual([1, 2], self.expr_ev.EvalExpr(node))
+
+  def testFoldOnlyEvaluated(self):
+    # The branch that isn't taken is neither folded nor compiled.
+    node = self._Parse('1 if true else 10 ^ 10 ^ 10')
+    self.assertEqual(1, self.expr_ev.EvalExpr(node))
+
+    node = self._Parse('1 if i else 7 ^ 3000000')
+    self._SetVar('i', 1)
+    self.assertEqual(1, self.expr_ev.EvalExpr(node))
+
+    node = self._Parse('i if false else 2 > 1')
+    self.assertEqual(True, self.expr_ev.EvalExpr(node))
+
+    # c isn't evaluated when a < b is false.
+    node = self._Parse('2 < i < 10 ^ 10 ^ 10')
+    self.assertEqual(False, self.expr_ev.EvalExpr(node))
+
+  def testMatch(self):
+    node = self._Parse("s ~ '([a-z]+)=([0-9]+)?'")
+    self._SetVar('s', 'x key= y')
+    self.assertEqual(True, self.expr_ev.EvalExpr(node))
+    self.assertEqual(1, len(self.expr_ev.regex_cache))
+
+    m = self.mem.GetVar('M').obj
+    self.assertEqual(['key=', 'key', ''], list(m))
+    self.assertEqual('key', m[1])
+    self.assertEqual((2, 5), (m.start(1), m.end(1)))
+    self.assertEqual((-1, -1), (m.start(2), m.end(2)))
+    self.assertEqual('key', m.group(-2))
+    self.assertRaises(IndexError, m.group, 3)
+
+    self._SetVar('s', '')
+    self.assertEqual(False, self.expr_ev.EvalExpr(node))
+    self.assertEqual([], list(self.mem.GetVar('M').obj))
+
+  def testRegexLiteral(self):
+    node = self._Parse("s ~ / 'ab' (d+) dot /")
+    self._SetVar('s', 'xab12y')
+    self.assertEqual(True, self.expr_ev.EvalExpr(node))
+
+    # The regex is evaluated again after the cache is cleared.
+    self.expr_ev.compiled.clear()
+    self.assertEqual(True, self.expr_ev.EvalExpr(node))
+    self.assertEqual(['ab12y', '12'], list(self.mem.GetVar('M').obj))
+    self._SetVar('s', 'ab')
+    self.assertEqual(False, self.expr_ev.EvalExpr(node))
+
+  def testErrors(self):
+    node = self._Parse('undefined + 1')
+    self.assertRaises(util.FatalRuntimeError, self.expr_ev.EvalExpr, node)
+
+    # Constant errors aren't folded away; they're raised at runtime.
+    node = self._Parse('1 div 0')
+    self.assertRaises(ZeroDivisionError, self.expr_ev.EvalExpr, node)
+    self.assertRaises(ZeroDivisionError, self.expr_ev.EvalExpr, node)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -15,6 +15,7 @@ from core import util
 from core.util import log
 from core.util import p_die
 from frontend import reader
+from oil_lang import expr_to_ast
 from osh import braces
 from osh import word_
 from pgen2 import parse
@@ -285,7 +286,7 @@ class ExprParser(object):
     self.parse_ctx = parse_ctx
     self.gr = gr
     # Reused multiple times.
-    self.push_parser = parse.Parser(gr)
+    self.push_parser = parse.Parser(gr, collapse=expr_to_ast.PASS_THROUGH)
 
   def Parse(self, lexer, start_symbol):
     # type: (Lexer, int) -> Tuple[PNode, token]
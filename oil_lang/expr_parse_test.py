@@ -6,8 +6,8 @@ from __future__ import print_function
 
 import unittest
 
-#from _devbuild.gen import grammar_nt  # names for integer nonterminal IDs
-from _devbuild.gen.id_kind_asdl import Kind
+from _devbuild.gen import grammar_nt  # names for integer nonterminal IDs
+from _devbuild.gen.id_kind_asdl import Id, Kind
 from _devbuild.gen.syntax_asdl import source
 
 from core.meta import ID_SPEC
@@ -50,6 +50,21 @@ class ExprParseTest(unittest.TestCase):
     """Convenient shortcut."""
     node = self._ParseOsh('var x = %s\n' % code_str)
 
+  def testLazyGrammar(self):
+    parse_opts = parse_lib.OilParseOptions()
+    grammar_loader = meta.OilGrammarLoader(pyutil.GetResourceLoader())
+    parse_ctx = parse_lib.ParseContext(self.arena, parse_opts, {}, None,
+                                       grammar_loader=grammar_loader)
+
+    # Shell doesn't need the grammar.
+    line_reader = reader.StringLineReader('echo hi\n', self.arena)
+    parse_ctx.MakeOshParser(line_reader).ParseLogicalLine()
+    self.assertEqual(None, grammar_loader.oil_grammar)
+
+    line_reader = reader.StringLineReader('var x = 1 + 2\n', self.arena)
+    parse_ctx.MakeOshParser(line_reader).ParseLogicalLine()
+    self.assert_(grammar_loader.oil_grammar is not None)
+
   def testPythonLike(self):
     # This works.
     node = self._ParseOsh('var x = y + 2 * 3;')
@@ -138,6 +153,45 @@ EOF)
       print('--- %s' % c)
       node = self._ParseOilExpression(c)
 
+  def testActions(self):
+    # The table gives the same transitions as scanning the arcs
+    gr = self.parse_ctx.oil_grammar
+    for sym, (states, _) in gr.dfas.iteritems():
+      for state, arcs in enumerate(states):
+        transitions = gr.actions[sym][state]
+        for ilabel in gr.tokens.values() + gr.keywords.values():
+          expected = None
+          for ilab, newstate in arcs:
+            t = gr.labels[ilab]
+            if ilabel == ilab:
+              expected = (0, newstate)
+              break
+            if t >= 256 and ilabel in gr.dfas[t][1]:
+              expected = (t, newstate)
+              break
+          self.assertEqual(expected, transitions.get(ilabel),
+                           (sym, state, ilabel))
+
+    # Errors are still detected
+    self.assertRaises(util.ParseError, self._ParseOilExpression, '1 +')
+    self.assertRaises(util.ParseError, self._ParseOilExpression, '[1, 2')
+
+  def testCollapse(self):
+    # Single-child precedence levels aren't in the parse tree
+    self.parse_ctx._InitOil()
+    line_reader = reader.StringLineReader('x = 42, a[1] + 2\n', self.arena)
+    lexer = self.parse_ctx._MakeLexer(line_reader)
+    pnode, _ = self.parse_ctx.e_parser.Parse(lexer, grammar_nt.oil_var_decl)
+
+    self.assertEqual(grammar_nt.oil_var_decl, pnode.typ)
+    p_testlist = pnode.children[2]
+    self.assertEqual(grammar_nt.testlist, p_testlist.typ)
+    p_42, _, p_sum = p_testlist.children
+    self.assertEqual(Id.Expr_DecInt, p_42.typ)
+    self.assertEqual(grammar_nt.arith_expr, p_sum.typ)
+    self.assertEqual(grammar_nt.power, p_sum.children[0].typ)
+    self.assertEqual(Id.Expr_DecInt, p_sum.children[2].typ)
+
   def testLexer(self):
     # NOTE: Kind.Expr for Oil doesn't have LexerPairs
     pairs = ID_SPEC.LexerPairs(Kind.Arith)
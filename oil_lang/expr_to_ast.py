@@ -37,6 +37,18 @@ def ISNONTERMINAL(x):
     return x >= NT_OFFSET
 
 
+# Nonterminals that Transformer.Expr() passes through when they have one
+# child.  An atom is parsed as a chain of all of them, so the parser replaces
+# them with their child instead of building the chain.  See pgen2/parse.py.
+PASS_THROUGH = set([
+    grammar_nt.testlist, grammar_nt.test, grammar_nt.or_test,
+    grammar_nt.and_test, grammar_nt.not_test, grammar_nt.comparison,
+    grammar_nt.range_expr, grammar_nt.expr, grammar_nt.xor_expr,
+    grammar_nt.and_expr, grammar_nt.shift_expr, grammar_nt.arith_expr,
+    grammar_nt.term, grammar_nt.factor, grammar_nt.power, grammar_nt.atom,
+])
+
+
 class Transformer(object):
   """Homogeneous parse tree -> heterogeneous AST ("lossless syntax tree")
 
@@ -353,11 +365,11 @@ class Transformer(object):
     """
     subscript: expr | [expr] ':' [expr]
     """
-    typ0 = children[0].typ
-
     n = len(children)
 
-    if ISNONTERMINAL(typ0):
+    # The expr may be a single token, e.g. the 1 in a[1]
+    p0 = children[0]
+    if ISNONTERMINAL(p0.typ) or p0.tok.id != Id.Arith_Colon:
       if n == 3:     # a[1:2]
         lower = self.Expr(children[0])
         upper = self.Expr(children[2])
@@ -6,10 +6,17 @@ Python types under value.Obj.  See the invariant in osh/runtime.asdl.
 """
 from __future__ import print_function
 
+import array
+import itertools
+import operator
+
+from _devbuild.gen.syntax_asdl import proc_sig_e
 from core.util import log
 from oil_lang import regex_translate
 
-from typing import TYPE_CHECKING
+import libc
+
+from typing import Any, Iterator, Tuple, TYPE_CHECKING
 if TYPE_CHECKING:
   from _devbuild.gen.runtime_asdl import regex_t
 
@@ -39,28 +46,121 @@ class ParameterizedArray(object):
 
 # These are for data frames?
 
-class BoolArray(list):
+class _Column(object):
+  """Vectorized comparisons, which return a BoolArray to filter a Table.
+
+    t[t->age.gt(30) & t->name.ne('bob')]
+
+  The other operand is either a scalar or a column of the same length.  The
+  loop runs in C, with itertools.imap() and the operator module.
+  """
+  def _Compare(self, op, other):
+    if isinstance(other, (list, array.array)):
+      if len(other) != len(self):
+        raise ValueError('Expected a column of length %d, got %d' %
+                         (len(self), len(other)))
+      return BoolArray(itertools.imap(op, self, other))
+    return BoolArray(itertools.imap(op, self, itertools.repeat(other)))
+
+  def eq(self, other):
+    return self._Compare(operator.eq, other)
+
+  def ne(self, other):
+    return self._Compare(operator.ne, other)
+
+  def lt(self, other):
+    return self._Compare(operator.lt, other)
+
+  def le(self, other):
+    return self._Compare(operator.le, other)
+
+  def gt(self, other):
+    return self._Compare(operator.gt, other)
+
+  def ge(self, other):
+    return self._Compare(operator.ge, other)
+
+
+class _TypedArray(_Column, array.array):
+  """A column stored unboxed, with the array module.
+
+  A list of 10M ints is 10M int objects; an array is 80 MB of machine words.
+  Slicing returns the same type, not array.array.
+  """
+  _TYPECODE = ''
+
+  def __new__(cls, items=()):
+    return array.array.__new__(cls, cls._TYPECODE, items)
+
+  def __getitem__(self, i):
+    item = array.array.__getitem__(self, i)
+    if isinstance(i, slice):
+      return self.__class__(item)
+    return item
+
+  def __getslice__(self, i, j):
+    return self.__class__(array.array.__getslice__(self, i, j))
+
+  def __add__(self, other):
+    if isinstance(other, array.array) and other.typecode == self.typecode:
+      return self.__class__(array.array.__add__(self, other))
+    result = self.__class__(self)
+    result.extend(other)  # e.g. a list, which is checked item by item
+    return result
+
+  def __mul__(self, n):
+    return self.__class__(array.array.__mul__(self, n))
+
+  __rmul__ = __mul__
+
+  def __repr__(self):
+    return '%s(%r)' % (self.__class__.__name__, list(self))
+
+
+class BoolArray(_TypedArray):
   """
   var b = @[true false false]
   var b = @[T F F]
+
+  The array module has no bool type, so it's stored as bytes, and items are
+  converted back to bool.
   """
-  pass
+  _TYPECODE = 'B'
 
-class IntArray(list):
+  def __getitem__(self, i):
+    item = array.array.__getitem__(self, i)
+    if isinstance(i, slice):
+      return BoolArray(item)
+    return bool(item)
+
+  def __iter__(self):
+    return itertools.imap(bool, array.array.__iter__(self))
+
+  def __and__(self, other):
+    return self._Compare(operator.and_, other)
+
+  def __or__(self, other):
+    return self._Compare(operator.or_, other)
+
+  def __invert__(self):
+    return BoolArray(itertools.imap(operator.not_, self))
+
+
+class IntArray(_TypedArray):
   """
   var b = @[1 2 3 -42]
   """
-  pass
+  _TYPECODE = 'l'
 
 
-class FloatArray(list):
+class FloatArray(_TypedArray):
   """
   var b = @[1.1 2.2 3.9]
   """
-  pass
+  _TYPECODE = 'd'
 
 
-class StrArray(list):
+class StrArray(_Column, list):
   """
   local oldarray=(a b c)  # only strings, but deprecated
 
@@ -82,41 +182,180 @@ class AssocArray(dict):
   pass
 
 
+def _ToColumn(items):
+  """Returns a typed array, inferring the type like @[1 2 3] does."""
+  if isinstance(items, (_TypedArray, StrArray)):
+    return items
+  items = list(items)
+  if not items:
+    return BoolArray()
+
+  first = items[0]
+  if isinstance(first, bool):
+    return BoolArray(items)
+  elif isinstance(first, int):
+    return IntArray(items)
+  elif isinstance(first, float):
+    return FloatArray(items)
+  elif isinstance(first, str):
+    return StrArray(items)
+  else:
+    raise TypeError("Can't make a column of %r" % first.__class__.__name__)
+
+
+def _ItemGetter(col):
+  """Returns a function of a row index, which is called from C."""
+  if isinstance(col, array.array):
+    # Bypass _TypedArray.__getitem__, which is Python code.
+    return array.array.__getitem__.__get__(col)
+  return col.__getitem__
+
+
+def _Take(col, rows):
+  """Returns the items of a column at the given row indices."""
+  return col.__class__(itertools.imap(_ItemGetter(col), rows))
+
+
 class Table(dict):
   """A table is our name for a data frame. 
   
-  It's represented by a dict of arrays.
+  It's represented by a dict of arrays, and self.names holds the column order.
+  Every operation works on whole columns, so the loops over rows run in C:
 
-  Notes:
+    var t = Table([['name', @(alice bob carol)], ['age', @[30 40 50]]])
 
-  - Can we do table[rowexpr, columnexpr] slicing?
+    t->age  t['age']       a column
+    t[t->age.gt(35)]       rows where a BoolArray mask is true
+    t[1:]  t[@[2 0]]       rows by slice, or by an IntArray of indices
+    t[@(name)]             a list of columns
+    t[t->age.gt(35), 0:1]  rows and columns
 
-    t[name == 'bob',]              # A 1-tuple isn't good?
-    t[name == 'bob', :]            # This is better
-    t[name == 'bob', @(name age)]  # Select columns
+    t.sort('age', 'name')  sorted by columns, like ORDER BY
+    t.group_by('name')     a dict of key -> Table, like GROUP BY
 
-  Problem: it would require lazy evaluation.
+  Notes:
 
   - We don't need Ellipsis because we only have two dimensions.
 
   print(b[...,1]) #Equivalent to b[: ,: ,1 ] 
   """
-  def __init__(self):
-    pass
+  def __init__(self, columns=None):
+    """
+    Args:
+      columns: a list of [name, items] pairs, or a dict, whose columns are
+        ordered by name.
+    """
+    self.names = []
+    if columns is None:
+      return
+    if isinstance(columns, dict):
+      columns = sorted(columns.iteritems())
+    for name, items in columns:
+      self[name] = items
+
+  def __setitem__(self, name, items):
+    col = _ToColumn(items)
+    if self.names and len(col) != self.num_rows():
+      raise ValueError('Column %r has %d rows, expected %d' %
+                       (name, len(col), self.num_rows()))
+    if name not in self:
+      self.names.append(name)
+    dict.__setitem__(self, name, col)
 
   def __getitem__(self, index):
     """
-    TODO: Accept slices here.
-
     d['mycol']  # returns a vector
     d->mycol
 
-    d[rowexpr, colexpr]  # how to implement this?
+    d[rowexpr, colexpr]
     """
-    # Shows the slice objects
-    #log('index %s', index)
+    if isinstance(index, str):
+      return dict.__getitem__(self, index)
+
+    if isinstance(index, tuple):
+      if len(index) != 2:
+        raise IndexError('Expected t[rows, cols], got %d indices' % len(index))
+      rows, cols = index
+      return self._Columns(cols)._Rows(rows)
 
-    return 'TODO: Table Slicing'
+    if isinstance(index, list):  # including StrArray
+      return self._Columns(index)
+
+    return self._Rows(index)
+
+  def __repr__(self):
+    return 'Table(%r)' % [[name, self[name]] for name in self.names]
+
+  def _Columns(self, cols):
+    if isinstance(cols, slice):
+      names = self.names[cols]
+    elif isinstance(cols, str):
+      names = [cols]
+    else:
+      names = cols
+    return Table([[name, self[name]] for name in names])
+
+  def _Rows(self, rows):
+    t = Table()
+    if isinstance(rows, slice):
+      for name in self.names:
+        col = self[name]
+        part = col[rows]
+        if not isinstance(part, col.__class__):  # slicing a StrArray
+          part = col.__class__(part)
+        t[name] = part
+    elif isinstance(rows, BoolArray):
+      if len(rows) != self.num_rows():
+        raise ValueError('Expected a mask of length %d, got %d' %
+                         (self.num_rows(), len(rows)))
+      for name in self.names:
+        col = self[name]
+        t[name] = col.__class__(itertools.compress(col, rows))
+    elif isinstance(rows, IntArray):
+      t = self._Take(rows)
+    else:
+      raise TypeError("Can't select rows with %r" % rows.__class__.__name__)
+    return t
+
+  def _Take(self, rows):
+    return Table([[name, _Take(self[name], rows)] for name in self.names])
+
+  def _Order(self, names, reverse):
+    """Returns the row indices in sorted order."""
+    order = range(self.num_rows())
+    # Python's sort is stable, so sort by the least significant column first.
+    for name in reversed(names):
+      order.sort(key=_ItemGetter(self[name]), reverse=reverse)
+    return order
+
+  def num_rows(self):
+    if not self.names:
+      return 0
+    return len(dict.__getitem__(self, self.names[0]))
+
+  def sort(self, *names, **kwargs):
+    """Returns a new Table sorted by the given columns.
+
+    t.sort('age', reverse=true)
+    """
+    reverse = kwargs.pop('reverse', False)
+    if kwargs:
+      raise TypeError('Unexpected arguments %s' % ', '.join(kwargs))
+    return self._Take(self._Order(names, reverse))
+
+  def group_by(self, name):
+    """Returns a dict of each value in a column -> a Table of its rows.
+
+    Rows are sorted once, and then split into runs with itertools.groupby().
+    """
+    col = self[name]
+    groups = {}
+    for key, rows in itertools.groupby(self._Order([name], False),
+                                       _ItemGetter(col)):
+      if isinstance(col, BoolArray):
+        key = bool(key)
+      groups[key] = self._Take(IntArray(rows))
+    return groups
 
 
 class Proc(object):
@@ -129,6 +368,15 @@ class Proc(object):
     self.node = node
     self.defaults = defaults
 
+    # The variables that a call binds, in order: params, then @rest.  See
+    # Mem.PushCall().
+    self.param_names = []
+    sig = node.sig
+    if sig.tag == proc_sig_e.Closed:
+      self.param_names.extend(p.name.val for p in sig.params)
+      if sig.rest:
+        self.param_names.append(sig.rest.val)
+
 
 class Func(object):
   """An Oil function declared with 'func'."""
@@ -138,6 +386,15 @@ class Func(object):
     self.named_defaults = named_defaults
     self.ex = ex
 
+    # The variables that a call binds, in order: positional params, ...splat,
+    # named params, then the named ...splat.  See Mem.PushTemp().
+    self.param_names = [p.name.val for p in node.pos_params]
+    if node.pos_splat:
+      self.param_names.append(node.pos_splat.val)
+    self.param_names.extend(p.name.val for p in node.named_params)
+    if node.named_splat:
+      self.param_names.append(node.named_splat.val)
+
   def __call__(self, *args, **kwargs):
     return self.ex.RunOilFunc(self, args, kwargs)
 
@@ -247,6 +504,7 @@ class Regex(object):
     # type: (regex_t) -> None
     self.regex = regex
     self.as_ere = None  # Cache the evaluation
+    self.compiled = None  # handle from libc.regex_compile()
 
   def __repr__(self):
     # The default because x ~ obj accepts an ERE string?
@@ -264,6 +522,16 @@ class Regex(object):
       self.as_ere = ''.join(parts)
     return self.as_ere
 
+  def Compiled(self):
+    # type: () -> Any
+    """Returns a handle for libc.regex_search(), compiled once.
+
+    Raises RuntimeError if the ERE is invalid.
+    """
+    if self.compiled is None:
+      self.compiled = libc.regex_compile(self.AsPosixEre())
+    return self.compiled
+
   def AsPcre(self):
     pass
 
@@ -271,3 +539,65 @@ class Regex(object):
     """Very similar to PCRE, except a few constructs aren't allowed."""
     pass
 
+
+class Match(object):
+  """The result of s ~ /regex/, bound to M.
+
+  It holds the subject string and the group positions from
+  libc.regex_search(), so groups are only sliced out when they're used.
+
+    M[1]  M.group(1)    the text of group 1, or '' if it didn't participate
+    M.start(1)          the position of group 1, or -1
+    M.end(1)
+    @M  ${M[@]}         all groups as strings
+  """
+  def __init__(self, s, positions):
+    # type: (str, Tuple[int, ...]) -> None
+    self.s = s
+    self.positions = positions  # (start, end) for each group, flattened
+
+  def __len__(self):
+    # type: () -> int
+    return len(self.positions) // 2
+
+  def __getitem__(self, i):
+    # type: (int) -> str
+    return self.group(i)
+
+  def __iter__(self):
+    # type: () -> Iterator[str]
+    for i in xrange(len(self)):
+      yield self.group(i)
+
+  def __repr__(self):
+    # type: () -> str
+    return '<Match %r>' % list(self)
+
+  def _Index(self, i):
+    # type: (int) -> int
+    n = len(self)
+    if i < 0:
+      i += n
+    if not 0 <= i < n:
+      raise IndexError('no such group: %d' % i)
+    return 2 * i
+
+  def group(self, i=0):
+    # type: (int) -> str
+    j = self._Index(i)
+    start = self.positions[j]
+    if start == -1:
+      return ''
+    return self.s[start : self.positions[j + 1]]
+
+  def start(self, i=0):
+    # type: (int) -> int
+    return self.positions[self._Index(i)]
+
+  def end(self, i=0):
+    # type: (int) -> int
+    return self.positions[self._Index(i) + 1]
+
+
+# Bound to M when s ~ /regex/ doesn't match.
+NO_MATCH = Match('', ())
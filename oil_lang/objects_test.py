@@ -0,0 +1,137 @@
+#!/usr/bin/env python2
+"""
+objects_test.py: Tests for objects.py
+"""
+from __future__ import print_function
+
+import unittest
+
+from oil_lang import objects  # module under test
+
+
+class ArrayTest(unittest.TestCase):
+
+  def testTypedArrays(self):
+    a = objects.IntArray(x + 1 for x in xrange(4))
+    self.assertEqual([1, 2, 3, 4], list(a))
+    self.assertEqual('l', a.typecode)
+    self.assertEqual(objects.IntArray, type(a[1:3]))
+    self.assertEqual(objects.IntArray, type(a[::2]))
+    self.assertEqual('IntArray([2, 3])', repr(a[1:3]))
+
+    b = objects.BoolArray([True, False])
+    self.assertEqual([True, False], list(b))
+    self.assertIs(True, b[0])
+    self.assertEqual(objects.BoolArray, type(b[1:]))
+    self.assertEqual(0, len(objects.FloatArray()))
+
+  def testConcat(self):
+    a = objects.IntArray([1, 2])
+    self.assertEqual(objects.IntArray, type(a + a))
+    self.assertEqual([1, 2, 1, 2], list(a + a))
+    self.assertEqual(objects.IntArray, type(a + [3]))
+    self.assertEqual([1, 2, 3], list(a + [3]))
+    self.assertRaises(TypeError, a.__add__, [1.5])
+    self.assertEqual(objects.IntArray, type(a * 2))
+    self.assertEqual(objects.IntArray, type(2 * a))
+    self.assertEqual([1, 2, 1, 2], list(2 * a))
+
+    b = objects.BoolArray([True])
+    self.assertEqual([True, True, False], list(b * 2 + [False]))
+
+    # Items are unboxed, so they have to fit.
+    self.assertRaises(TypeError, a.__setitem__, 0, 1.5)
+    self.assertRaises(OverflowError, a.__setitem__, 0, 10 ** 20)
+
+  def testCompare(self):
+    a = objects.IntArray([1, 5, 3])
+    self.assertEqual([False, True, True], list(a.gt(2)))
+    self.assertEqual([True, False, True], list(a.le(3)))
+    b = objects.IntArray([0, 5, 0])
+    self.assertEqual([False, True, False], list(a.eq(b)))
+    self.assertRaises(ValueError, a.eq, objects.IntArray([1]))
+
+    s = objects.StrArray(['a', 'b', 'a'])
+    self.assertEqual([True, False, True], list(s.eq('a')))
+
+    m = a.gt(2)
+    self.assertEqual([False, True, False], list(m & s.ne('a')))
+    self.assertEqual([True, True, True], list(m | s.eq('a')))
+    self.assertEqual([True, False, False], list(~m))
+
+
+class TableTest(unittest.TestCase):
+
+  def setUp(self):
+    self.t = objects.Table([
+        ['name', objects.StrArray(['carol', 'alice', 'bob', 'alice'])],
+        ['age', [50, 30, 40, 20]],
+        ['score', objects.FloatArray([1.5, 2.5, 3.5, 4.5])],
+    ])
+
+  def testColumns(self):
+    t = self.t
+    self.assertEqual(['name', 'age', 'score'], t.names)
+    self.assertEqual(4, t.num_rows())
+    self.assertEqual(objects.IntArray, type(t['age']))
+
+    t2 = t[['score', 'name']]
+    self.assertEqual(['score', 'name'], t2.names)
+    self.assertEqual(['name', 'age'], t[:, 0:2].names)
+    self.assertEqual(['age'], t[:, 'age'].names)
+
+    self.assertRaises(ValueError, t.__setitem__, 'x', [1, 2])
+    t['x'] = [True, False, True, False]
+    self.assertEqual(['name', 'age', 'score', 'x'], t.names)
+
+    t = objects.Table({'b': [1], 'a': ['x']})
+    self.assertEqual(['a', 'b'], t.names)
+    self.assertEqual(0, objects.Table().num_rows())
+
+  def testRows(self):
+    t = self.t
+    t2 = t[t['age'].ge(30)]
+    self.assertEqual(['carol', 'alice', 'bob'], list(t2['name']))
+    self.assertEqual(objects.StrArray, type(t2['name']))
+    self.assertEqual([1.5, 2.5, 3.5], list(t2['score']))
+
+    t2 = t[1:3]
+    self.assertEqual(['alice', 'bob'], list(t2['name']))
+    self.assertEqual(objects.StrArray, type(t2['name']))
+
+    t2 = t[objects.IntArray([3, 0])]
+    self.assertEqual([20, 50], list(t2['age']))
+
+    t2 = t[t['name'].eq('alice'), ['score']]
+    self.assertEqual(['score'], t2.names)
+    self.assertEqual([2.5, 4.5], list(t2['score']))
+
+    self.assertRaises(ValueError, t.__getitem__, objects.BoolArray([True]))
+    self.assertRaises(TypeError, t.__getitem__, 1.0)
+
+  def testSort(self):
+    t = self.t.sort('age')
+    self.assertEqual([20, 30, 40, 50], list(t['age']))
+    self.assertEqual(['alice', 'alice', 'bob', 'carol'], list(t['name']))
+
+    t = self.t.sort('name', 'score', reverse=True)
+    self.assertEqual(['carol', 'bob', 'alice', 'alice'], list(t['name']))
+    self.assertEqual([1.5, 3.5, 4.5, 2.5], list(t['score']))
+
+    self.assertRaises(TypeError, self.t.sort, 'age', bad=True)
+
+  def testGroupBy(self):
+    groups = self.t.group_by('name')
+    self.assertEqual(['alice', 'bob', 'carol'], sorted(groups))
+    self.assertEqual([30, 20], list(groups['alice']['age']))
+    self.assertEqual(6.0 + 1.0, sum(groups['alice']['score']))
+
+    self.t['x'] = [True, False, True, True]
+    groups = self.t.group_by('x')
+    self.assertEqual([False, True], sorted(groups))
+    self.assertEqual(['alice'], list(groups[False]['name']))
+    self.assertEqual(['carol', 'bob', 'alice'], list(groups[True]['name']))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python2
+"""
+tsv2.py - Read and write tables in TSV2 format.
+
+The first line is a header, with a name and an optional type for each column:
+
+  name    age:Int    score:Float    member:Bool
+
+The types are Str (the default), Int, Float, and Bool (true or false).  Cells
+are separated by tabs.  A string that contains a tab, a newline, or a carriage
+return, or that starts with a double quote, is written as a quoted string with
+backslash escapes:
+
+  "line 1\\nline 2"
+
+so a row never spans lines.
+
+The reader doesn't loop over rows in Python.  It reads the input a block at a
+time, splits the lines into cells, transposes them with zip(), and converts
+each column with one C loop, e.g. IntArray(imap(int, cells)).
+"""
+from __future__ import print_function
+
+import errno
+import itertools
+
+from oil_lang import objects
+
+import posix_ as posix
+
+from typing import Any, List, Optional, Tuple
+
+_BLOCK_SIZE = 1 << 16
+
+# Rows per write() call
+_WRITE_BATCH = 10000
+
+_BOOLS = {'true': True, 'false': False}
+_BOOL_STRS = {True: 'true', False: 'false'}
+
+_ESCAPES = [
+    ('\\', '\\\\'), ('"', '\\"'), ('\t', '\\t'), ('\n', '\\n'), ('\r', '\\r')
+]
+_UNESCAPES = dict((esc, c) for c, esc in _ESCAPES)
+
+# Type name -> column class
+_COLUMN_TYPES = {
+    'Str': objects.StrArray,
+    'Int': objects.IntArray,
+    'Float': objects.FloatArray,
+    'Bool': objects.BoolArray,
+}
+_TYPE_NAMES = dict((cls, name) for name, cls in _COLUMN_TYPES.iteritems())
+
+
+class Tsv2Error(Exception):
+  pass
+
+
+def EncodeCell(s):
+  # type: (str) -> str
+  if not (s.startswith('"') or '\t' in s or '\n' in s or '\r' in s):
+    return s
+  for c, esc in _ESCAPES:
+    s = s.replace(c, esc)
+  return '"%s"' % s
+
+
+def DecodeCell(cell):
+  # type: (str) -> str
+  if not cell.startswith('"'):
+    return cell
+  end = len(cell) - 1
+  if end == 0 or not cell.endswith('"'):
+    raise Tsv2Error('Unterminated string %r' % cell)
+
+  parts = []
+  i = 1
+  while True:
+    j = cell.find('\\', i, end)
+    if j == -1:
+      parts.append(cell[i:end])
+      break
+    parts.append(cell[i:j])
+    c = _UNESCAPES.get(cell[j:j+2])
+    if c is None or j + 1 == end:  # "\" is unterminated
+      raise Tsv2Error('Invalid escape in %r' % cell)
+    parts.append(c)
+    i = j + 2
+  return ''.join(parts)
+
+
+# Column class -> function of a cell
+_CONVERTERS = {
+    objects.StrArray: DecodeCell,
+    objects.IntArray: int,
+    objects.FloatArray: float,
+    objects.BoolArray: _BOOLS.__getitem__,
+}
+
+
+def ParseHeader(line):
+  # type: (str) -> Tuple[List[str], List[Any]]
+  """Returns column names and classes."""
+  if not line:
+    raise Tsv2Error('Expected a header')
+  names = []
+  classes = []
+  for field in line.split('\t'):
+    name, _, type_name = field.partition(':')
+    cls = _COLUMN_TYPES.get(type_name or 'Str')
+    if cls is None:
+      raise Tsv2Error('Invalid type %r for column %r' % (type_name, name))
+    names.append(name)
+    classes.append(cls)
+  return names, classes
+
+
+class Reader(object):
+  """Reads a TSV2 stream from a file descriptor."""
+
+  def __init__(self, fd, block_size=_BLOCK_SIZE):
+    # type: (int, int) -> None
+    self.fd = fd
+    self.block_size = block_size
+    self.lines = []  # type: List[str]  # complete lines that aren't parsed
+    self.partial = ''  # the last line of the block, without a newline
+    self.eof = False
+    self.line_num = 0  # lines consumed, including the header
+
+    self.names = []  # type: List[str]
+    self.classes = []  # type: List[Any]
+
+  def _Fill(self):
+    # type: () -> None
+    """Read blocks until there's at least one complete line, or EOF."""
+    while not self.eof:
+      try:
+        data = posix.read(self.fd, self.block_size)
+      except OSError as e:
+        if e.errno == errno.EINTR:
+          continue
+        raise
+      if not data:
+        self.eof = True
+        if self.partial:  # no newline at the end
+          self.lines.append(self.partial)
+          self.partial = ''
+        break
+
+      lines = (self.partial + data).split('\n')
+      self.partial = lines.pop()
+      if lines:
+        self.lines.extend(lines)
+        break
+
+  def ReadHeader(self):
+    # type: () -> None
+    if not self.lines:
+      self._Fill()
+    if not self.lines:
+      raise Tsv2Error('Expected a header, got empty input')
+    header = self.lines.pop(0)
+    self.line_num += 1
+    self.names, self.classes = ParseHeader(header)
+
+  def _Error(self, i, msg):
+    # type: (int, str) -> Tsv2Error
+    """An error on the i-th line after the ones consumed."""
+    return Tsv2Error('line %d: %s' % (self.line_num + i + 1, msg))
+
+  def _ParseColumns(self, lines):
+    # type: (List[str]) -> List[Any]
+    """Parse lines into a list of typed arrays."""
+    rows = list(itertools.imap(str.split, lines, itertools.repeat('\t')))
+    num_cols = len(self.names)
+    widths = set(itertools.imap(len, rows))
+    if widths and widths != set([num_cols]):
+      for i, row in enumerate(rows):  # slow path for the error
+        if len(row) != num_cols:
+          raise self._Error(i, 'Expected %d cells, got %d' %
+                            (num_cols, len(row)))
+    cells = zip(*rows) if rows else [()] * num_cols
+
+    cols = []
+    for name, cls, col in zip(self.names, self.classes, cells):
+      # Strings are only decoded if some cells may be quoted.
+      if cls is objects.StrArray and '"' not in ''.join(col):
+        cols.append(objects.StrArray(col))
+        continue
+
+      convert = _CONVERTERS[cls]
+      try:
+        cols.append(cls(itertools.imap(convert, col)))
+      except (KeyError, ValueError, OverflowError, Tsv2Error):
+        for i, cell in enumerate(col):  # slow path for the error
+          try:
+            cls([convert(cell)])
+          except (KeyError, ValueError, OverflowError, Tsv2Error):
+            raise self._Error(i, 'Invalid %s in column %r: %r' %
+                              (_TYPE_NAMES[cls], name, cell))
+        raise
+
+    self.line_num += len(lines)
+    return cols
+
+  def _MakeTable(self, cols):
+    # type: (List[Any]) -> objects.Table
+    return objects.Table(zip(self.names, cols))
+
+  def ReadBatch(self, max_rows):
+    # type: (int) -> Optional[objects.Table]
+    """Returns a Table of up to max_rows rows, or None at the end."""
+    while len(self.lines) < max_rows and not self.eof:
+      self._Fill()
+    if not self.lines:
+      return None
+    batch = self.lines[:max_rows]
+    del self.lines[:max_rows]
+    return self._MakeTable(self._ParseColumns(batch))
+
+  def ReadAll(self):
+    # type: () -> objects.Table
+    cols = self._ParseColumns([])
+    while True:
+      if not self.lines:
+        self._Fill()
+        if not self.lines:
+          break
+      lines = self.lines
+      self.lines = []
+      for col, more in zip(cols, self._ParseColumns(lines)):
+        col.extend(more)  # C loop
+    return self._MakeTable(cols)
+
+
+def _StrCells(col, start, end):
+  # type: (Any, int, int) -> Any
+  """Returns the cells of rows [start, end) as strings."""
+  part = col[start:end]  # slicing a StrArray returns a list
+  if isinstance(col, objects.StrArray):
+    s = ''.join(part)
+    if '\t' in s or '\n' in s or '\r' in s or '"' in s:
+      return itertools.imap(EncodeCell, part)
+    return part
+  if isinstance(col, objects.BoolArray):
+    return itertools.imap(_BOOL_STRS.__getitem__, part)
+  if isinstance(col, objects.FloatArray):
+    return itertools.imap(repr, part)  # repr() round trips
+  return itertools.imap(str, part)
+
+
+def WriteTable(f, table):
+  # type: (Any, objects.Table) -> None
+  """Write a Table to a file object."""
+  header = []
+  for name in table.names:
+    cls = table[name].__class__
+    if cls is objects.StrArray:
+      header.append(name)
+    else:
+      header.append('%s:%s' % (name, _TYPE_NAMES[cls]))
+  f.write('\t'.join(header))
+  f.write('\n')
+  if not table.names:
+    return
+
+  n = table.num_rows()
+  for start in xrange(0, n, _WRITE_BATCH):
+    end = start + _WRITE_BATCH
+    cols = [_StrCells(table[name], start, end) for name in table.names]
+    f.write('\n'.join(itertools.imap('\t'.join, itertools.izip(*cols))))
+    f.write('\n')
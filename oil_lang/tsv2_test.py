@@ -0,0 +1,102 @@
+#!/usr/bin/env python2
+"""
+tsv2_test.py: Tests for tsv2.py
+"""
+from __future__ import print_function
+
+import cStringIO
+import os
+import unittest
+
+from oil_lang import objects
+from oil_lang import tsv2  # module under test
+
+
+def _Reader(s, block_size=7):
+  r, w = os.pipe()
+  os.write(w, s)
+  os.close(w)
+  # A small block size so lines span blocks
+  return tsv2.Reader(r, block_size=block_size)
+
+
+class Tsv2Test(unittest.TestCase):
+
+  def testCells(self):
+    for s in ['', 'a b', '"', 'x"y', 'a\tb', '\\n', 'a\r\nb\\']:
+      self.assertEqual(s, tsv2.DecodeCell(tsv2.EncodeCell(s)))
+    self.assertEqual('a\\b', tsv2.EncodeCell('a\\b'))  # not quoted
+    self.assertEqual('"\\"x"', tsv2.EncodeCell('"x'))
+
+    for cell in ['"', '"abc', '"a\\"', '"\\x"']:
+      self.assertRaises(tsv2.Tsv2Error, tsv2.DecodeCell, cell)
+
+  def testReadAll(self):
+    r = _Reader(
+        'name\tage:Int\tscore:Float\tok:Bool\n'
+        'alice\t30\t1.5\ttrue\n'
+        '"a\\tb"\t-4\t2\tfalse\n'
+        'bob\t50\t-0.25\ttrue')  # no newline at the end
+    r.ReadHeader()
+    t = r.ReadAll()
+    self.assertEqual(['name', 'age', 'score', 'ok'], t.names)
+    self.assertEqual(['alice', 'a\tb', 'bob'], list(t['name']))
+    self.assertEqual(objects.IntArray([30, -4, 50]), t['age'])
+    self.assertEqual([1.5, 2.0, -0.25], list(t['score']))
+    self.assertEqual([True, False, True], list(t['ok']))
+
+  def testReadBatch(self):
+    lines = ['x:Int'] + [str(i) for i in xrange(25)]
+    r = _Reader('\n'.join(lines) + '\n')
+    r.ReadHeader()
+    sizes = []
+    total = 0
+    while True:
+      t = r.ReadBatch(10)
+      if t is None:
+        break
+      sizes.append(t.num_rows())
+      total += sum(t['x'])
+    self.assertEqual([10, 10, 5], sizes)
+    self.assertEqual(sum(xrange(25)), total)
+
+  def testErrors(self):
+    for s, msg in [
+        ('', 'empty input'),
+        ('a:Date\n', "Invalid type 'Date'"),
+        ('a\tb\nx\ty\nz\n', 'line 3: Expected 2 cells, got 1'),
+        ('a:Int\n1\n2\nx\n', "line 4: Invalid Int in column 'a': 'x'"),
+        ('a:Bool\ntrue\nTrue\n', "line 3: Invalid Bool"),
+        ('a\n"b\n', "line 2: Invalid Str"),
+        ]:
+      r = _Reader(s)
+      try:
+        r.ReadHeader()
+        r.ReadAll()
+      except tsv2.Tsv2Error as e:
+        self.assertIn(msg, str(e))
+      else:
+        self.fail('Expected error for %r' % s)
+
+  def testWrite(self):
+    t = objects.Table([
+        ['name', objects.StrArray(['a\tb', 'c'])],
+        ['n', [1, 2]],
+        ['f', [0.1, 2.0]],
+        ['b', [True, False]],
+    ])
+    f = cStringIO.StringIO()
+    tsv2.WriteTable(f, t)
+    s = f.getvalue()
+    self.assertEqual(
+        'name\tn:Int\tf:Float\tb:Bool\n'
+        '"a\\tb"\t1\t0.1\ttrue\n'
+        'c\t2\t2.0\tfalse\n', s)
+
+    r = _Reader(s)
+    r.ReadHeader()
+    self.assertEqual(t, r.ReadAll())
+
+
+if __name__ == '__main__':
+  unittest.main()
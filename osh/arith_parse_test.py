@@ -24,13 +24,15 @@ from osh import state
 #from osh import arith_parse
 
 
-def ParseAndEval(code_str):
-  arena = test_lib.MakeArena('<arith_parse_test.py>')
+def _ParseArith(code_str, arena):
   w_parser = test_lib.InitWordParser(code_str, arena=arena)
   w_parser._Next(lex_mode_e.Arith)  # Calling private method
   anode = w_parser._ReadArithExpr()  # need the right lex state?
   print('node:', anode)
+  return anode
 
+
+def _InitArithEvaluator(arena):
   mem = state.Mem('', [], {}, arena)
   parse_opts = parse_lib.OilParseOptions()
   exec_opts = state.ExecOpts(mem, parse_opts, None)
@@ -42,6 +44,13 @@ def ParseAndEval(code_str):
   ev = word_eval.CompletionWordEvaluator(mem, exec_opts, exec_deps, arena)
 
   arith_ev = expr_eval.ArithEvaluator(mem, exec_opts, ev, arena)
+  return arith_ev, mem
+
+
+def ParseAndEval(code_str):
+  arena = test_lib.MakeArena('<arith_parse_test.py>')
+  anode = _ParseArith(code_str, arena)
+  arith_ev, _ = _InitArithEvaluator(arena)
   value = arith_ev.Eval(anode)
   return value
 
@@ -142,6 +151,45 @@ class ArithTest(unittest.TestCase):
     testEvalExpr('64#@', 62)
     testEvalExpr('64#_', 63)
 
+  def testCompiled(self):
+    arena = test_lib.MakeArena('<arith_parse_test.py>')
+    arith_ev, mem = _InitArithEvaluator(arena)
+
+    # The node is compiled once, and sees new values of x.
+    anode = _ParseArith('x * (2 + 3)', arena)
+    for i in xrange(3):
+      state.SetLocalString(mem, 'x', str(i))
+      self.assertEqual(i * 5, arith_ev.Eval(anode))
+    self.assertEqual(1, len(arith_ev.compiled))
+
+    # Side effects happen on every evaluation.
+    anode = _ParseArith('x += 10', arena)
+    self.assertEqual(12, arith_ev.Eval(anode))
+    self.assertEqual(22, arith_ev.Eval(anode))
+
+    # Constant errors aren't folded away; they're raised at runtime.
+    anode = _ParseArith('1 / 0', arena)
+    self.assertRaises(util.FatalRuntimeError, arith_ev.Eval, anode)
+    self.assertRaises(util.FatalRuntimeError, arith_ev.Eval, anode)
+
+    testEvalExpr('2 > 1 ? 7 : 1 / 0', 7)
+    testEvalExpr('1 || 1 / 0', 1)
+
+    # Branches that aren't taken aren't folded.  Folding would raise errors,
+    # or do work, that evaluation doesn't.
+    testEvalExpr('1 ? 5 : 1 << -1', 5)
+    testEvalExpr('0 ? 1 << -1 : 6', 6)
+    testEvalExpr('0 && (1 << -1)', 0)
+    testEvalExpr('1 || (1 << -1)', 1)
+    testEvalExpr('1 && 3', 1)
+    testEvalExpr('0 || 0', 0)
+
+    state.SetLocalString(mem, 'x', '0')
+    anode = _ParseArith('x ? 1 << -1 : 7', arena)
+    self.assertEqual(7, arith_ev.Eval(anode))
+    anode = _ParseArith('x && (3 ** 200000)', arena)
+    self.assertEqual(0, arith_ev.Eval(anode))
+
   def testErrors(self):
     # Now try some bad ones
 
@@ -126,6 +126,7 @@ _NORMAL_BUILTINS = {
     "push": builtin_e.PUSH,
     "use": builtin_e.USE,
     "json": builtin_e.JSON,
+    "tsv2": builtin_e.TSV2,
 }
 
 # This is used by completion.
@@ -656,21 +657,25 @@ HISTORY_SPEC = _Register('history')
 class History(object):
   """Show interactive command history."""
 
-  def __init__(self, readline_mod):
-    self.readline_mod = readline_mod
+  def __init__(self, hist_file):
+    """
+    Args:
+      hist_file: history.HistoryFile, or None without the readline module.
+    """
+    self.hist_file = hist_file
 
   def __call__(self, arg_vec):
     # NOTE: This builtin doesn't do anything in non-interactive mode in bash?
     # It silently exits zero.
     # zsh -c 'history' produces an error.
-    readline_mod = self.readline_mod
-    if not readline_mod:
+    hist_file = self.hist_file
+    if not hist_file:
       raise args.UsageError("OSH wasn't compiled with the readline module.")
 
     arg, arg_index = HISTORY_SPEC.ParseVec(arg_vec)
 
-    # Returns 0 items in non-interactive mode?
-    num_items = readline_mod.get_current_history_length()
+    # Returns 0 items in non-interactive mode
+    num_items = hist_file.get_current_history_length()
     #log('len = %d', num_items)
 
     rest = arg_vec.strs[arg_index:]
@@ -692,6 +697,6 @@ class History(object):
     # - Consolidate multiline commands.
 
     for i in xrange(start_index, num_items+1):  # 1-based index
-      item = readline_mod.get_history_item(i)
+      item = hist_file.get_history_item(i)
       print('%5d  %s' % (i, item))
     return 0
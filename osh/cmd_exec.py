@@ -21,9 +21,10 @@ import sys
 
 from _devbuild.gen.id_kind_asdl import Id
 from _devbuild.gen.syntax_asdl import (
-    command_e, command__Proc, redir_e, assign_op_e, source, proc_sig_e,
+    command_e, command__Case, command__Proc, redir_e, assign_op_e, source,
+    proc_sig_e, case_arm,
 )
-from _devbuild.gen.syntax_asdl import word, command_t
+from _devbuild.gen.syntax_asdl import word, word_t, command_t
 from _devbuild.gen.runtime_asdl import (
     lvalue, lvalue_e,
     value, value_e, value_t,
@@ -50,8 +51,10 @@ from osh import braces
 from osh import builtin
 from osh import builtin_pure
 from osh import expr_eval
+from osh import glob_
 from osh import state
 from osh import word_
+from osh import word_eval
 
 import posix_ as posix
 try:
@@ -59,7 +62,7 @@ try:
 except ImportError:
   from benchmarks import fake_libc as libc  # type: ignore
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
 
 # These are nodes that execute more than one COMMAND.  DParen doesn't
@@ -139,6 +142,7 @@ class Deps(object):
     self.prompt_ev = None
 
     self.search_path = None
+    self.path_index = None  # shared by completion and other shells
     self.ext_prog = None
 
     self.dumper = None
@@ -167,7 +171,8 @@ def _PyObjectToVal(py_val):
   elif isinstance(py_val, objects.StrArray):  # var a = @(a b)
     # It's safe to convert StrArray to MaybeStrArray.
     val = value.MaybeStrArray(py_val)
-  elif isinstance(py_val, dict):  # var d = {name: "bob"}
+  elif isinstance(py_val, dict) and not isinstance(py_val, objects.Table):
+    # var d = {name: "bob"}
     # TODO: Is this necessary?  Shell assoc arrays aren't nested and don't have
     # arbitrary values.
     val = value.AssocArray(py_val)
@@ -176,6 +181,65 @@ def _PyObjectToVal(py_val):
   return val
 
 
+# Entries in Executor.case_matchers
+_CASE_MATCHERS_MAX = 1000
+
+
+class _CaseMatcher(object):
+  """The patterns of a 'case' statement, compiled once per node.
+
+  Most patterns are static, e.g. start|stop) or *.py).  Plain strings are looked
+  up in a dict, and the remaining globs are matched in order with fnmatch().
+  Patterns with substitutions like $pat) are evaluated every time, as before.
+
+  A pattern list is 'flattened' into positions, so the first matching pattern
+  in source order wins, and dynamic patterns are evaluated exactly when they
+  would have been without the dict.
+  """
+  def __init__(self, node):
+    # type: (command__Case) -> None
+    self.literals = {}  # type: Dict[str, int]  # string -> first position
+    # (position, arm, glob or None if dynamic, word)
+    self.globs = []  # type: List[Tuple[int, case_arm, Optional[str], word_t]]
+
+    pos = 0
+    for arm in node.arms:
+      for pat_word in arm.pat_list:
+        ok, pat = word_eval.StaticEvalGlob(pat_word)
+        # NOTE: '(' could be part of an extended glob like @(a|b).
+        if ok and not glob_.LooksLikeGlob(pat) and '(' not in pat:
+          lit = glob_.GlobUnescape(pat)
+          if lit not in self.literals:
+            self.literals[lit] = pos
+        else:
+          self.globs.append((pos, arm, pat if ok else None, pat_word))
+        pos += 1
+
+    self.arms = []  # type: List[case_arm]  # position -> arm
+    for arm in node.arms:
+      self.arms.extend([arm] * len(arm.pat_list))
+
+  def Match(self, to_match, word_ev):
+    # type: (str, word_eval._WordEvaluator) -> Optional[case_arm]
+    """Return the arm to execute, or None."""
+    lit_pos = self.literals.get(to_match, -1)
+
+    for pos, arm, pat, pat_word in self.globs:
+      if lit_pos != -1 and pos > lit_pos:
+        break  # an earlier literal pattern matched
+      if pat is None:
+        # TODO: case "$@") shouldn't succeed?  That's a type error?
+        # That requires strict-array?
+        pat = word_ev.EvalWordToString(pat_word, do_fnmatch=True).s
+      #log('Matching word %r against pattern %r', to_match, pat)
+      if libc.fnmatch(pat, to_match):
+        return arm
+
+    if lit_pos != -1:
+      return self.arms[lit_pos]
+    return None
+
+
 class Executor(object):
   """Executes the program by tree-walking.
 
@@ -215,6 +279,7 @@ class Executor(object):
     self.expr_ev = exec_deps.expr_ev
 
     self.search_path = exec_deps.search_path
+    self.path_index = exec_deps.path_index
     self.ext_prog = exec_deps.ext_prog
     self.traps = exec_deps.traps
     self.trap_nodes = exec_deps.trap_nodes
@@ -232,6 +297,9 @@ class Executor(object):
     self.loop_level = 0  # for detecting bad top-level break/continue
     self.check_command_sub_status = False  # a hack
 
+    # Compiled patterns of 'case' statements
+    self.case_matchers = {}  # type: Dict[command__Case, _CaseMatcher]
+
   def _EvalHelper(self, c_parser, src):
     self.arena.PushSource(src)
     try:
@@ -362,7 +430,7 @@ class Executor(object):
     if builtin_func is not None:
       # Pass the block
       if isinstance(builtin_func,
-          (builtin.Cd, builtin_oil.Use, builtin_oil.Json)):
+          (builtin.Cd, builtin_oil.Use, builtin_oil.Json, builtin_oil.Tsv2)):
         status = builtin_func(cmd_val)
       else:
         status = builtin_func(arg_vec)
@@ -1005,7 +1073,13 @@ class Executor(object):
         # TODO: Resolve the asymmetry betwen Named vs ObjIndex,ObjAttr.
         for lval, val in zip(lvals, vals):
           if lval.tag == lvalue_e.ObjIndex:
-            lval.obj[lval.index] = val.obj
+            try:
+              lval.obj[lval.index] = val.obj
+            except (TypeError, OverflowError) as e:
+              # e.g. a float or a big int in an IntArray, which is unboxed
+              e_die("Can't assign %r to item of %s: %s", val.obj,
+                    lval.obj.__class__.__name__, e,
+                    span_id=node.keyword.span_id)
           elif lval.tag == lvalue_e.ObjAttr:
             setattr(lval.obj, lval.attr, val.obj)
           else:
@@ -1248,11 +1322,12 @@ class Executor(object):
         # object.
 
       status = 0  # in case we don't loop
+      loop_var = state.LoopVar(self.mem, iter_name)
       self.loop_level += 1
       try:
         for x in iter_list:
           #log('> ForEach setting %r', x)
-          state.SetLocalString(self.mem, iter_name, x)
+          loop_var.Set(value.Str(x))
           #log('<')
 
           try:
@@ -1312,13 +1387,13 @@ class Executor(object):
 
       body = node.body
       iter_name = node.lhs[0].name.val  # TODO: proper lvalue
+      loop_var = state.LoopVar(self.mem, iter_name)
       while True:
         try:
           loop_val = it.next()
         except StopIteration:
           break
-        self.mem.SetVar(lvalue.Named(iter_name), _PyObjectToVal(loop_val), (),
-                        scope_e.LocalOnly)
+        loop_var.Set(_PyObjectToVal(loop_val))
 
         # Copied from above
         try:
@@ -1407,23 +1482,18 @@ class Executor(object):
       to_match = val.s
 
       status = 0  # If there are no arms, it should be zero?
-      done = False
 
-      for arm in node.arms:
-        for pat_word in arm.pat_list:
-          # NOTE: Is it OK that we're evaluating these as we go?
-
-          # TODO: case "$@") shouldn't succeed?  That's a type error?
-          # That requires strict-array?
-
-          pat_val = self.word_ev.EvalWordToString(pat_word, do_fnmatch=True)
-          #log('Matching word %r against pattern %r', to_match, pat_val.s)
-          if libc.fnmatch(pat_val.s, to_match):
-            status = self._ExecuteList(arm.action)
-            done = True  # TODO: Parse ;;& and for fallthrough and such?
-            break  # Only execute action ONCE
-        if done:
-          break
+      matcher = self.case_matchers.get(node)
+      if matcher is None:
+        if len(self.case_matchers) >= _CASE_MATCHERS_MAX:
+          self.case_matchers.clear()  # e.g. eval in a loop creates new nodes
+        matcher = _CaseMatcher(node)
+        self.case_matchers[node] = matcher
+
+      arm = matcher.Match(to_match, self.word_ev)
+      if arm is not None:
+        # TODO: Parse ;;& and for fallthrough and such?
+        status = self._ExecuteList(arm.action)  # Only execute action ONCE
 
     elif node.tag == command_e.TimeBlock:
       # TODO:
@@ -1778,8 +1848,8 @@ class Executor(object):
     else:
       proc_argv = argv
 
-    self.mem.PushCall(node.name.val, node.name.span_id, proc_argv)
-
+    # Values for proc.param_names
+    vals = []
     n_args = len(argv)
     if sig.tag == proc_sig_e.Closed:  # proc is-closed []
       for i, p in enumerate(sig.params):
@@ -1789,19 +1859,20 @@ class Executor(object):
           val = proc.defaults[i]
           if val is None:
             e_die("No value provided for param %r", p.name.val)
-        self.mem.SetVar(lvalue.Named(p.name.val), val, (), scope_e.LocalOnly)
+        vals.append(val)
 
       n_params = len(sig.params)
       if sig.rest:
-        leftover = value.MaybeStrArray(argv[n_params:])
-        self.mem.SetVar(
-            lvalue.Named(sig.rest.val), leftover, (), scope_e.LocalOnly)
+        vals.append(value.MaybeStrArray(argv[n_params:]))
       else:
         if n_args > n_params:
           raise TypeError(
               "proc %r expected %d arguments, but got %d" %
               (node.name.val, n_params, n_args))
 
+    self.mem.PushCall(node.name.val, node.name.span_id, proc_argv,
+                      proc.param_names, vals)
+
     # TODO:
     # - Handle &block param?  How to do that?  It's really the
     #   syntax_asdl.command_t type?  Or objects.Block probably.
@@ -1845,7 +1916,9 @@ class Executor(object):
     #log('RunOilFunc named_defaults %s', func.named_defaults)
 
     node = func.node
-    self.mem.PushTemp()
+
+    # Values for func.param_names
+    vals = []
 
     # Bind positional arguments
     n_args = len(args)
@@ -1859,14 +1932,11 @@ class Executor(object):
         if val is None:
           # Python raises TypeError.  Should we do something else?
           raise TypeError('No value provided for param %r', param.name)
-      self.mem.SetVar(lvalue.Named(param.name.val), val, (), scope_e.LocalOnly)
+      vals.append(val)
 
     if node.pos_splat:
-      splat_name = node.pos_splat.val
-
       # NOTE: This is a heterogeneous TUPLE, not list.
-      leftover = value.Obj(args[n_params:])
-      self.mem.SetVar(lvalue.Named(splat_name), leftover, (), scope_e.LocalOnly)
+      vals.append(value.Obj(args[n_params:]))
     else:
       if n_args > n_params:
         raise TypeError(
@@ -1886,20 +1956,19 @@ class Executor(object):
           raise TypeError(
               "Named argument %r wasn't passed, and it doesn't have a default "
               "value" % name.val)
-
-      self.mem.SetVar(lvalue.Named(name.val), val, (), scope_e.LocalOnly)
+      vals.append(val)
 
     if node.named_splat:
-      splat_name = node.named_splat.val
       # Note: this dict is not an AssocArray
-      leftover = value.Obj(kwargs)
-      self.mem.SetVar(lvalue.Named(splat_name), leftover, (), scope_e.LocalOnly)
+      vals.append(value.Obj(kwargs))
     else:
       if kwargs:
         raise TypeError(
             'func %r got unexpected named arguments: %s' %
             (node.name.val, ', '.join(kwargs.keys())))
 
+    self.mem.PushTemp(func.param_names, vals)
+
     return_val = None
     try:
       self._Execute(node.body)
@@ -1914,11 +1983,10 @@ class Executor(object):
   def RunLambda(self, lambda_node, args, kwargs):
     """ Run a lambda like |x| x+1 """
 
-    self.mem.PushTemp()
     # Bind params.  TODO: Reject kwargs, etc.
-    for i, param in enumerate(lambda_node.params):
-      val = value.Obj(args[i])
-      self.mem.SetVar(lvalue.Named(param.name.val), val, (), scope_e.LocalOnly)
+    names = [param.name.val for param in lambda_node.params]
+    vals = [value.Obj(args[i]) for i in xrange(len(names))]
+    self.mem.PushTemp(names, vals)
 
     return_val = None
     try:
@@ -16,7 +16,7 @@ from _devbuild.gen.runtime_asdl import (
     lvalue, value, value_e, value_t, scope_e,
 )
 from _devbuild.gen.syntax_asdl import (
-    arith_expr_e, sh_lhs_expr_e, sh_lhs_expr_t, bool_expr_e,
+    arith_expr_e, arith_expr_t, sh_lhs_expr_e, sh_lhs_expr_t, bool_expr_e,
 )
 from _devbuild.gen.types_asdl import bool_arg_type_e
 from asdl import runtime
@@ -32,6 +32,8 @@ try:
 except ImportError:
   from benchmarks import fake_libc as libc  # type: ignore
 
+from typing import Any, Callable, Dict
+
 
 def _StringToInteger(s, span_id=runtime.NO_SPID):
   """Use bash-like rules to coerce a string to an integer.
@@ -301,8 +303,102 @@ class _ExprEvaluator(object):
     return i
 
 
+# Entries in ArithEvaluator.compiled
+_COMPILED_CACHE_MAX = 10000
+
+
+def _Const(i):
+  return lambda: i
+
+
+def _MaybeFold(f, is_const):
+  """Fold a constant expression by evaluating it now.
+
+  Returns:
+    (closure, is_const) like ArithEvaluator._CompileConst.
+  """
+  if is_const:
+    try:
+      i = f()
+    except (util.FatalRuntimeError, ZeroDivisionError, ValueError,
+            OverflowError):
+      return f, False  # e.g. 1/0 is an error at runtime, not parse time
+    return _Const(i), True
+  return f, False
+
+
+def _CompileUnary(op_id, child_f):
+  if op_id == Id.Node_UnaryPlus:
+    return child_f
+  if op_id == Id.Node_UnaryMinus:
+    return lambda: -child_f()
+
+  if op_id == Id.Arith_Bang:  # logical negation
+    return lambda: int(not child_f())
+  if op_id == Id.Arith_Tilde:  # bitwise complement
+    return lambda: ~child_f()
+
+  raise AssertionError(op_id)
+
+
+def _Power(lhs, rhs):
+  # OVM is stripped of certain functions that are somehow necessary for
+  # exponentiation.
+  # Python/ovm_stub_pystrtod.c:21: PyOS_double_to_string: Assertion `0'
+  # failed.
+  if rhs < 0:
+    e_die("Exponent can't be less than zero")  # TODO: error location
+  result = 1
+  for i in xrange(rhs):
+    result *= lhs
+  return result
+
+
+# NOTE: Comparisons return 0 or 1, not bool.
+_BINARY_OPS = {
+    Id.Arith_Plus: lambda lhs, rhs: lhs + rhs,
+    Id.Arith_Minus: lambda lhs, rhs: lhs - rhs,
+    Id.Arith_Star: lambda lhs, rhs: lhs * rhs,
+    Id.Arith_Percent: lambda lhs, rhs: lhs % rhs,
+
+    Id.Arith_DEqual: lambda lhs, rhs: int(lhs == rhs),
+    Id.Arith_NEqual: lambda lhs, rhs: int(lhs != rhs),
+    Id.Arith_Great: lambda lhs, rhs: int(lhs > rhs),
+    Id.Arith_GreatEqual: lambda lhs, rhs: int(lhs >= rhs),
+    Id.Arith_Less: lambda lhs, rhs: int(lhs < rhs),
+    Id.Arith_LessEqual: lambda lhs, rhs: int(lhs <= rhs),
+
+    Id.Arith_Pipe: lambda lhs, rhs: lhs | rhs,
+    Id.Arith_Amp: lambda lhs, rhs: lhs & rhs,
+    Id.Arith_Caret: lambda lhs, rhs: lhs ^ rhs,
+
+    # Note: how to define shift of negative numbers?
+    Id.Arith_DLess: lambda lhs, rhs: lhs << rhs,
+    Id.Arith_DGreat: lambda lhs, rhs: lhs >> rhs,
+}
+
+# For a += 5, etc.  /= is handled separately.
+_ASSIGN_OPS = {
+    Id.Arith_PlusEqual: lambda old, rhs: old + rhs,
+    Id.Arith_MinusEqual: lambda old, rhs: old - rhs,
+    Id.Arith_StarEqual: lambda old, rhs: old * rhs,
+    Id.Arith_PercentEqual: lambda old, rhs: old % rhs,
+
+    Id.Arith_DGreatEqual: lambda old, rhs: old >> rhs,
+    Id.Arith_DLessEqual: lambda old, rhs: old << rhs,
+    Id.Arith_AmpEqual: lambda old, rhs: old & rhs,
+    Id.Arith_PipeEqual: lambda old, rhs: old | rhs,
+    Id.Arith_CaretEqual: lambda old, rhs: old ^ rhs,
+}
+
+
 class ArithEvaluator(_ExprEvaluator):
 
+  def __init__(self, mem, exec_opts, word_ev, errfmt):
+    _ExprEvaluator.__init__(self, mem, exec_opts, word_ev, errfmt)
+    # arith_expr_t -> closure, so e.g. the nodes of a loop are compiled once
+    self.compiled = {}  # type: Dict[arith_expr_t, Callable[[], Any]]
+
   def _ValToArith(self, val, span_id):
     """Convert value_t to a Python int or list of strings."""
     assert isinstance(val, value_t), '%r %r' % (val, type(val))
@@ -386,238 +482,288 @@ class ArithEvaluator(_ExprEvaluator):
     NOTE: (( A['x'] = 'x' )) and (( x = A['x'] )) are syntactically valid in
     bash, but don't do what you'd think.  'x' sometimes a variable name and
     sometimes a key.
+
+    The tree is compiled to closures the first time it's evaluated.  Loops
+    like for (( i = 0; i < n; i++ )) then don't dispatch on node.tag or
+    convert constants on every iteration.
+    """
+    f = self.compiled.get(node)
+    if f is None:
+      if len(self.compiled) >= _COMPILED_CACHE_MAX:
+        self.compiled.clear()  # e.g. eval in a loop creates new nodes
+      f = self._Compile(node)
+      self.compiled[node] = f
+    return f()
+
+  def _Compile(self, node):
+    """arith_expr_t -> a closure that returns what Eval() returns."""
+    f, _ = self._CompileConst(node)
+    return f
+
+  def _CompileConst(self, node, fold=True):
+    """
+    Args:
+      fold: False if the node may not be evaluated, e.g. the right side of &&.
+        Folding it could raise an error, or do work, that the shell doesn't.
+
+    Returns:
+      (closure, is_const).  A constant expression has no variables, no
+      assignments, and can't fail, so it's folded at compile time.
     """
     # OSH semantics: Variable NAMES cannot be formed dynamically; but INTEGERS
     # can.  ${foo:-3}4 is OK.  $? will be a compound word too, so we don't have
     # to handle that as a special case.
 
     if node.tag == arith_expr_e.VarRef:  # $(( x ))  (can be array)
-      tok = node.token
-      val = _LookupVar(tok.val, self.mem, self.exec_opts)
-      return self._ValToArithOrError(val, span_id=tok.span_id)
+      return self._CompileVarRef(node.token), False
 
     if node.tag == arith_expr_e.ArithWord:  # $(( $x )) $(( ${x}${y} )), etc.
-      val = self.word_ev.EvalWordToString(node.w)
-      return self._ValToArithOrError(val, blame_word=node.w)
+      w = node.w
+      ok, s, _ = word_.StaticEval(w)
+      if ok:  # e.g. 42 or 0x10
+        try:
+          i = _StringToInteger(s)
+        except util.FatalRuntimeError:
+          pass  # Report the error at runtime, respecting strict_arith
+        else:
+          return _Const(i), True
+
+      def arith_word():
+        val = self.word_ev.EvalWordToString(w)
+        return self._ValToArithOrError(val, blame_word=w)
+      return arith_word, False
 
     if node.tag == arith_expr_e.UnaryAssign:  # a++
-      op_id = node.op_id
-      old_int, lval = self._EvalLhsAndLookupArith(node.child)
+      return self._CompileUnaryAssign(node), False
 
-      if op_id == Id.Node_PostDPlus:  # post-increment
-        new_int = old_int + 1
-        ret = old_int
+    if node.tag == arith_expr_e.BinaryAssign:  # a=1, a+=5, a[1]+=5
+      return self._CompileBinaryAssign(node), False
 
-      elif op_id == Id.Node_PostDMinus:  # post-decrement
-        new_int = old_int - 1
-        ret = old_int
+    if node.tag == arith_expr_e.Unary:
+      child_f, is_const = self._CompileConst(node.child, fold)
+      return _MaybeFold(_CompileUnary(node.op_id, child_f), fold and is_const)
 
-      elif op_id == Id.Arith_DPlus:  # pre-increment
-        new_int = old_int + 1
-        ret = new_int
+    if node.tag == arith_expr_e.Binary:
+      op_id = node.op_id
+      left_f, left_const = self._CompileConst(node.left, fold)
+      short_circuit = op_id in (Id.Arith_DAmp, Id.Arith_DPipe)
+
+      if short_circuit and fold and left_const:
+        # The left side decides whether the right side is evaluated.
+        is_and = op_id == Id.Arith_DAmp
+        if (left_f() == 0) == is_and:
+          return _Const(0 if is_and else 1), True
+        right_f, right_const = self._CompileConst(node.right, fold)
+        return _MaybeFold(lambda: int(right_f() != 0), right_const)
+
+      right_f, right_const = self._CompileConst(
+          node.right, fold and not short_circuit)
+      f = self._CompileBinary(node, left_f, right_f)
+      # Indexing depends on an array variable, so it's never constant.
+      is_const = (fold and op_id != Id.Arith_LBracket and left_const and
+                  right_const)
+      return _MaybeFold(f, is_const)
 
-      elif op_id == Id.Arith_DMinus:  # pre-decrement
-        new_int = old_int - 1
-        ret = new_int
+    if node.tag == arith_expr_e.TernaryOp:
+      cond_f, cond_const = self._CompileConst(node.cond, fold)
+      if fold and cond_const:
+        # Only the branch that's taken is compiled.
+        branch = node.true_expr if cond_f() else node.false_expr
+        return self._CompileConst(branch, fold)
+
+      true_f, _ = self._CompileConst(node.true_expr, False)
+      false_f, _ = self._CompileConst(node.false_expr, False)
+
+      def ternary():
+        if cond_f():  # nonzero
+          return true_f()
+        else:
+          return false_f()
+      return ternary, False
 
-      else:
-        raise AssertionError(op_id)
+    raise AssertionError("Unhandled node %r" % node.__class__.__name__)
 
-      #log('old %d new %d ret %d', old_int, new_int, ret)
+  def _CompileVarRef(self, tok):
+    name = tok.val
+    span_id = tok.span_id
+    mem = self.mem
+    exec_opts = self.exec_opts
+
+    def var_ref():
+      val = _LookupVar(name, mem, exec_opts)
+      if val.tag == value_e.Str:
+        s = val.s
+        # Fast path for decimal integers; the rest are handled by
+        # _StringToInteger.
+        if s.isdigit() and s[0] != '0':
+          return int(s)
+      return self._ValToArithOrError(val, span_id=span_id)
+    return var_ref
+
+  def _CompileUnaryAssign(self, node):
+    op_id = node.op_id
+    child = node.child
+
+    if op_id == Id.Node_PostDPlus:  # post-increment
+      delta, return_new = 1, False
+    elif op_id == Id.Node_PostDMinus:  # post-decrement
+      delta, return_new = -1, False
+    elif op_id == Id.Arith_DPlus:  # pre-increment
+      delta, return_new = 1, True
+    elif op_id == Id.Arith_DMinus:  # pre-decrement
+      delta, return_new = -1, True
+    else:
+      raise AssertionError(op_id)
+
+    def unary_assign():
+      old_int, lval = self._EvalLhsAndLookupArith(child)
+      new_int = old_int + delta
+      #log('old %d new %d', old_int, new_int)
       self._Store(lval, new_int)
-      return ret
+      return new_int if return_new else old_int
+    return unary_assign
 
-    if node.tag == arith_expr_e.BinaryAssign:  # a=1, a+=5, a[1]+=5
-      op_id = node.op_id
+  def _CompileBinaryAssign(self, node):
+    op_id = node.op_id
+    left = node.left
+    right_f = self._Compile(node.right)
+
+    if op_id == Id.Arith_Equal:
+      mem = self.mem
 
-      if op_id == Id.Arith_Equal:
-        rhs = self.Eval(node.right)
-        lval = _EvalLhsArith(node.left, self.mem, self)
+      def assign():
+        rhs = right_f()
+        lval = _EvalLhsArith(left, mem, self)
         self._Store(lval, rhs)
         return rhs
+      return assign
 
-      old_int, lval = self._EvalLhsAndLookupArith(node.left)
-      rhs = self.Eval(node.right)
-
-      if op_id == Id.Arith_PlusEqual:
-        new_int = old_int + rhs
-      elif op_id == Id.Arith_MinusEqual:
-        new_int = old_int - rhs
-      elif op_id == Id.Arith_StarEqual:
-        new_int = old_int * rhs
-      elif op_id == Id.Arith_SlashEqual:
+    if op_id == Id.Arith_SlashEqual:
+      def op(old_int, rhs):
         try:
-          new_int = old_int / rhs
+          return old_int / rhs
         except ZeroDivisionError:
           # TODO: location
           e_die('Divide by zero')
-      elif op_id == Id.Arith_PercentEqual:
-        new_int = old_int % rhs
-
-      elif op_id == Id.Arith_DGreatEqual:
-        new_int = old_int >> rhs
-      elif op_id == Id.Arith_DLessEqual:
-        new_int = old_int << rhs
-      elif op_id == Id.Arith_AmpEqual:
-        new_int = old_int & rhs
-      elif op_id == Id.Arith_PipeEqual:
-        new_int = old_int | rhs
-      elif op_id == Id.Arith_CaretEqual:
-        new_int = old_int ^ rhs
-      else:
+    else:
+      try:
+        op = _ASSIGN_OPS[op_id]
+      except KeyError:
         raise AssertionError(op_id)  # shouldn't get here
 
+    def binary_assign():
+      old_int, lval = self._EvalLhsAndLookupArith(left)
+      rhs = right_f()
+      new_int = op(old_int, rhs)
       self._Store(lval, new_int)
       return new_int
+    return binary_assign
 
-    if node.tag == arith_expr_e.Unary:
-      op_id = node.op_id
-
-      if op_id == Id.Node_UnaryPlus:
-        return self.Eval(node.child)
-      if op_id == Id.Node_UnaryMinus:
-        return -self.Eval(node.child)
-
-      if op_id == Id.Arith_Bang:  # logical negation
-        return int(not self.Eval(node.child))
-      if op_id == Id.Arith_Tilde:  # bitwise complement
-        return ~self.Eval(node.child)
+  def _CompileBinary(self, node, left_f, right_f):
+    op_id = node.op_id
 
-      raise AssertionError(op_id)
-
-    if node.tag == arith_expr_e.Binary:
-      op_id = node.op_id
-
-      lhs = self.Eval(node.left)
-
-      # Short-circuit evaluation for || and &&.
-      if op_id == Id.Arith_DPipe:
-        if lhs == 0:
-          rhs = self.Eval(node.right)
-          return int(rhs != 0)
+    # Short-circuit evaluation for || and &&.
+    if op_id == Id.Arith_DPipe:
+      def logical_or():
+        if left_f() == 0:
+          return int(right_f() != 0)
         else:
           return 1  # true
-      if op_id == Id.Arith_DAmp:
-        if lhs == 0:
+      return logical_or
+
+    if op_id == Id.Arith_DAmp:
+      def logical_and():
+        if left_f() == 0:
           return 0  # false
         else:
-          rhs = self.Eval(node.right)
-          return int(rhs != 0)
-
-      rhs = self.Eval(node.right)  # eager evaluation for the rest
+          return int(right_f() != 0)
+      return logical_and
 
-      if op_id == Id.Arith_LBracket:
-        # MaybeStrArray or AssocArray
-        if isinstance(lhs, list):
-          if not isinstance(rhs, int):
-            e_die('Expected index to be an integer, got %r', rhs)
-          try:
-            item = lhs[rhs]
-          except IndexError:
-            if self.exec_opts.nounset:
-              e_die('Index out of bounds')
-            else:
-              # TODO: Should be None for Undef instead?  Or ''?
-              return 0
-
-        # Quirk: (( A[$key] = 42 )) works
-        #        (( x = A[$key] )) doesn't work because $key is coerced to
-        #        an integer
-        # We could relax this restriction by using value_t here instead of the
-        # None/int/list representation.
-
-        elif isinstance(lhs, dict):
-          e_die("Can't evaluate associative arrays in arithmetic contexts")
+    # The rest evaluate both sides eagerly.
 
-        else:
-          # TODO: Add error context
-          e_die('Expected array in index expression, got %s', lhs)
+    if op_id == Id.Arith_LBracket:
+      def index():
+        lhs = left_f()
+        rhs = right_f()
+        return self._Index(lhs, rhs)
+      return index
 
-        assert isinstance(item, str), item
-        return self._StringToIntegerOrError(item)
+    if op_id == Id.Arith_Comma:
+      def comma():
+        left_f()
+        return right_f()
+      return comma
 
-      if op_id == Id.Arith_Comma:
-        return rhs
+    if op_id == Id.Arith_Slash:
+      error_expr = node.right
 
-      # Do additional type checking after indexing and comma.
-      if not isinstance(lhs, int):
-        e_die('LHS should be an integer, got %s', lhs)
-      if not isinstance(rhs, int):
-        e_die('RHS should be an integer, got %s', rhs)
-
-      if op_id == Id.Arith_Plus:
-        return lhs + rhs
-      if op_id == Id.Arith_Minus:
-        return lhs - rhs
-      if op_id == Id.Arith_Star:
-        return lhs * rhs
-      if op_id == Id.Arith_Slash:
+      def op(lhs, rhs):
         try:
           return lhs / rhs
         except ZeroDivisionError:
           # TODO: _ErrorWithLocation should also accept arith_expr ?  I
           # think I needed that for other stuff.
           # Or I could blame the '/' token, instead of op_id.
-          error_expr = node.right  # node is Binary
           if error_expr.tag == arith_expr_e.VarRef:
             # TODO: VarRef should store a token instead of a string!
             e_die('Divide by zero (name)')
           elif error_expr.tag == arith_expr_e.ArithWord:
-            e_die('Divide by zero', word=node.right.w)
+            e_die('Divide by zero', word=error_expr.w)
           else:
             e_die('Divide by zero')
 
-      if op_id == Id.Arith_Percent:
-        return lhs % rhs
-
-      if op_id == Id.Arith_DStar:
-        # OVM is stripped of certain functions that are somehow necessary for
-        # exponentiation.
-        # Python/ovm_stub_pystrtod.c:21: PyOS_double_to_string: Assertion `0'
-        # failed.
-        if rhs < 0:
-          e_die("Exponent can't be less than zero")  # TODO: error location
-        result = 1
-        for i in xrange(rhs):
-          result *= lhs
-        return result
-
-      if op_id == Id.Arith_DEqual:
-        return int(lhs == rhs)
-      if op_id == Id.Arith_NEqual:
-        return int(lhs != rhs)
-      if op_id == Id.Arith_Great:
-        return int(lhs > rhs)
-      if op_id == Id.Arith_GreatEqual:
-        return int(lhs >= rhs)
-      if op_id == Id.Arith_Less:
-        return int(lhs < rhs)
-      if op_id == Id.Arith_LessEqual:
-        return int(lhs <= rhs)
-
-      if op_id == Id.Arith_Pipe:
-        return lhs | rhs
-      if op_id == Id.Arith_Amp:
-        return lhs & rhs
-      if op_id == Id.Arith_Caret:
-        return lhs ^ rhs
-
-      # Note: how to define shift of negative numbers?
-      if op_id == Id.Arith_DLess:
-        return lhs << rhs
-      if op_id == Id.Arith_DGreat:
-        return lhs >> rhs
+    elif op_id == Id.Arith_DStar:
+      op = _Power
 
-      raise AssertionError(op_id)
+    else:
+      try:
+        op = _BINARY_OPS[op_id]
+      except KeyError:
+        raise AssertionError(op_id)
 
-    if node.tag == arith_expr_e.TernaryOp:
-      cond = self.Eval(node.cond)
-      if cond:  # nonzero
-        return self.Eval(node.true_expr)
-      else:
-        return self.Eval(node.false_expr)
+    def binary():
+      lhs = left_f()
+      rhs = right_f()
 
-    raise AssertionError("Unhandled node %r" % node.__class__.__name__)
+      # Do additional type checking after indexing and comma.
+      if not isinstance(lhs, int):
+        e_die('LHS should be an integer, got %s', lhs)
+      if not isinstance(rhs, int):
+        e_die('RHS should be an integer, got %s', rhs)
+
+      return op(lhs, rhs)
+    return binary
+
+  def _Index(self, lhs, rhs):
+    """For a[i] on the RHS."""
+    # MaybeStrArray or AssocArray
+    if isinstance(lhs, list):
+      if not isinstance(rhs, int):
+        e_die('Expected index to be an integer, got %r', rhs)
+      try:
+        item = lhs[rhs]
+      except IndexError:
+        if self.exec_opts.nounset:
+          e_die('Index out of bounds')
+        else:
+          # TODO: Should be None for Undef instead?  Or ''?
+          return 0
+
+    # Quirk: (( A[$key] = 42 )) works
+    #        (( x = A[$key] )) doesn't work because $key is coerced to
+    #        an integer
+    # We could relax this restriction by using value_t here instead of the
+    # None/int/list representation.
+
+    elif isinstance(lhs, dict):
+      e_die("Can't evaluate associative arrays in arithmetic contexts")
+
+    else:
+      # TODO: Add error context
+      e_die('Expected array in index expression, got %s', lhs)
+
+    assert isinstance(item, str), item
+    return self._StringToIntegerOrError(item)
 
   def EvalWordToString(self, node):
     """
@@ -14,6 +14,7 @@ from _devbuild.gen.syntax_asdl import (
 from core import util
 #from core.util import log
 from frontend import match
+from pylib import path_stat
 
 
 def LooksLikeGlob(s):
@@ -318,6 +319,12 @@ def GlobToERE(pat):
   return regex, warnings
 
 
+# libc.globstar() tracks the active components of a pattern in a 64-bit mask.
+_GLOBSTAR_MAX_PARTS = 64
+# Number of threads that walk the tree.  0 means one per CPU.
+_GLOBSTAR_THREADS = 0
+
+
 class Globber(object):
   def __init__(self, exec_opts):
     self.exec_opts = exec_opts
@@ -328,7 +335,7 @@ class Globber(object):
 
     # shopt: why the difference?  No command line switch I guess.
     self.dotglob = False  # dotfiles are matched
-    self.globstar = False  # ** for directories
+    # NOTE: globstar (** for directories) is exec_opts.globstar
     # globasciiranges - ascii or unicode char classes (unicode by default)
     # nocaseglob
     # extglob: the !() syntax
@@ -336,6 +343,42 @@ class Globber(object):
     # TODO: Figure out which ones are in other shells, and only support those?
     # - Include globstar since I use it, and zsh has it.
 
+  def _ExpandGlobstar(self, arg):
+    """Expand a glob with a ** component, e.g. src/**/*.py.
+
+    libc.glob() doesn't understand **, so the directory tree is walked
+    natively by libc.globstar().  The literal leading components are the root
+    of the walk, so src/**/*.py doesn't list the current directory.
+    """
+    dirs_only = arg.endswith('/')  # **/ matches only directories
+    parts = [p for p in arg.split('/') if p]
+
+    i = 0
+    n = len(parts)
+    while i < n and not LooksLikeGlob(parts[i]):
+      i += 1
+    root = '/'.join(GlobUnescape(p) for p in parts[:i])
+    if arg.startswith('/'):
+      root = '/' + root
+
+    rest = parts[i:]
+    if len(rest) > _GLOBSTAR_MAX_PARTS:
+      return libc.glob(arg)  # ** is treated like *, which is wrong but safe
+    results = libc.globstar(root, rest, dirs_only, self.dotglob,
+                            _GLOBSTAR_THREADS)
+
+    # When ** matches zero directories, the root itself is a result.  Like
+    # bash, a/** gives a/ but a/**/** gives a.  If the root isn't a
+    # directory, there's no match, and the word may be left alone.
+    if root and all(p == '**' for p in rest) and path_stat.isdir(root):
+      if root.endswith('/'):
+        results.insert(0, root)
+      elif len(rest) == 1 or dirs_only:
+        results.insert(0, root + '/')
+      else:
+        results.insert(0, root)
+    return results
+
   def Expand(self, arg):
     """Given a string that could be a glob, return a list of strings."""
     # e.g. don't glob 'echo' because it doesn't look like a glob
@@ -349,7 +392,10 @@ class Globber(object):
       #g = glob.glob(arg)  # Bad Python glob
       # PROBLEM: / is significant and can't be escaped!  Have to avoid
       # globbing it.
-      g = libc.glob(arg)
+      if self.exec_opts.globstar and '**' in arg.split('/'):
+        g = self._ExpandGlobstar(arg)
+      else:
+        g = libc.glob(arg)
     except Exception as e:
       # - [C\-D] is invalid in Python?  Regex compilation error.
       # - [:punct:] not supported
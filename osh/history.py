@@ -14,6 +14,135 @@ from frontend.match import HISTORY_LEXER
 from frontend import reader
 from osh import word_
 
+import posix_ as posix
+
+from typing import Any, List, Optional
+
+# Keep this many lines when loading the history file.
+_MAX_LINES = 10000
+
+
+def _ReadFile(path):
+  # type: (str) -> str
+  fd = posix.open(path, posix.O_RDONLY, 0)
+  try:
+    chunks = []
+    while True:
+      chunk = posix.read(fd, 65536)
+      if not chunk:
+        break
+      chunks.append(chunk)
+  finally:
+    posix.close(fd)
+  return ''.join(chunks)
+
+
+class HistoryFile(object):
+  """Interactive history, saved in a file that concurrent shells append to.
+
+  Each line is appended with one O_APPEND write when it's accepted, so shells
+  don't clobber each other's history.  The file is loaded after the first
+  prompt is drawn.  Older duplicates are dropped, and the file is rewritten
+  when most of it was dropped.
+
+  history.Evaluator and the 'history' builtin use it like the readline module.
+  """
+
+  def __init__(self, readline_mod, max_lines=_MAX_LINES):
+    # type: (Any, int) -> None
+    self.readline_mod = readline_mod
+    self.max_lines = max_lines
+    self.path = None  # type: Optional[str]
+    self.loaded = False
+    self.items = []  # type: List[str]
+
+  def SetPath(self, path):
+    # type: (str) -> None
+    self.path = path
+
+  def Load(self):
+    # type: () -> None
+    """Read the file.  Called from readline's pre-input hook."""
+    if self.loaded:
+      return
+    self.loaded = True
+    if self.path is None:
+      return
+
+    try:
+      contents = _ReadFile(self.path)
+    except OSError:  # e.g. no history yet
+      return
+    lines = [line for line in contents.split('\n') if line]
+
+    # Keep the last occurrence of each line.
+    seen = set()
+    kept = []
+    for line in reversed(lines):
+      if line not in seen:
+        seen.add(line)
+        kept.append(line)
+        if len(kept) == self.max_lines:
+          break
+    kept.reverse()
+
+    # Rewriting costs about as much as reading, so it's amortized.
+    if len(lines) > 2 * len(kept):
+      self._Rewrite(kept)
+
+    # Lines accepted before loading were appended to the file, so they're
+    # already in 'kept'.
+    self.items = kept
+    self.readline_mod.clear_history()
+    for line in self.items:
+      self.readline_mod.add_history(line)
+
+  def _Rewrite(self, lines):
+    # type: (List[str]) -> None
+    tmp_path = '%s.%d.tmp' % (self.path, posix.getpid())
+    try:
+      fd = posix.open(tmp_path, posix.O_WRONLY | posix.O_CREAT | posix.O_TRUNC,
+                      0o600)
+      try:
+        posix.write(fd, ''.join(line + '\n' for line in lines))
+      finally:
+        posix.close(fd)
+      # Lines that other shells append in the meantime are lost.
+      posix.rename(tmp_path, self.path)
+    except OSError:
+      pass
+
+  def Append(self, line):
+    # type: (str) -> None
+    """Add an accepted line, without a trailing newline."""
+    self.items.append(line)
+    self.readline_mod.add_history(line)
+    if self.path is None:
+      return
+
+    # Open it every time, so child processes don't inherit it.
+    try:
+      fd = posix.open(self.path,
+                      posix.O_WRONLY | posix.O_APPEND | posix.O_CREAT, 0o600)
+      try:
+        posix.write(fd, line + '\n')
+      finally:
+        posix.close(fd)
+    except OSError:
+      pass
+
+  # Same interface as readline.
+
+  def get_current_history_length(self):
+    # type: () -> int
+    return len(self.items)
+
+  def get_history_item(self, one_based_index):
+    # type: (int) -> Optional[str]
+    if 1 <= one_based_index <= len(self.items):
+      return self.items[one_based_index - 1]
+    return None  # matches what readline does
+
 
 class Evaluator(object):
   """Expand ! commands within the command line.
@@ -4,8 +4,11 @@ history_test.py: Tests for history.py
 """
 from __future__ import print_function
 
-import unittest
+import os
+import shutil
 import sys
+import tempfile
+import unittest
 
 from core import test_lib
 from core import util
@@ -27,6 +30,12 @@ class _MockReadlineHistory(object):
     except IndexError:
       return None  # matches what readline does
 
+  def add_history(self, line):
+    self.items.append(line)
+
+  def clear_history(self):
+    del self.items[:]
+
 
 def _MakeHistoryEvaluator(history_items):
   arena = test_lib.MakeArena('<reader_test.py>')
@@ -116,5 +125,63 @@ class HistoryEvaluatorTest(unittest.TestCase):
     self.assertEqual('echo yy', hist_ev.Eval('echo !$'))
 
 
+class HistoryFileTest(unittest.TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.tmp_dir, 'history')
+
+  def tearDown(self):
+    shutil.rmtree(self.tmp_dir)
+
+  def _Read(self):
+    with open(self.path) as f:
+      return f.read()
+
+  def testLoad(self):
+    with open(self.path, 'w') as f:
+      f.write('a\nb\na\nc\n')
+
+    readline = _MockReadlineHistory([])
+    hist_file = history.HistoryFile(readline, max_lines=3)
+    hist_file.SetPath(self.path)
+
+    hist_file.Append('d')  # before loading
+    hist_file.Load()
+    self.assertEqual(['a', 'c', 'd'], readline.items)
+    self.assertEqual(3, hist_file.get_current_history_length())
+    self.assertEqual('a', hist_file.get_history_item(1))
+    self.assertEqual(None, hist_file.get_history_item(4))
+
+    # Loaded once
+    hist_file.Load()
+    self.assertEqual(['a', 'c', 'd'], readline.items)
+
+    # Appended, not rewritten
+    self.assertEqual('a\nb\na\nc\nd\n', self._Read())
+
+  def testRewrite(self):
+    with open(self.path, 'w') as f:
+      f.write('x\n' * 5 + 'y\n')
+
+    hist_file = history.HistoryFile(_MockReadlineHistory([]))
+    hist_file.SetPath(self.path)
+    hist_file.Load()
+    self.assertEqual('x\ny\n', self._Read())
+
+  def testConcurrentShells(self):
+    shells = []
+    for i in xrange(2):
+      hist_file = history.HistoryFile(_MockReadlineHistory([]))
+      hist_file.SetPath(self.path)
+      hist_file.Load()  # no file yet
+      shells.append(hist_file)
+
+    shells[0].Append('one')
+    shells[1].Append('two')
+    shells[0].Append('three')
+    self.assertEqual('one\ntwo\nthree\n', self._Read())
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python2
+"""
+path_index.py - An index of the executables in $PATH directories.
+
+Listing /usr/bin and calling access() on each entry is slow, so the first TAB
+in a new shell could take hundreds of milliseconds.  The index remembers the
+executables in each directory, keyed by the directory's mtime and inode, and
+interactive shells share it through a file:
+
+  ~/.config/oil/path_index
+
+An entry is valid as long as the directory hasn't changed.  Adding, removing,
+or renaming a file changes the mtime, but chmod doesn't, so completion may be
+stale after chmod +x.  Running commands doesn't use the index.
+"""
+from __future__ import print_function
+
+import errno
+import marshal
+
+from pylib import os_path
+
+import posix_ as posix
+
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+if TYPE_CHECKING:
+  # dir -> (mtime, inode, names)
+  _Entries = Dict[str, Tuple[float, int, List[str]]]
+
+_VERSION = 1
+
+
+def _ReadFile(path):
+  # type: (str) -> _Entries
+  try:
+    with open(path, 'rb') as f:
+      version, entries = marshal.load(f)
+  except (IOError, OSError, EOFError, ValueError, TypeError):
+    return {}  # missing, or written by a different version
+  if version != _VERSION:
+    return {}
+  return entries
+
+
+def _ListExecutables(d):
+  # type: (str) -> List[str]
+  names = []
+  for name in posix.listdir(d):
+    # The file may have been removed since listdir(), in which case access()
+    # returns False.
+    if posix.access(os_path.join(d, name), posix.X_OK):
+      names.append(name)  # the name, not the path
+  return names
+
+
+class PathIndex(object):
+  """Executables in each directory, shared across shells."""
+
+  def __init__(self):
+    # type: () -> None
+    self.path = None  # type: Optional[str]
+    self.file_mtime = None  # type: Optional[float]
+    self.entries = {}  # type: _Entries
+    self.dirty = False
+
+  def SetPath(self, path):
+    # type: (str) -> None
+    """Share the index through this file.  It's read lazily."""
+    self.path = path
+
+  def _MaybeReload(self):
+    # type: () -> None
+    """Pick up entries that other shells wrote."""
+    if self.path is None:
+      return
+    try:
+      mtime = posix.stat(self.path).st_mtime
+    except OSError:
+      return
+    if mtime == self.file_mtime:
+      return
+    self.file_mtime = mtime
+
+    for d, entry in _ReadFile(self.path).iteritems():
+      mine = self.entries.get(d)
+      if mine is None or entry[0] > mine[0]:  # newer listing
+        self.entries[d] = entry
+
+  def _Stat(self, d):
+    # type: (str) -> Optional[Tuple[float, int]]
+    try:
+      st = posix.stat(d)
+    except OSError:  # There could be a dir in $PATH that doesn't exist.
+      return None
+    return st.st_mtime, st.st_ino
+
+  def _Fresh(self, d, key):
+    # type: (str, Tuple[float, int]) -> Optional[List[str]]
+    entry = self.entries.get(d)
+    if entry is not None and (entry[0], entry[1]) == key:
+      return entry[2]
+    return None
+
+  def Executables(self, d):
+    # type: (str) -> List[str]
+    """Returns the executables in a directory, listing it if necessary."""
+    key = self._Stat(d)
+    if key is None:
+      return []
+
+    names = self._Fresh(d, key)
+    if names is None:
+      self._MaybeReload()
+      names = self._Fresh(d, key)
+    if names is None:
+      try:
+        names = _ListExecutables(d)
+      except OSError:  # not a directory, permission denied, etc.
+        return []
+      self.entries[d] = (key[0], key[1], names)
+      self.dirty = True
+    return names
+
+  def Save(self):
+    # type: () -> None
+    """Write new entries, merged with those of other shells."""
+    if not self.dirty or self.path is None:
+      return
+
+    entries = _ReadFile(self.path)
+    for d, entry in self.entries.iteritems():
+      theirs = entries.get(d)
+      if theirs is None or entry[0] >= theirs[0]:
+        entries[d] = entry
+    # Drop directories that were removed.
+    for d in [d for d in entries if self._Stat(d) is None]:
+      del entries[d]
+
+    # Replace the file atomically, since other shells may be reading it.
+    tmp_path = '%s.%d.tmp' % (self.path, posix.getpid())
+    try:
+      with open(tmp_path, 'wb') as f:
+        marshal.dump((_VERSION, entries), f)
+      posix.rename(tmp_path, self.path)
+    except (IOError, OSError):
+      # It's only a cache, e.g. ~/.config/oil may not exist.  Don't print
+      # errors in the middle of completion.
+      try:
+        posix.unlink(tmp_path)
+      except OSError:
+        pass
+      return
+    self.dirty = False
+
+  def Prewarm(self, path_dirs):
+    # type: (List[str]) -> None
+    """Index $PATH in a background process, so the first TAB is fast.
+
+    The shell picks up the result the next time it reads the index.
+    """
+    if self.path is None:
+      return
+
+    pid = posix.fork()
+    if pid == 0:
+      # Fork again so the shell doesn't see the indexer as one of its jobs.
+      try:
+        if posix.fork() == 0:
+          for d in path_dirs:
+            self.Executables(d)
+          self.Save()
+      except BaseException:  # e.g. Ctrl-C at the prompt
+        pass
+      posix._exit(0)
+
+    while True:
+      try:
+        posix.waitpid(pid, 0)
+        break
+      except OSError as e:
+        if e.errno != errno.EINTR:
+          raise
@@ -0,0 +1,88 @@
+#!/usr/bin/env python2
+"""
+path_index_test.py: Tests for path_index.py
+"""
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from osh import path_index  # module under test
+
+
+class PathIndexTest(unittest.TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    self.bin_dir = os.path.join(self.tmp_dir, 'bin')
+    os.mkdir(self.bin_dir)
+    self.index_path = os.path.join(self.tmp_dir, 'path_index')
+
+  def tearDown(self):
+    shutil.rmtree(self.tmp_dir)
+
+  def _WriteFile(self, name, executable=True):
+    path = os.path.join(self.bin_dir, name)
+    with open(path, 'w') as f:
+      f.write('#!/bin/sh\n')
+    os.chmod(path, 0o755 if executable else 0o644)
+
+    # Make sure the directory's mtime changes
+    t = time.time() + len(os.listdir(self.bin_dir))
+    os.utime(self.bin_dir, (t, t))
+
+  def testExecutables(self):
+    self._WriteFile('foo')
+    self._WriteFile('notes.txt', executable=False)
+
+    index = path_index.PathIndex()
+    self.assertEqual(['foo'], index.Executables(self.bin_dir))
+    self.assertEqual(True, index.dirty)
+    self.assertEqual([], index.Executables('/nonexistent'))
+
+    # A new file changes the directory's mtime
+    self._WriteFile('bar')
+    self.assertEqual(['bar', 'foo'], sorted(index.Executables(self.bin_dir)))
+
+  def testShared(self):
+    self._WriteFile('foo')
+
+    index1 = path_index.PathIndex()
+    index1.SetPath(self.index_path)
+    index1.Executables(self.bin_dir)
+    index1.Save()
+    self.assertEqual(False, index1.dirty)
+
+    # Another shell reads the index instead of listing the directory
+    index2 = path_index.PathIndex()
+    index2.SetPath(self.index_path)
+    self.assertEqual(['foo'], index2.Executables(self.bin_dir))
+    self.assertEqual(False, index2.dirty)
+
+    # A stale entry isn't used
+    self._WriteFile('bar')
+    index3 = path_index.PathIndex()
+    index3.SetPath(self.index_path)
+    self.assertEqual(['bar', 'foo'], sorted(index3.Executables(self.bin_dir)))
+    self.assertEqual(True, index3.dirty)
+
+  def testPrewarm(self):
+    self._WriteFile('foo')
+
+    index = path_index.PathIndex()
+    index.SetPath(self.index_path)
+    index.Prewarm([self.bin_dir, '/nonexistent'])
+
+    for _ in xrange(100):  # The indexer runs in the background
+      if os.path.exists(self.index_path):
+        break
+      time.sleep(0.01)
+    self.assertEqual(['foo'], index.Executables(self.bin_dir))
+    self.assertEqual(False, index.dirty)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -230,7 +230,7 @@ _AGGRESSIVE_RUNTIME_OPTIONS = [
 
 # Used by core/builtin_comp.py too.
 SHOPT_OPTION_NAMES = [
-    'nullglob', 'failglob',
+    'nullglob', 'failglob', 'globstar',
     'inherit_errexit',
 
     # No-ops for bash compatibility
@@ -334,6 +334,7 @@ class ExecOpts(object):
     # these.
     self.nullglob = False
     self.failglob = False
+    self.globstar = False  # ** matches directories recursively
     self.inherit_errexit = False
 
     # No-ops for bash compatibility.
@@ -555,6 +556,11 @@ class _ArgFrame(object):
     self.num_shifted = 0
 
 
+def _ParamFrame(names, vals):
+  """A new namespace that binds each name to the value at the same index."""
+  return dict(zip(names, [runtime_asdl.cell(val, False, False) for val in vals]))
+
+
 def _DumpVarFrame(frame):
   """Dump the stack frame as reasonably compact and readable JSON."""
 
@@ -630,6 +636,13 @@ def _GetWorkingDir():
     e_die("Can't determine working directory: %s", posix.strerror(e.errno))
 
 
+# Variables that GetVar() computes instead of looking up in a cell.
+COMPUTED_VARS = frozenset([
+    'ARGV', 'PIPESTATUS', 'FUNCNAME', 'BASH_SOURCE', 'CALL_SOURCE',
+    'BASH_LINENO', 'LINENO', 'SOURCE_NAME',
+])
+
+
 class Mem(object):
   """For storing variables.
 
@@ -644,9 +657,20 @@ class Mem(object):
   Modules: cmd_exec, word_eval, expr_eval, completion
   """
   def __init__(self, dollar0, argv, environ, arena, has_main=False):
+    self.arena = arena
+    self.Reset(dollar0, argv, environ, has_main=has_main)
+
+  def Reset(self, dollar0, argv, environ, has_main=False):
+    """Start over with no variables, as if the shell had just started.
+
+    The children of 'osh --server' call this on their copy of the server's Mem.
+    Global funcs like len() have to be set again.
+    """
     self.dollar0 = dollar0
     self.argv_stack = [_ArgFrame(argv)]
     self.var_stack = [{}]
+    # name -> global cell of a builtin func like len(), which 'var' can redefine
+    self.builtin_cells = {}
 
     # The debug_stack isn't strictly necessary for execution.  We use it for
     # crash dumps and for 3 parallel arrays: FUNCNAME, CALL_SOURCE,
@@ -678,8 +702,6 @@ class Mem(object):
     # it can't be modified by users.
     self.pwd = self.GetVar('PWD').s
 
-    self.arena = arena
-
   def __repr__(self):
     parts = []
     parts.append('<Mem')
@@ -846,10 +868,19 @@ class Mem(object):
   # Call Stack
   #
 
-  def PushCall(self, func_name, def_spid, argv):
-    """For function calls."""
+  def PushCall(self, func_name, def_spid, argv, param_names=None,
+               param_vals=None):
+    """For function calls.
+
+    Oil procs pass the names of their params, from Proc.param_names, and their
+    values.  The frame starts with those variables, so they aren't set one at
+    a time.
+    """
     self.argv_stack.append(_ArgFrame(argv))
-    self.var_stack.append({})
+    if param_names:
+      self.var_stack.append(_ParamFrame(param_names, param_vals))
+    else:
+      self.var_stack.append({})
 
     # bash uses this order: top of stack first.
     self._PushDebugStack(func_name, None)
@@ -880,10 +911,16 @@ class Mem(object):
     if argv:
       self.argv_stack.pop()
 
-  def PushTemp(self):
-    """For the temporary scope in 'FOO=bar BAR=baz echo'."""
+  def PushTemp(self, param_names=None, param_vals=None):
+    """For the temporary scope in 'FOO=bar BAR=baz echo'.
+
+    Also for Oil funcs and lambdas, which bind params like PushCall().
+    """
     # We don't want the 'read' builtin to write to this frame!
-    self.var_stack.append({})
+    if param_names:
+      self.var_stack.append(_ParamFrame(param_names, param_vals))
+    else:
+      self.var_stack.append({})
     self._PushDebugStack(None, None)
 
   def PopTemp(self):
@@ -1021,6 +1058,10 @@ class Mem(object):
     """
 
     if cell and keyword_id == Id.KW_Var:
+      if self.builtin_cells.get(lval.name) is cell:
+        # Shadowing a builtin func, e.g. var sort = ...  Only once.
+        del self.builtin_cells[lval.name]
+        return
       # TODO: Point at the ORIGINAL declaration!
       e_die("%r has already been declared", lval.name)
 
@@ -1028,6 +1069,11 @@ class Mem(object):
       # NOTE: all 3 variants of 'lvalue' have 'name'
       e_die("%r hasn't been declared", lval.name)
 
+  def SetBuiltinFunc(self, name, val):
+    """Define a global func like len().  Scripts can redefine it with 'var'."""
+    self.SetVar(sh_lhs_expr.Name(name), val, (), scope_e.GlobalOnly)
+    self.builtin_cells[name] = self.var_stack[0][name]
+
   def SetVar(self, lval, val, flags_to_set, lookup_mode, flags_to_clear=(),
              keyword_id=None):
     """
@@ -1193,6 +1239,19 @@ class Mem(object):
     cell = self.var_stack[0][name]
     cell.val = new_val
 
+  def GetLocalOrGlobal(self, name):
+    """For Oil expressions, which don't use dynamic scope.
+
+    Like GetVar() with LocalOnly, then GlobalOnly, but with one call.  It
+    doesn't handle the names in COMPUTED_VARS.
+    """
+    cell = self.var_stack[-1].get(name)
+    if cell is None or cell.val.tag == value_e.Undef:
+      cell = self.var_stack[0].get(name)
+      if cell is None:
+        return value.Undef()
+    return cell.val
+
   def GetVar(self, name, lookup_mode=scope_e.Dynamic):
     assert isinstance(name, str), name
 
@@ -1366,6 +1425,30 @@ class Mem(object):
     return result
 
 
+class LoopVar(object):
+  """The iteration variable of a for loop, in the local scope.
+
+  The first iteration goes through SetVar().  Later ones overwrite the value
+  in the same cell, unless the loop body unset the variable, or made it
+  readonly or exported.  Then SetVar() does the checks again.
+  """
+  def __init__(self, mem, name):
+    self.mem = mem
+    self.name = name
+    self.cell = None
+
+  def Set(self, val):
+    cell = self.cell
+    if (cell is not None and not cell.readonly and not cell.exported and
+        self.mem.var_stack[-1].get(self.name) is cell):
+      cell.val = val
+      return
+
+    namespace = self.mem.var_stack[-1]
+    self.mem.SetVar(sh_lhs_expr.Name(self.name), val, (), scope_e.LocalOnly)
+    self.cell = namespace[self.name]
+
+
 def SetLocalString(mem, name, s):
   """Set a local string.
 
@@ -5,6 +5,7 @@ state_test.py: Tests for state.py
 
 import unittest
 
+from _devbuild.gen.id_kind_asdl import Id
 from _devbuild.gen.runtime_asdl import (
     scope_e, lvalue, value, value_e, var_flags_e,
 )
@@ -78,6 +79,71 @@ class MemTest(unittest.TestCase):
     self.assertEqual(1, len(mem.var_stack))
     self.assertEqual('1', mem.var_stack[-1]['x'].val.s)
 
+  def testPushParams(self):
+    mem = _InitMem()
+    mem.SetVar(
+        lvalue.Named('x'), value.Str('1'), (), scope_e.Dynamic)
+
+    # func f(x, ...rest)
+    mem.PushTemp(['x', 'rest'], [value.Str('arg'), value.Obj(())])
+    self.assertEqual('arg', mem.GetVar('x').s)
+    self.assertEqual((), mem.GetVar('rest').obj)
+    cell = mem.var_stack[-1]['x']
+    self.assertEqual(False, cell.exported)
+    self.assertEqual(False, cell.readonly)
+
+    # Later assignments go to the param's cell
+    mem.SetVar(
+        lvalue.Named('x'), value.Str('new'), (), scope_e.LocalOnly)
+    self.assertEqual('new', cell.val.s)
+    mem.PopTemp()
+    self.assertEqual('1', mem.GetVar('x').s)
+
+    # proc p(a) in a new call frame
+    mem.PushCall('p', 0, [], ['a'], [value.Str('A')])
+    self.assertEqual('A', mem.GetVar('a').s)
+    mem.PopCall()
+    self.assertEqual(value_e.Undef, mem.GetVar('a').tag)
+
+  def testLoopVar(self):
+    mem = _InitMem()
+    loop_var = state.LoopVar(mem, 'x')
+    loop_var.Set(value.Str('a'))
+    cell = mem.var_stack[-1]['x']
+    loop_var.Set(value.Str('b'))
+    self.assertEqual('b', cell.val.s)  # same cell
+    self.assertTrue(mem.var_stack[-1]['x'] is cell)
+
+    # The body unsets it
+    mem.Unset(lvalue.Named('x'), scope_e.Dynamic)
+    loop_var.Set(value.Str('c'))
+    self.assertEqual('c', mem.GetVar('x').s)
+
+    # The body makes it readonly
+    mem.SetVar(lvalue.Named('x'), None, (var_flags_e.ReadOnly,),
+               scope_e.Dynamic)
+    self.assertRaises(util.FatalRuntimeError, loop_var.Set, value.Str('d'))
+
+    # The body exports it
+    loop_var = state.LoopVar(mem, 'y')
+    loop_var.Set(value.Obj(1))
+    mem.SetVar(lvalue.Named('y'), value.Str('s'), (var_flags_e.Exported,),
+               scope_e.Dynamic)
+    self.assertRaises(util.FatalRuntimeError, loop_var.Set, value.Obj(2))
+
+  def testSetBuiltinFunc(self):
+    mem = _InitMem()
+    mem.SetBuiltinFunc('len', value.Obj(len))
+    self.assertEqual(len, mem.GetVar('len').obj)
+
+    # var can redefine it once
+    mem.SetVar(lvalue.Named('len'), value.Str('x'), (), scope_e.LocalOnly,
+               keyword_id=Id.KW_Var)
+    self.assertEqual('x', mem.GetVar('len').s)
+    self.assertRaises(util.FatalRuntimeError, mem.SetVar, lvalue.Named('len'),
+                      value.Str('y'), (), scope_e.LocalOnly,
+                      keyword_id=Id.KW_Var)
+
   def testSetVarClearFlag(self):
     mem = _InitMem()
     print(mem)
@@ -302,6 +368,19 @@ class MemTest(unittest.TestCase):
     mem.SetArgv(['i', 'j', 'k'])
     self.assertEqual(['i', 'j', 'k'], mem.GetArgv())
 
+  def testReset(self):
+    mem = _InitMem()
+    state.ExportGlobalString(mem, 'FOO', 'foo')
+    state.SetGlobalString(mem, 'bar', 'bar')
+    mem.PushCall('my-func', 0, ['a'])
+
+    mem.Reset('osh', ['z'], {'SPAM': 'eggs'})
+    self.assertEqual(['z'], mem.GetArgv())
+    self.assertEqual(value_e.Undef, mem.GetVar('FOO').tag)
+    self.assertEqual(value_e.Undef, mem.GetVar('bar').tag)
+    self.assertEqual('eggs', mem.GetVar('SPAM').s)
+    self.assertEqual({'SPAM': 'eggs', 'PWD': mem.pwd}, mem.GetExported())
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -15,6 +15,10 @@ from osh import glob_
 
 import libc
 
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+if TYPE_CHECKING:
+  from _devbuild.gen.id_kind_asdl import Id_t
+
 
 def Utf8Encode(code):
   """Return utf-8 encoded bytes from a unicode code point.
@@ -55,40 +59,63 @@ INCOMPLETE_CHAR = 'Incomplete UTF-8 character'
 INVALID_CONT = 'Invalid UTF-8 continuation byte'
 INVALID_START = 'Invalid start of UTF-8 character'
 
+# Error codes returned by libc.utf8_count() and libc.utf8_advance()
+_UTF8_ERRORS = {
+    -1: INCOMPLETE_CHAR,
+    -2: INVALID_CONT,
+    -3: INVALID_START,
+}
 
-def _CheckContinuationByte(byte):
-  if (ord(byte) >> 6) != 0b10:
-    raise util.InvalidUtf8(INVALID_CONT)
+# Strings at least this long get a cached _Utf8Index.  Shorter ones are
+# cheap to scan every time.
+_INDEX_MIN_LEN = 256
+# The index stores the byte offset of every _INDEX_STRIDE'th char.
+_INDEX_STRIDE = 64
+_INDEX_CACHE_MAX = 16
 
 
-def _NextUtf8Char(s, i):
-  """
-  Given a string and a byte offset, returns the byte position of the next char.
-  Validates UTF-8.
-  """
-  byte_as_int = ord(s[i])  # Should never raise IndexError
+class _Utf8Index(object):
+  """Char count and sparse char -> byte offsets of a valid UTF-8 string.
 
+  For ASCII strings, char and byte offsets are the same, so slicing and
+  length are O(1).  Otherwise an offset is at most _INDEX_STRIDE chars away.
+  """
+  def __init__(self, num_chars, offsets):
+    # type: (int, Optional[List[int]]) -> None
+    self.num_chars = num_chars
+    self.offsets = offsets  # None for ASCII
+
+  def ByteOffset(self, s, char_index):
+    # type: (str, int) -> int
+    if char_index >= self.num_chars:
+      return len(s)
+    if self.offsets is None:
+      return char_index
+    q, r = divmod(char_index, _INDEX_STRIDE)
+    # Can't fail: the whole string was validated.
+    return libc.utf8_advance(s, r, self.offsets[q])
+
+
+# Keyed by the string itself.  Python caches the hash of a str, so looking up
+# the same string again is cheap.
+_INDEX_CACHE = {}  # type: Dict[str, Optional[_Utf8Index]]
+
+
+def _GetIndex(s):
+  # type: (str) -> Optional[_Utf8Index]
+  """Return a cached index for a long string, or None if it's invalid."""
   try:
-    if (byte_as_int >> 7) == 0b0:
-      i += 1
-    elif (byte_as_int >> 5) == 0b110:
-      _CheckContinuationByte(s[i+1])
-      i += 2
-    elif (byte_as_int >> 4) == 0b1110:
-      _CheckContinuationByte(s[i+1])
-      _CheckContinuationByte(s[i+2])
-      i += 3
-    elif (byte_as_int >> 3) == 0b11110:
-      _CheckContinuationByte(s[i+1])
-      _CheckContinuationByte(s[i+2])
-      _CheckContinuationByte(s[i+3])
-      i += 4
-    else:
-      raise util.InvalidUtf8(INVALID_START)
-  except IndexError:
-    raise util.InvalidUtf8(INCOMPLETE_CHAR)
+    return _INDEX_CACHE[s]
+  except KeyError:
+    pass
 
-  return i
+  result = libc.utf8_index(s, _INDEX_STRIDE)
+  index = None if result is None else _Utf8Index(*result)
+
+  if len(_INDEX_CACHE) >= _INDEX_CACHE_MAX:
+    _INDEX_CACHE.clear()
+  _INDEX_CACHE[s] = index
+  return index
 
 
 def CountUtf8Chars(s):
@@ -102,12 +129,15 @@ def CountUtf8Chars(s):
   $ echo $?
   1
   """
-  num_chars = 0
-  num_bytes = len(s)
-  i = 0
-  while i < num_bytes:
-    i = _NextUtf8Char(s, i)
-    num_chars += 1
+  if len(s) >= _INDEX_MIN_LEN:
+    index = _GetIndex(s)
+    if index:
+      return index.num_chars
+    # Otherwise fall through to report the error
+
+  num_chars = libc.utf8_count(s)
+  if num_chars < 0:
+    raise util.InvalidUtf8(_UTF8_ERRORS[num_chars])
   return num_chars
 
 
@@ -118,19 +148,36 @@ def AdvanceUtf8Chars(s, num_chars, byte_offset):
 
   If we got past the end of the string
   """
-  num_bytes = len(s)
-  i = byte_offset  # current byte position
+  # Neither bash or zsh checks out of bounds for slicing.  Either begin or
+  # length.
+  i = libc.utf8_advance(s, num_chars, byte_offset)
+  if i < 0:
+    raise util.InvalidUtf8(_UTF8_ERRORS[i])
+  return i
 
-  for _ in xrange(num_chars):
-    # Neither bash or zsh checks out of bounds for slicing.  Either begin or
-    # length.
-    if i >= num_bytes:
-      return i
-      #raise RuntimeError('Out of bounds')
 
-    i = _NextUtf8Char(s, i)
+def Utf8Slice(s, begin, length):
+  # type: (str, int, Optional[int]) -> str
+  """Return the substring for ${s:begin:length}, in UTF-8 chars.
 
-  return i
+  Args:
+    begin: non-negative
+    length: non-negative, or None for the rest of the string
+  """
+  if len(s) >= _INDEX_MIN_LEN:
+    index = _GetIndex(s)
+    if index:
+      byte_begin = index.ByteOffset(s, begin)
+      if length is None:
+        return s[byte_begin:]
+      return s[byte_begin : index.ByteOffset(s, begin + length)]
+    # Otherwise fall through, so errors are only reported for the chars we
+    # pass over
+
+  byte_begin = AdvanceUtf8Chars(s, begin, 0)
+  if length is None:
+    return s[byte_begin:]
+  return s[byte_begin : AdvanceUtf8Chars(s, length, byte_begin)]
 
 
 # Implementation without Python regex:
@@ -155,6 +202,85 @@ def AdvanceUtf8Chars(s, num_chars, byte_offset):
 # mksh.  Dash doesn't implement it.
 
 
+# Compiled regexes for ${x#glob} and family, keyed by glob.  The value is a
+# tuple of 3 regexes, or None if the glob can't be translated exactly.
+_STRIP_REGEX_CACHE = {}  # type: Dict[str, Optional[Tuple[Any, Any, Any]]]
+_STRIP_REGEX_CACHE_MAX = 1000
+
+
+def _StripRegexes(glob_pat):
+  # type: (str) -> Optional[Tuple[Any, Any, Any]]
+  """Translate a glob to compiled regexes for prefix and suffix matching.
+
+  Returns:
+    (^(ERE), (ERE)$, ^(ERE)$), or None if we have to fall back to fnmatch().
+  """
+  try:
+    return _STRIP_REGEX_CACHE[glob_pat]
+  except KeyError:
+    pass
+
+  regexes = None
+  # NOTE: GlobToERE doesn't handle extended globs like @(a|b), and its
+  # warnings mean a malformed glob, which fnmatch() may treat differently.
+  # It also doesn't translate a literal ^, or backslash escapes in a char
+  # class like [\]], exactly.
+  exact = not ('(' in glob_pat or '^' in glob_pat or
+               ('[' in glob_pat and '\\' in glob_pat))
+  if exact:
+    ere, warnings = glob_.GlobToERE(glob_pat)
+    if not warnings:
+      try:
+        regexes = (
+            libc.regex_compile('^(%s)' % ere),
+            libc.regex_compile('(%s)$' % ere),
+            libc.regex_compile('^(%s)$' % ere),
+        )
+      except RuntimeError:  # e.g. an invalid char class
+        pass
+
+  if len(_STRIP_REGEX_CACHE) >= _STRIP_REGEX_CACHE_MAX:
+    _STRIP_REGEX_CACHE.clear()
+  _STRIP_REGEX_CACHE[glob_pat] = regexes
+  return regexes
+
+
+def _StripWithRegex(s, op_id, regexes):
+  # type: (str, Id_t, Tuple[Any, Any, Any]) -> str
+  """Implement # ## % %% with POSIX regexes.
+
+  POSIX regexes find the leftmost-longest match, so ## and %% take a single
+  match.  For # and %, that match bounds the search for the shortest one.
+  """
+  prefix_re, suffix_re, exact_re = regexes
+  n = len(s)
+
+  if op_id in (Id.VOp1_Pound, Id.VOp1_DPound):
+    m = libc.regex_search(prefix_re, s, 0, n)
+    if m is None:
+      return s
+    longest = m[1]
+    if op_id == Id.VOp1_Pound:  # shortest prefix
+      for i in xrange(0, longest):
+        if libc.regex_search(exact_re, s, 0, i) is not None:
+          return s[i:]
+    return s[longest:]
+
+  elif op_id in (Id.VOp1_Percent, Id.VOp1_DPercent):
+    m = libc.regex_search(suffix_re, s, 0, n)
+    if m is None:
+      return s
+    longest = m[0]  # start of the longest suffix
+    if op_id == Id.VOp1_Percent:  # shortest suffix
+      for i in xrange(n, longest, -1):
+        if libc.regex_search(exact_re, s, i, n) is not None:
+          return s[:i]
+    return s[:longest]
+
+  else:
+    raise NotImplementedError("Can't use %s with pattern" % op_id)
+
+
 # TODO:
 # - Unicode support: Convert both pattern, string, and replacement to unicode,
 #   then the result back at the end.
@@ -210,7 +336,12 @@ def DoUnarySuffixOp(s, op, arg):
     else:  # e.g. ^ ^^ , ,,
       raise AssertionError(op.op_id)
 
-  # For patterns, do fnmatch() in a loop.
+  # Fast path: match with regexes compiled once per pattern.
+  regexes = _StripRegexes(arg)
+  if regexes:
+    return _StripWithRegex(s, op.op_id, regexes)
+
+  # Otherwise, for patterns like @(a|b), do fnmatch() in a loop.
   #
   # TODO:
   # - The loop needs to iterate over code points, not bytes!
@@ -6,8 +6,13 @@ from __future__ import print_function
 
 import unittest
 
+from _devbuild.gen.id_kind_asdl import Id
+from _devbuild.gen.syntax_asdl import suffix_op
+from core import util
 from osh import string_ops  # module under test
 
+import libc
+
 
 class LibStrTest(unittest.TestCase):
 
@@ -26,6 +31,35 @@ class LibStrTest(unittest.TestCase):
       print('Utf8Encode case %r %r' % (expected, code_point))
       self.assertEqual(expected, string_ops.Utf8Encode(code_point))
 
+  def testUtf8Chars(self):
+    mu = u'\u03bc'.encode('utf-8')
+    for s in ['', 'abc', mu + 'x' + mu, 'a' * 300, (mu + 'ab') * 200]:
+      u = s.decode('utf-8')
+      self.assertEqual(len(u), string_ops.CountUtf8Chars(s))
+      for begin in [0, 1, 2, 63, 64, 65, 299, 300, 600, 1000]:
+        self.assertEqual(u[begin:].encode('utf-8'),
+                         string_ops.Utf8Slice(s, begin, None))
+        for length in [0, 1, 5, 64, 200, 1000]:
+          self.assertEqual(u[begin:begin+length].encode('utf-8'),
+                           string_ops.Utf8Slice(s, begin, length))
+          self.assertEqual(
+              len(u[:begin+length].encode('utf-8')),
+              string_ops.AdvanceUtf8Chars(
+                  s, length, len(u[:begin].encode('utf-8'))))
+
+    # Errors are only reported for the chars we pass over, for both short and
+    # long strings.
+    for prefix in ['', 'a' * 300]:
+      bad = prefix + 'ab\xffd'
+      self.assertRaises(util.InvalidUtf8, string_ops.CountUtf8Chars, bad)
+      n = len(prefix)
+      self.assertEqual(prefix + 'ab', string_ops.Utf8Slice(bad, 0, n + 2))
+      self.assertRaises(
+          util.InvalidUtf8, string_ops.Utf8Slice, bad, 0, n + 3)
+
+    self.assertRaises(util.InvalidUtf8, string_ops.CountUtf8Chars, mu[0])
+    self.assertRaises(util.InvalidUtf8, string_ops.CountUtf8Chars, mu[1])
+
   def testUnarySuffixOpDemo(self):
     print(string_ops)
 
@@ -55,6 +89,43 @@ class LibStrTest(unittest.TestCase):
       print('%d test %06r return %06r' % (i, s[i:], s[:i]))
     print()
 
+  def testUnarySuffixOpRegex(self):
+    # Compare the regex fast path against fnmatch() over every prefix/suffix.
+    def Reference(s, op_id, pat):
+      n = len(s)
+      if op_id == Id.VOp1_Pound:
+        indices = [(i, i) for i in xrange(0, n+1)]
+      elif op_id == Id.VOp1_DPound:
+        indices = [(i, i) for i in xrange(n, -1, -1)]
+      elif op_id == Id.VOp1_Percent:
+        indices = [(i, -i) for i in xrange(n, -1, -1)]
+      else:
+        indices = [(i, -i) for i in xrange(0, n+1)]
+      for i, _ in indices:
+        if op_id in (Id.VOp1_Pound, Id.VOp1_DPound):
+          if libc.fnmatch(pat, s[:i]):
+            return s[i:]
+        else:
+          if libc.fnmatch(pat, s[i:]):
+            return s[:i]
+      return s
+
+    strs = ['', 'a', 'abcd', '/usr/lib/x.py', 'aXbXc', 'a.b.c', 'a*b?c[d]']
+    pats = ['*', '?', '*/', '/*', '*X', 'X*', '*.', '.*', 'a*', '*c', '[ab]*',
+            '[!a]*', '*\\.', '\\**', 'b?', '*[[:punct:]]']
+    ops = [Id.VOp1_Pound, Id.VOp1_DPound, Id.VOp1_Percent, Id.VOp1_DPercent]
+
+    for s in strs:
+      for pat in pats:
+        for op_id in ops:
+          op = suffix_op.Unary(op_id, None)
+          expected = Reference(s, op_id, pat)
+          actual = string_ops.DoUnarySuffixOp(s, op, pat)
+          self.assertEqual(
+              expected, actual,
+              '%r %s %r: expected %r, got %r' % (s, op_id, pat, expected,
+                                                 actual))
+
   def testPatSubAllMatches(self):
     s = 'oXooXoooX'
 
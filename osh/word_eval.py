@@ -31,7 +31,7 @@ from osh import word_compile
 
 import posix_ as posix
 
-from typing import List
+from typing import List, Tuple
 
 
 def EvalSingleQuoted(part):
@@ -47,6 +47,52 @@ def EvalSingleQuoted(part):
   return s
 
 
+def _StaticEvalGlobPart(part, quoted, out):
+  """Helper for StaticEvalGlob.  Returns whether the part is static."""
+  if part.tag == word_part_e.Literal:
+    s = part.token.val
+    out.append(glob_.GlobEscape(s) if quoted else s)
+
+  elif part.tag == word_part_e.EscapedLiteral:
+    val = part.token.val
+    assert len(val) == 2, val  # e.g. \*
+    out.append(glob_.GlobEscape(val[1]))
+
+  elif part.tag == word_part_e.SingleQuoted:
+    out.append(glob_.GlobEscape(EvalSingleQuoted(part)))
+
+  elif part.tag == word_part_e.DoubleQuoted:
+    for p in part.parts:
+      if not _StaticEvalGlobPart(p, True, out):
+        return False
+
+  else:  # substitutions, ExtGlob, etc.
+    return False
+
+  return True
+
+
+def StaticEvalGlob(w):
+  # type: (word_t) -> Tuple[bool, str]
+  """Evaluate a pattern word without substitutions to a glob string.
+
+  The result is the same as EvalWordToString(w, do_fnmatch=True), so it can be
+  computed once, e.g. for the patterns of a 'case' statement.
+
+  Returns:
+    ok: False if the word has to be evaluated at runtime.
+    the glob string, with quoted parts escaped.
+  """
+  if w.tag == word_e.Empty:
+    return True, ''
+
+  out = []  # type: List[str]
+  for part in w.parts:
+    if not _StaticEvalGlobPart(part, False, out):
+      return False, ''
+  return True, ''.join(out)
+
+
 # NOTE: Could be done with util.BackslashEscape like glob_.GlobEscape().
 def _BackslashEscape(s):
   """Double up backslashes.
@@ -155,21 +201,14 @@ def _PerformSlice(val, begin, length, part):
           "The start index of a string slice can't be negative: %d",
           begin, part=part)
 
-    byte_begin = string_ops.AdvanceUtf8Chars(s, begin, 0)
-
-    if length is None:
-      byte_end = len(s)
-    else:
-      if length < 0:
-        # TODO: Instead of attributing it to the word part, it would be
-        # better if we attributed it to arith_expr begin.
-        raise util.InvalidSlice(
-            "The length of a string slice can't be negative: %d",
-            length, part=part)
-
-      byte_end = string_ops.AdvanceUtf8Chars(s, length, byte_begin)
+    if length is not None and length < 0:
+      # TODO: Instead of attributing it to the word part, it would be
+      # better if we attributed it to arith_expr begin.
+      raise util.InvalidSlice(
+          "The length of a string slice can't be negative: %d",
+          length, part=part)
 
-    substr = s[byte_begin : byte_end]
+    substr = string_ops.Utf8Slice(s, begin, length)
     val = value.Str(substr)
 
   elif val.tag == value_e.MaybeStrArray:  # Slice array entries.
@@ -577,6 +616,15 @@ class _WordEvaluator(object):
     self._EvalDoubleQuoted(dq_part.parts, part_vals)
     return self._PartValsToString(part_vals, dq_part.left.span_id)
 
+  def _ObjToArray(self, obj, part):
+    """For ${a[@]} when a is an Oil object, like the match object M."""
+    try:
+      it = iter(obj)
+    except TypeError:
+      e_die("Can't convert object of type %r to an array",
+            obj.__class__.__name__, part=part)
+    return value.MaybeStrArray([str(item) for item in it])
+
   def _DecayArray(self, val):
     assert val.tag == value_e.MaybeStrArray, val
     sep = self.splitter.GetJoinChar()
@@ -658,6 +706,8 @@ class _WordEvaluator(object):
           elif val.tag == value_e.MaybeStrArray:
             # TODO: Is this a no-op?  Just leave 'val' alone.
             val = value.MaybeStrArray(val.strs)
+          elif val.tag == value_e.Obj:  # e.g. the match object M
+            val = self._ObjToArray(val.obj, part)
 
         elif op_id == Id.Arith_Star:
           maybe_decay_array = True  # both ${a[*]} and "${a[*]}" decay
@@ -669,6 +719,8 @@ class _WordEvaluator(object):
             # TODO: Is this a no-op?  Just leave 'val' alone.
             # ${a[*]} or "${a[*]}" :  maybe_decay_array is always true
             val = value.MaybeStrArray(val.strs)
+          elif val.tag == value_e.Obj:
+            val = self._ObjToArray(val.obj, part)
 
         else:
           raise AssertionError(op_id)  # unknown
@@ -707,6 +759,16 @@ class _WordEvaluator(object):
           else:
             val = value.Str(s)
 
+        elif val.tag == value_e.Obj:  # e.g. ${M[1]} for the match object
+          index = self.arith_ev.EvalToIndex(anode)
+          try:
+            val = value.Str(str(val.obj[index]))
+          except (IndexError, KeyError):
+            val = value.Undef()
+          except TypeError:
+            e_die("Can't index object of type %r", val.obj.__class__.__name__,
+                  part=part)
+
         else:
           raise AssertionError(val.__class__.__name__)
 
@@ -27,6 +27,9 @@ if TYPE_CHECKING:
   first_t = Dict[int, int]
   states_t = List[List[arc_t]]
   dfa_t = Tuple[states_t, first_t]
+  # ilabel -> (symbol or 0, new state)
+  transitions_t = Dict[int, Tuple[int, int]]
+  actions_t = List[transitions_t]
 
 
 class Grammar(object):
@@ -78,6 +81,16 @@ class Grammar(object):
                      Oil patch: this became List[int] where int is the
                      token/symbol number.
 
+    actions       -- a dict mapping symbol numbers to a list of dicts, one
+                     for each state of the symbol's DFA.  Each dict maps an
+                     input label to the action the parser takes: (0, j)
+                     shifts the token and moves to state j, and (t, j)
+                     pushes symbol t, whose first set contains the label,
+                     and returns to state j.  Final states map label 0 to
+                     (0, j), like the special arc.  This is computed from
+                     dfas by make_actions(), so the parser does one lookup
+                     per step instead of scanning arcs and first sets.
+
     start         -- the number of the grammar's start symbol.
 
     keywords      -- a dict mapping keyword strings to arc labels.
@@ -105,6 +118,7 @@ class Grammar(object):
         self.keywords = {}  # type: Dict[str, int]
         self.tokens = {}  # type: Dict[int, int]
         self.symbol2label = {}  # type: Dict[str, int]
+        self.actions = {}  # type: Dict[int, actions_t]
         self.start = 256
 
     if mylib.PYTHON:
@@ -139,10 +153,33 @@ class Grammar(object):
             self.keywords,
             tokens,
             self.symbol2label,
+            self.actions,
             self.start,
           )  # tuple
           marshal.dump(payload, f)  # version 2 is latest
 
+      def make_actions(self):
+          # type: () -> None
+          """Compute the actions table from the DFAs and first sets."""
+          self.actions = {}
+          for sym, (states, _) in self.dfas.iteritems():
+              table = []  # type: actions_t
+              for arcs in states:
+                  transitions = {}  # type: transitions_t
+                  for ilab, newstate in arcs:
+                      t = self.labels[ilab]
+                      if t < 256:  # a token, or label 0 for a final state
+                          # The first matching arc wins, as in a linear scan.
+                          if ilab not in transitions:
+                              transitions[ilab] = (0, newstate)
+                      else:
+                          _, itsfirst = self.dfas[t]
+                          for first_ilab in sorted(itsfirst):
+                              if first_ilab not in transitions:
+                                  transitions[first_ilab] = (t, newstate)
+                  table.append(transitions)
+              self.actions[sym] = table
+
       def dump_nonterminals(self, f):
           # type: (IO[str]) -> None
           """Write a Python module with nonterminals.
@@ -154,7 +191,7 @@ class Grammar(object):
             name = self.number2symbol[num]
             f.write('%s = %d\n' % (name, num))
 
-      MARSHAL_HEADER = 'PGEN2\n'  # arbitrary header
+      MARSHAL_HEADER = 'PGEN2 v2\n'  # arbitrary header, changed with the format
 
       def loads(self, s):
           # type: (str) -> None
@@ -176,6 +213,7 @@ class Grammar(object):
             self.keywords,
             self.tokens,
             self.symbol2label,
+            self.actions,
             self.start,
           ) = payload
           #self.report()
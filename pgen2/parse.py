@@ -12,8 +12,9 @@ how this parsing engine works.
 from typing import TYPE_CHECKING, Optional, Any, List
 
 if TYPE_CHECKING:
+  from typing import Set
   from _devbuild.gen.syntax_asdl import token
-  from pgen2.grammar import Grammar, dfa_t
+  from pgen2.grammar import Grammar, actions_t
 
 
 class ParseError(Exception):
@@ -54,7 +55,7 @@ class Parser(object):
 
     The proper usage sequence is:
 
-    p = Parser(grammar, [converter])  # create instance
+    p = Parser(grammar, [collapse])   # create instance
     p.setup(start)                    # prepare for parsing
     <for each input token>:
         if p.addtoken(...):           # parse a token; may raise ParseError
@@ -78,13 +79,18 @@ class Parser(object):
     reinitialized by calling setup()).
     """
 
-    def __init__(self, grammar):
-        # type: (Grammar) -> None
+    def __init__(self, grammar, collapse=None):
+        # type: (Grammar, Optional[Set[int]]) -> None
         """Constructor.
 
         The grammar argument is a grammar.Grammar instance; see the
         grammar module for more information.
 
+        collapse is an optional set of nonterminals that are replaced by
+        their child when they have only one, e.g. the chain of precedence
+        levels that a single atom is parsed as.  No PNode is allocated for
+        them.
+
         The parser is not ready yet for parsing; you must call the
         setup() method to get it started.
 
@@ -99,6 +105,7 @@ class Parser(object):
         up to the converter function.
         """
         self.grammar = grammar
+        self.collapse = collapse or set()  # type: Set[int]
 
     def setup(self, start):
         # type: (int) -> None
@@ -113,87 +120,76 @@ class Parser(object):
         each time you call setup() the parser is reset to an initial
         state determined by the (implicit or explicit) start symbol.
         """
-        newnode = PNode(start, None, [])
-        # Each stack entry is a tuple: (dfa, state, node).
-        self.stack = [(self.grammar.dfas[start], 0, newnode)]
+        # Each stack entry is a tuple: (actions, state, typ, opaque, children).
+        # The PNode for a nonterminal is created when it's popped.
+        self.stack = [(self.grammar.actions[start], 0, start, None, [])]
         self.rootnode = None  # type: Optional[PNode]
 
     def addtoken(self, typ, opaque, ilabel):
         # type: (int, token, int) -> bool
         """Add a token; return True iff this is the end of the program."""
-        # Loop until the token is shifted; may raise exceptions
-
-        # Andy NOTE: This is not linear time, i.e. a constant amount of work
-        # for each token?  Is it O(n^2) as the ANTLR paper says?
-        # Do the "accelerators" in pgen.c have anything to do with it?
-
+        # Loop until the token is shifted; may raise exceptions.  Each step is
+        # one lookup in the table that Grammar.make_actions() computed, rather
+        # than a scan of the arcs and the first sets of the nonterminals.
         while True:
-            dfa, state, node = self.stack[-1]
-            states, _ = dfa
-            arcs = states[state]
-            # Look for a state with this label
-            for ilab, newstate in arcs:
-                t = self.grammar.labels[ilab]
-                if ilabel == ilab:
-                    # Look it up in the list of labels
-                    assert t < 256, t
-                    # Shift a token; we're done with it
-                    self.shift(typ, opaque, newstate)
-                    # Pop while we are in an accept-only state
-                    state = newstate
-                    while states[state] == [(0, state)]:
-                        self.pop()
-                        if not self.stack:
-                            # Done parsing!
-                            return True
-                        dfa, state, node = self.stack[-1]
-                        states, _ = dfa
-                    # Done with this token
-                    return False
-                elif t >= 256:
-                    # See if it's a symbol and if we're in its first set
-                    itsdfa = self.grammar.dfas[t]
-                    itsstates, itsfirst = itsdfa
-                    if ilabel in itsfirst:
-                        # Push a symbol
-                        self.push(t, opaque, self.grammar.dfas[t], newstate)
-                        break # To continue the outer while loop
-
-            else:  # note: for/else not supported in C++
-                if (0, state) in arcs:
+            actions, state, _, _, _ = self.stack[-1]
+            transitions = actions[state]
+            action = transitions.get(ilabel)
+            if action is None:
+                if 0 in transitions:
                     # An accepting state, pop it and try something else
                     self.pop()
                     if not self.stack:
                         # Done parsing, but another token is input
                         raise ParseError("too much input", typ, opaque)
-                else:
-                    # No success finding a transition
-                    raise ParseError("bad input", typ, opaque)
+                    continue
+                # No success finding a transition
+                raise ParseError("bad input", typ, opaque)
+
+            t, newstate = action
+            if t:
+                # Push a symbol, since the token is in its first set
+                self.push(t, opaque, self.grammar.actions[t], newstate)
+                continue
+
+            # Shift a token; we're done with it
+            self.shift(typ, opaque, newstate)
+            # Pop while we are in an accept-only state
+            state = newstate
+            transitions = actions[state]
+            while len(transitions) == 1 and 0 in transitions:
+                self.pop()
+                if not self.stack:
+                    # Done parsing!
+                    return True
+                actions, state, _, _, _ = self.stack[-1]
+                transitions = actions[state]
+            # Done with this token
+            return False
 
     def shift(self, typ, opaque, newstate):
         # type: (int, token, int) -> None
         """Shift a token.  (Internal)"""
-        dfa, _, node = self.stack[-1]
-        newnode = PNode(typ, opaque, None)
-        if newnode is not None:
-            node.children.append(newnode)
-        self.stack[-1] = (dfa, newstate, node)
-
-    def push(self, typ, opaque, newdfa, newstate):
-        # type: (int, token, dfa_t, int) -> None
+        actions, _, node_typ, node_opaque, children = self.stack[-1]
+        children.append(PNode(typ, opaque, None))
+        self.stack[-1] = (actions, newstate, node_typ, node_opaque, children)
+
+    def push(self, typ, opaque, newactions, newstate):
+        # type: (int, token, actions_t, int) -> None
         """Push a nonterminal.  (Internal)"""
-        dfa, _, node = self.stack[-1]
-        newnode = PNode(typ, opaque, [])
-        self.stack[-1] = (dfa, newstate, node)
-        self.stack.append((newdfa, 0, newnode))
+        actions, _, node_typ, node_opaque, children = self.stack[-1]
+        self.stack[-1] = (actions, newstate, node_typ, node_opaque, children)
+        self.stack.append((newactions, 0, typ, opaque, []))
 
     def pop(self):
         # type: () -> None
         """Pop a nonterminal.  (Internal)"""
-        _, _, newnode = self.stack.pop()
-        if newnode is not None:
-            if self.stack:
-                _, _, node = self.stack[-1]
-                node.children.append(newnode)
+        _, _, typ, opaque, children = self.stack.pop()
+        if self.stack:
+            _, _, _, _, parent_children = self.stack[-1]
+            if len(children) == 1 and typ in self.collapse:
+                parent_children.append(children[0])
             else:
-                self.rootnode = newnode
+                parent_children.append(PNode(typ, opaque, children))
+        else:
+            self.rootnode = PNode(typ, opaque, children)
@@ -425,4 +425,5 @@ def MakeGrammar(f, tok_def=None):
       gr.dfas[gr.symbol2number[name]] = (states, fi)
 
   gr.start = gr.symbol2number[startsymbol]
+  gr.make_actions()
   return gr
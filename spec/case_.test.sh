@@ -72,3 +72,25 @@ case "$x" in
 esac
 echo $result
 ## stdout: - X
+
+#### First matching arm wins with literals, globs, and dynamic patterns
+f() {
+  case "$1" in
+    start|stop) echo "literal $1" ;;
+    s*) echo "glob $1" ;;
+    status|'*') echo "literal after glob $1" ;;
+    $pat) echo "dynamic $1" ;;
+    *) echo "default $1" ;;
+  esac
+}
+pat='[xy]'
+for x in stop status '*' x z; do
+  f "$x"
+done
+## STDOUT:
+literal stop
+glob status
+literal after glob *
+dynamic x
+default z
+## END
@@ -247,3 +247,34 @@ echo ${x//[^[z]/<}  # also accepted
 ## END
 ## N-I dash stdout-json: ""
 ## N-I dash status: 2
+
+#### shopt -s globstar
+mkdir -p _tmp/gs/a/b/c _tmp/gs/d
+touch _tmp/gs/top.py _tmp/gs/a/x.py _tmp/gs/a/b/c/z.py _tmp/gs/d/readme
+shopt -s globstar
+cd _tmp/gs
+echo **/*.py
+echo a/**
+echo **/
+## STDOUT:
+a/b/c/z.py a/x.py top.py
+a/ a/b a/b/c a/b/c/z.py a/x.py
+a/ a/b/ a/b/c/ d/
+## END
+## N-I dash/mksh/ash status: 2
+## N-I dash/mksh/ash stdout-json: ""
+
+#### globstar under a missing directory or a file
+mkdir -p _tmp/gs2
+touch _tmp/gs2/file.py
+shopt -s globstar
+cd _tmp/gs2
+echo nope/** file.py/**
+shopt -s nullglob
+echo nope/** file.py/** .
+## STDOUT:
+nope/** file.py/**
+.
+## END
+## N-I dash/mksh/ash status: 2
+## N-I dash/mksh/ash stdout-json: ""
@@ -103,3 +103,25 @@ repr empty
 Array[Bool]
 Array[???]  # what should this be?
 ## END
+
+#### Concatenating and repeating typed arrays
+var x = @[1 2]
+var y = x + x
+var z = 2 * x
+echo $y
+echo $z
+## STDOUT:
+IntArray([1, 2, 1, 2])
+IntArray([1, 2, 1, 2])
+## END
+
+#### Assigning the wrong type to an item of a typed array
+var x = @[1 2]
+setvar x[0] = 3
+echo $x
+setvar x[0] = 1.5
+echo 'not reached'
+## status: 1
+## STDOUT:
+IntArray([3, 2])
+## END
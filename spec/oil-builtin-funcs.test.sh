@@ -167,3 +167,72 @@ for (item in zip(a, b)) {
 2 b
 3 c
 ## END
+
+#### find(), startswith(), replace(), tr()
+var s = 'foo.tar.gz'
+argv.py $find(s, '.') $rfind(s, '.') $find(s, 'z.')
+var b1 = startswith(s, 'foo')
+var b2 = endswith(s, '.zip')
+argv.py $b1 $b2
+argv.py $replace(s, '.', '_') $replace(s, '.', '_', 1)
+argv.py $tr(s, 'o.', '0-') $tr(s, '.', '')
+## STDOUT:
+['3', '7', '-1']
+['True', 'False']
+['foo_tar_gz', 'foo_tar.gz']
+['f00-tar-gz', 'footargz']
+## END
+
+#### tr() with strings of different lengths
+var s = tr('foo', 'ab', 'c')
+echo 'not reached'
+## status: 1
+## stdout-json: ""
+
+#### split() with a separator
+var parts = split('a:b::c', ':')
+argv.py @parts
+setvar IFS = ':'
+var fields = split('a:b::c')
+argv.py @fields
+var x = split('a', '')
+echo 'not reached'
+## status: 1
+## STDOUT:
+['a', 'b', '', 'c']
+['a', 'b', '', 'c']
+## END
+
+#### sort() and uniq()
+var a = @(c a b a c)
+var s = sort(uniq(a))
+argv.py @s
+var r = sort(a, reverse=true)
+argv.py @r
+var x = sort(@[3 1 2])
+argv.py $x
+## STDOUT:
+['a', 'b', 'c']
+['c', 'c', 'b', 'a', 'a']
+['IntArray([1, 2, 3])']
+## END
+
+#### merge()
+var d = merge({name: 'bob', age: 30}, {age: 31})
+var name = d->name
+var age = d->age
+argv.py $len(d) $name $age
+## STDOUT:
+['2', 'bob', '31']
+## END
+
+#### var can redefine a builtin func
+var sort = 'quick'
+var len = 42
+argv.py $sort $len
+var sort = 'merge'
+echo 'not reached'
+## status: 1
+## STDOUT:
+['quick', '42']
+## END
@@ -122,3 +122,117 @@ echo ---
 --
 done
 ## END
+
+#### tsv2 read and write
+printf 'name\tage:Int\nalice\t30\nbob\t40\n"c\\td"\t50\n' > t.tsv2
+tsv2 read :t < t.tsv2
+var ages = t->age
+echo $len(ages) $ages
+var older = t[t->age.gt(35)]
+tsv2 write :older
+## STDOUT:
+3 IntArray([30, 40, 50])
+name	age:Int
+bob	40
+"c\td"	50
+## END
+
+#### tsv2 read in batches
+shopt -s oil:all
+{ echo 'x:Int'
+  for i in 1 2 3 4 5; do echo $i; done
+} > t.tsv2
+var total = 0
+tsv2 read -b 2 :t < t.tsv2 {
+  var n = len(t->x)
+  echo "batch $n"
+  setvar total = total + sum(t->x)
+}
+echo "total $total"
+## STDOUT:
+batch 2
+batch 2
+batch 1
+total 15
+## END
+
+#### tsv2 errors
+printf 'x:Int\n1\nfoo\n' > t.tsv2
+tsv2 read :t < t.tsv2
+echo status=$?
+var s = 'x'
+tsv2 write :s
+echo status=$?
+## STDOUT:
+status=1
+status=1
+## END
+
+#### json write and read
+var d = {langs: ['sh', 'py'], more: {ages: [10, 2.5, true, null]}}
+json write :d > d.json
+json read :d2 < d.json
+var langs = d2->langs
+var more = d2->more
+json write -i 0 :langs :more
+echo '"hi"' | json read :s
+echo $s
+var a = @(x y)
+json write :a
+## STDOUT:
+["sh","py"]
+{"ages":[10,2.5,true,null]}
+hi
+[
+  "x",
+  "y"
+]
+## END
+
+#### json write typed arrays and blocks
+shopt -s oil:all
+var ints = Array[Int]([1, 2, 3])
+var t = Table([['x', ints]])
+var m = t->x.gt(1)
+json write -i 0 :ints :t :m
+json write -i 0 {
+  var x = 42
+}
+## STDOUT:
+[1,2,3]
+{"x":[1,2,3]}
+[false,true,true]
+{"x":42}
+## END
+
+#### json read -l streams records
+shopt -s oil:all
+printf '{"n": 1}\n\n{"n": 2}\n{"n": 3}' > d.ndjson
+var total = 0
+json read -l :rec < d.ndjson {
+  setvar total = total + rec->n
+}
+echo "total $total"
+## STDOUT:
+total 6
+## END
+
+#### json errors
+shopt -s parse_brace
+echo '{"a": 1} x' > d.json
+json read :d < d.json
+echo status=$?
+printf '{"n": 1}\n{"n":\n' > d.ndjson
+json read -l :rec < d.ndjson {
+  var n = rec->n
+  echo $n
+}
+echo status=$?
+json write :undefined
+echo status=$?
+## STDOUT:
+status=1
+1
+status=1
+status=1
+## END
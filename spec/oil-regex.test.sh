@@ -455,3 +455,37 @@ setvar pat = / [ ~digit 'z' ] /
 echo $pat
 ## status: 1
 ## stdout-json: ""
+
+#### Regex literal in a loop
+shopt -s oil:all
+for line in 2019-10-18 x 2020-01-02 {
+  if (line ~ / (d+) '-' (d+) '-' d+ /) {
+    echo "$line ${M[1]} ${M[2]}"
+  } else {
+    echo "$line no"
+  }
+}
+## STDOUT:
+2019-10-18 2019 10
+x no
+2020-01-02 2020 01
+## END
+
+#### Match object M
+shopt -s oil:all
+if ('key=value' ~ / (word+) '=' (word+) ('x')? /) {
+  argv.py @M
+  argv.py $len(M) $[M.start(2)] $[M.end(2)] $[M.group(2)] $[M.start(3)]
+  argv.py "${M[@]}"
+}
+if ('=' ~ / (word+) '=' /) {
+  echo yes
+} else {
+  echo $len(M)
+}
+## STDOUT:
+['key=value', 'key', 'value', '']
+['4', '4', '9', 'value', '-1']
+['key=value', 'key', 'value', '']
+0
+## END
@@ -137,30 +137,52 @@ pp b
 
 #### Slices with Multilple Dimensions (with Table/data frame)
 
-# This parses, but it isn't hashable.  We need a type with operator overloading
-# to handle this, which we don't have.
-#
-# Data frames could be:
+# Data frames:
 #
 # df[3:5, :]    rows 3 to 5, all cols
 #
 # df[3:5, @(name age)]    rows 3 to 5, two cols
 
-#var b = d[3,1:]
-
-# TODO: We don't have col=value syntax
-var t = Table()
+var t = Table([['name', @(a b c d)], ['age', @[1 2 3 4]], ['x', @[true false true false]]])
 
 # Cut off the first two rows
 var t1 = t[2:, :]
 pp t1
 
-var t2 = t[:2, 3:4]
+var t2 = t[:2, 1:2]
 pp t2
 
+var t3 = t[t->x, @(name)]
+pp t3
+## STDOUT:
+(Table)   Table([['name', ['c', 'd']], ['age', IntArray([3, 4])], ['x', BoolArray([True, False])]])
+(Table)   Table([['age', IntArray([1, 2])]])
+(Table)   Table([['name', ['a', 'c']]])
+## END
+
+#### Table filter, sort, and group_by
+shopt -s oil:all
+var t = Table([['name', @(bob alice carol alice)], ['age', @[40 30 50 20]]])
+
+var older = t[t->age.ge(30)]
+var names = older->name
+echo @names
+
+var by_name = t.sort('name', 'age')
+var ages = by_name->age
+echo @ages
+
+var groups = t.group_by('name')
+echo $len(groups->alice->age)
 ## STDOUT:
-(str)   'TODO: Table Slicing'
-(str)   'TODO: Table Slicing'
+bob
+alice
+carol
+20
+30
+40
+50
+2
 ## END
 
 #### Slice with Range
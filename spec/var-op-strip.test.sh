@@ -259,3 +259,23 @@ argv.py "${x%%}"
 ['abc']
 ['abc']
 ## END
+
+#### strip a literal ^
+v='a^b'
+argv.py "${v#*^}" "${v%^*}" "${v##a^}"
+## STDOUT:
+['b', 'a', 'b']
+## END
+
+#### strip with backslash escapes in a char class
+x=']a'
+argv.py "${x#[\]]}"
+x='-a'
+argv.py "${x#[a\-z]}"
+x='xa'
+argv.py "${x#[!\]]}"
+## STDOUT:
+['a']
+['a']
+['a']
+## END